@@ -95,6 +95,22 @@ else:
     }
 
 
+# Cache
+# 默认使用进程内 LocMemCache（超过 MAX_ENTRIES 按 LRU 淘汰）；
+# 多个 gunicorn worker 需要共享缓存与限流计数时，设置 CACHE_BACKEND/CACHE_LOCATION，例如
+# django.core.cache.backends.filebased.FileBasedCache + /var/tmp/django_cache，
+# 或 django.core.cache.backends.redis.RedisCache + redis://127.0.0.1:6379/1
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'review-insights'),
+    }
+}
+if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 5000))}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -138,3 +154,26 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# 话题聚类结果缓存（review_insights.cluster_store）
+REVIEW_CLUSTER_CACHE_TTL = 24 * 3600  # 秒
+REVIEW_CLUSTER_CACHE_MAX_ENTRIES = 1000
+# analytics 页面单次请求最多现场计算的产品聚类数，其余使用已缓存结果
+REVIEW_ANALYTICS_INLINE_CLUSTERS = 10
+# 全局话题聚类的抽样上限：超过时在蓄水池样本上拟合，其余分块分配
+REVIEW_CLUSTER_SAMPLE_SIZE = 20000
+# analytics 页面的全局话题聚类按评论集版本缓存；版本变化后该时长（秒）内仍使用上次结果
+REVIEW_GLOBAL_CLUSTERS_MAX_AGE = 600
+# 情感分类器：'lexicon'（词典 + 否定/程度词，默认）或 'linear'（需先运行 train_sentiment_model）
+REVIEW_SENTIMENT_CLASSIFIER = 'lexicon'
+REVIEW_SENTIMENT_MODEL_PATH = BASE_DIR / 'sentiment_model.joblib'
+# 洞察任务失败后的重试：最多执行次数、首次重试前等待的秒数（之后每次翻倍，最多一小时）
+INSIGHT_JOB_MAX_ATTEMPTS = 5
+INSIGHT_JOB_RETRY_DELAY = 30
+# 全站统计的分片行数：写入时随机锁其中一行，读取时求和，减少并发写入的锁等待
+REVIEW_STATS_SHARDS = 16
+# 垃圾分数达到该值的评论不计入产品/全站计数器，也不参与话题聚类（review_insights.models.exclude_spam）
+REVIEW_SPAM_THRESHOLD = 0.6
+# crawl_reviews：京东 SKU -> 产品名（未配置时按 '京东商品 <sku>' 建产品），以及采集暂存文件/检查点目录
+JD_SKU_PRODUCTS = {'100283678024': 'iQOO 15'}
+JD_CRAWL_SPOOL_DIR = BASE_DIR / 'crawl_spool'
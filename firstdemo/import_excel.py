@@ -113,7 +113,7 @@ class Command(BaseCommand):
                 content=content,
                 rating=rating,
                 sentiment=sentiment,
-                confidence=0.8 if sentiment != 'neutral' else 0.5,
+                confidence=80 if sentiment != 'neutral' else 50,
                 created_at=created_at
             )
             count += 1
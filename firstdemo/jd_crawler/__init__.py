@@ -0,0 +1,15 @@
+"""京东商品评价采集
+
+- HTTP 模式（默认）：直接请求评价 JSON 接口，不启动浏览器；base_url 可指向本地桩服务离线调试
+- 浏览器模式：DrissionPage 驱动 Chromium 滚动评价弹窗（原 jd爬虫.py 的做法）
+
+多个 SKU 由线程池并发采集，请求间隔按限流情况自适应调整，进度写入检查点文件，中断后可续采。
+用法见 `python -m jd_crawler --help`。
+"""
+from .backoff import AdaptiveBackoff
+from .checkpoint import Checkpoint
+from .crawler import crawl
+from .fetchers import BrowserFetcher, HttpFetcher, Throttled
+from .sinks import CsvSink
+
+__all__ = ['AdaptiveBackoff', 'Checkpoint', 'crawl', 'BrowserFetcher', 'HttpFetcher', 'Throttled', 'CsvSink']
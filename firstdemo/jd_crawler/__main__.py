@@ -0,0 +1,68 @@
+"""命令行入口
+
+    python -m jd_crawler 100283678024 100012043978 --workers 4 --target 500
+    python -m jd_crawler 100283678024 --mode browser --browser-path "C:\\...\\msedge.exe" --xlsx
+"""
+import argparse
+import os
+import sys
+
+from .backoff import AdaptiveBackoff
+from .checkpoint import Checkpoint
+from .crawler import crawl
+from .fetchers import JD_COMMENT_URL, BrowserFetcher, HttpFetcher
+from .sinks import CsvSink
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m jd_crawler', description='并发、可续采的京东评价采集')
+    parser.add_argument('skus', nargs='+', help='商品 SKU')
+    parser.add_argument('--mode', choices=['http', 'browser'], default='http', help='采集方式，默认 http')
+    parser.add_argument('--workers', type=int, default=4, help='并发 SKU 数（browser 模式为同时打开的标签页数，共享一个浏览器）')
+    parser.add_argument('--target', type=int, default=None, help='每个 SKU 最多采集条数')
+    parser.add_argument('--max-pages', type=int, default=None, help='每个 SKU 最多翻页/滚动次数')
+    parser.add_argument('--out-dir', default='.', help='CSV/xlsx 输出目录')
+    parser.add_argument('--checkpoint', default=None, help='检查点文件，默认 <out-dir>/.jd_crawler_checkpoint.json')
+    parser.add_argument('--restart', action='store_true', help='忽略检查点，清空已有输出后从头采集')
+    parser.add_argument('--base-url', default=JD_COMMENT_URL, help='评价接口地址（可指向本地桩服务）')
+    parser.add_argument('--record-dir', default=None, help='保存原始响应，供桩服务回放')
+    parser.add_argument('--min-delay', type=float, default=0.2, help='请求最小间隔（秒）')
+    parser.add_argument('--browser-path', default=None, help='browser 模式的浏览器可执行文件路径')
+    parser.add_argument('--xlsx', action='store_true', help='完成后额外导出 jd_comments_<sku>.xlsx')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sink = CsvSink(args.out_dir)
+    checkpoint = Checkpoint(args.checkpoint or os.path.join(args.out_dir, '.jd_crawler_checkpoint.json'))
+    if args.restart:
+        for sku in args.skus:
+            checkpoint.reset(sku)
+            sink.remove(sku)
+
+    if args.mode == 'browser':
+        fetcher = BrowserFetcher(
+            browser_path=args.browser_path, max_pages=args.max_pages,
+            backoff=AdaptiveBackoff(min_delay=max(args.min_delay, 0.5), initial=1.0, max_delay=15.0),
+        )
+    else:
+        fetcher = HttpFetcher(
+            base_url=args.base_url, max_pages=args.max_pages, record_dir=args.record_dir,
+            backoff=AdaptiveBackoff(min_delay=args.min_delay),
+        )
+
+    results = crawl(args.skus, fetcher, sink, workers=args.workers, target_count=args.target, checkpoint=checkpoint)
+    failed = [sku for sku, r in results.items() if isinstance(r, Exception)]
+    for sku, r in results.items():
+        if isinstance(r, Exception):
+            print(f'{sku}: 失败（{r}），再次运行将从检查点继续')
+            continue
+        print(f'{sku}: {r} 条 -> {sink.path(sku)}')
+        if args.xlsx and r:
+            print(f'{sku}: 已导出 {sink.export_xlsx(sku)}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+import random
+import threading
+import time
+
+
+class AdaptiveBackoff:
+    """自适应请求间隔（AIMD）：被限流时间隔翻倍，请求成功时逐步缩短
+
+    所有 worker 共用一个实例：同一出口 IP 被限流时整体降速，恢复后再一起提速。
+    """
+
+    def __init__(self, min_delay=0.2, max_delay=60.0, initial=None, increase=2.0, decrease=0.85, jitter=0.25):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.increase = increase
+        self.decrease = decrease
+        self.jitter = jitter
+        self.delay = initial if initial is not None else min_delay
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """请求前调用，按当前间隔加随机抖动休眠"""
+        with self._lock:
+            delay = self.delay
+        if delay > 0:
+            time.sleep(delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def success(self):
+        with self._lock:
+            self.delay = max(self.min_delay, self.delay * self.decrease)
+
+    def failure(self, retry_after=None):
+        """被限流或请求失败；服务端给出 Retry-After 时至少等待该时长"""
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.delay * self.increase, self.min_delay, retry_after or 0))
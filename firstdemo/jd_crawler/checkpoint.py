@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+
+
+class Checkpoint:
+    """采集进度检查点：每个 SKU 记录下一页页码、已采条数与是否完成
+
+    每写完一页就原子地落盘（先写临时文件再 os.replace），进程崩溃后从断点续采；
+    写出与检查点之间崩溃时最多重复一页，由下游按内容指纹去重。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def get(self, sku):
+        with self._lock:
+            return dict(self.state.get(str(sku), {'page': 0, 'count': 0, 'done': False}))
+
+    def update(self, sku, **values):
+        with self._lock:
+            entry = self.state.setdefault(str(sku), {'page': 0, 'count': 0, 'done': False})
+            entry.update(values)
+            self._save()
+
+    def reset(self, sku=None):
+        with self._lock:
+            if sku is None:
+                self.state = {}
+            else:
+                self.state.pop(str(sku), None)
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
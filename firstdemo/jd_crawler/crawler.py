@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .checkpoint import Checkpoint
+
+
+def crawl_sku(sku, fetcher, sink, checkpoint, target_count=None, log=print, stop_when=None):
+    """采集单个 SKU：每页写入 sink 后更新检查点，返回累计条数
+
+    stop_when(sku, record) 为真时视为到达已采集过的内容（增量采集），该条及之后的记录丢弃并结束。
+    """
+    state = checkpoint.get(sku)
+    if state.get('done'):
+        log(f'[{sku}] 检查点显示已完成（{state["count"]} 条），跳过')
+        return state['count']
+    count = state.get('count', 0)
+    if count:
+        log(f'[{sku}] 从检查点续采：已有 {count} 条')
+    for records, progress in fetcher.iter_pages(sku, state):
+        reached = False
+        if stop_when is not None:
+            for i, record in enumerate(records):
+                if stop_when(sku, record):
+                    records, reached = records[:i], True
+                    break
+        if target_count is not None:
+            records = records[:max(0, target_count - count)]
+        sink.write(sku, records)
+        count += len(records)
+        checkpoint.update(sku, count=count, **progress)
+        log(f'[{sku}] 已采集 {count} 条')
+        if reached:
+            log(f'[{sku}] 到达已采集过的评论，增量采集结束')
+            break
+        if target_count is not None and count >= target_count:
+            break
+    sink.finish(sku)
+    checkpoint.update(sku, done=True)
+    return count
+
+
+def crawl(skus, fetcher, sink, workers=4, target_count=None, checkpoint=None, log=print, stop_when=None):
+    """多个 SKU 并发采集；单个 SKU 失败不影响其他 SKU，失败的 SKU 下次运行从检查点继续
+
+    返回 {sku: 条数或异常}。
+    """
+    checkpoint = checkpoint or Checkpoint(None)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(crawl_sku, sku, fetcher, sink, checkpoint, target_count, log, stop_when): sku
+            for sku in skus
+        }
+        for future in as_completed(futures):
+            sku = futures[future]
+            try:
+                results[sku] = future.result()
+            except Exception as e:
+                log(f'[{sku}] 采集失败: {e}')
+                results[sku] = e
+    sink.close()
+    return results
@@ -0,0 +1,245 @@
+import json
+import os
+import socket
+import threading
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from .backoff import AdaptiveBackoff
+
+JD_COMMENT_URL = 'https://club.jd.com/comment/productPageComments.action'
+USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+# 输出记录的字段，与原 jd爬虫.py 导出的 Excel 列一致，另加商品编号、评论ID、评分
+RECORD_FIELDS = ['商品编号', '评论ID', '用户昵称', '评价日期', '购买规格', '评价内容', '追加评论', '商家回复', '评分']
+
+
+class Throttled(Exception):
+    """被限流（429/503 或空响应）"""
+
+    def __init__(self, retry_after=None):
+        super().__init__(f'throttled, retry after {retry_after}')
+        self.retry_after = retry_after
+
+
+class FetchError(Exception):
+    pass
+
+
+def _one_line(text):
+    return (text or '').replace('\r', ' ').replace('\n', ' ').strip()
+
+
+def parse_comments_json(body, sku):
+    """解析评价接口返回（JSON 或 JSONP），返回 (记录列表, 最大页数)"""
+    start, end = body.find('{'), body.rfind('}')
+    if start < 0 or end < start:
+        raise Throttled()
+    data = json.loads(body[start:end + 1])
+    records = []
+    for c in data.get('comments') or []:
+        after = c.get('afterUserComment') or {}
+        replies = c.get('replies') or []
+        spec = ' '.join(s for s in (c.get('productColor'), c.get('productSize')) if s)
+        records.append({
+            '商品编号': str(sku),
+            '评论ID': str(c.get('id') or c.get('guid') or ''),
+            '用户昵称': c.get('nickname') or '',
+            '评价日期': c.get('creationTime') or '',
+            '购买规格': spec,
+            '评价内容': _one_line(c.get('content')),
+            '追加评论': _one_line(after.get('content') if isinstance(after, dict) else ''),
+            '商家回复': _one_line(replies[0].get('content')) if replies else '',
+            '评分': c.get('score') or '',
+        })
+    return records, int(data.get('maxPage') or 0)
+
+
+class HttpFetcher:
+    """直接请求评价 JSON 接口（按时间倒序），不需要浏览器
+
+    base_url 可替换为本地桩服务（python -m jd_crawler.stub_server）离线调试；
+    record_dir 不为空时把原始响应按 <sku>/page_<n>.json 保存，供桩服务回放。
+    实例无状态，可被多个 worker 线程共享。
+    """
+
+    page_size = 10
+
+    def __init__(self, base_url=JD_COMMENT_URL, backoff=None, timeout=10, max_retries=6,
+                 max_pages=None, sort_type=6, record_dir=None):
+        self.base_url = base_url
+        self.backoff = backoff or AdaptiveBackoff()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_pages = max_pages
+        self.sort_type = sort_type
+        self.record_dir = record_dir
+
+    def _get(self, sku, page):
+        query = urlencode({
+            'productId': sku, 'score': 0, 'sortType': self.sort_type,
+            'page': page, 'pageSize': self.page_size, 'isShadowSku': 0, 'fold': 1,
+        })
+        request = Request(f'{self.base_url}?{query}', headers={
+            'User-Agent': USER_AGENT,
+            'Referer': f'https://item.jd.com/{sku}.html',
+        })
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                charset = response.headers.get_content_charset() or 'utf-8'
+                body = response.read().decode(charset, errors='replace')
+        except HTTPError as e:
+            if e.code in (429, 503):
+                retry_after = e.headers.get('Retry-After')
+                raise Throttled(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            raise
+        if not body.strip():
+            # 京东限流时常返回 200 + 空响应
+            raise Throttled()
+        return body
+
+    def _record(self, sku, page, body):
+        path = os.path.join(self.record_dir, str(sku))
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f'page_{page}.json'), 'w', encoding='utf-8') as f:
+            f.write(body)
+
+    def fetch_page(self, sku, page):
+        """抓取一页，限流/网络错误时按自适应间隔重试，返回 (记录列表, 最大页数)"""
+        last_error = None
+        for _ in range(self.max_retries):
+            self.backoff.wait()
+            try:
+                body = self._get(sku, page)
+                result = parse_comments_json(body, sku)
+            except Throttled as e:
+                self.backoff.failure(e.retry_after)
+                last_error = e
+                continue
+            except (URLError, HTTPError, socket.timeout, ConnectionError, ValueError) as e:
+                self.backoff.failure()
+                last_error = e
+                continue
+            self.backoff.success()
+            if self.record_dir:
+                self._record(sku, page, body)
+            return result
+        raise FetchError(f'SKU {sku} 第 {page} 页抓取失败: {last_error}')
+
+    def iter_pages(self, sku, state):
+        """从检查点的 page 开始逐页抓取，产出 (记录列表, 需要写入检查点的进度)"""
+        page = state.get('page', 0)
+        while True:
+            records, max_page = self.fetch_page(sku, page)
+            page += 1
+            yield records, {'page': page}
+            if not records or page >= max_page:
+                return
+            if self.max_pages is not None and page >= self.max_pages:
+                return
+
+
+class BrowserFetcher:
+    """DrissionPage 驱动浏览器滚动评价弹窗（接口不可用时的兜底）
+
+    每个 SKU 开一个标签页；滚动后按自适应间隔等待新卡片，连续 max_stalls 次没有新卡片视为到底。
+    虚拟列表无法按页跳转，续采时跳过检查点中已采的前 count 条。
+
+    多个 worker 共享同一个浏览器：开/关标签页要经过浏览器级连接，用锁串行化；
+    标签页只在创建它的 worker 线程内使用（每个 tab 有独立连接），滚动与解析可以并发。
+    """
+
+    def __init__(self, browser_path=None, backoff=None, max_stalls=5, max_pages=None, page=None):
+        if page is None:
+            from DrissionPage import ChromiumOptions, ChromiumPage
+            co = ChromiumOptions()
+            if browser_path:
+                co.set_browser_path(browser_path)
+            page = ChromiumPage(co)
+        self.page = page
+        self._lock = threading.Lock()
+        self.backoff = backoff or AdaptiveBackoff(min_delay=0.5, initial=1.0, max_delay=15.0)
+        self.max_stalls = max_stalls
+        self.max_pages = max_pages
+
+    def _open(self, sku):
+        with self._lock:
+            tab = self.page.new_tab(f'https://item.jd.com/{sku}.html')
+        tab.scroll.down(1500)
+        btn = tab.ele('text=全部评价', timeout=10)
+        if not btn:
+            self._close(tab)
+            raise FetchError(f'SKU {sku} 未找到『全部评价』按钮，页面结构可能已变化')
+        btn.click(by_js=True)
+        tab.wait.eles_loaded('css:.jdc-pc-rate-card', timeout=10)
+        return tab
+
+    def _close(self, tab):
+        with self._lock:
+            tab.close()
+
+    @staticmethod
+    def _parse_card(card, sku):
+        nick = card.ele('css:.jdc-pc-rate-card-nick').text
+        content = card.ele('css:.jdc-pc-rate-card-main-desc').text
+        info_left = card.ele('css:.jdc-pc-rate-card-info-left')
+        date_ele = info_left.ele('css:.date', timeout=0)
+        spec_ele = info_left.ele('css:.info', timeout=0)
+        after_ele = card.ele('css:.jdc-pc-rate-card-after', timeout=0)
+        reply_ele = card.ele('css:.jdc-pc-rate-card-reply', timeout=0)
+        return {
+            '商品编号': str(sku),
+            # 卡片上没有评论 ID，用昵称 + 内容前 15 字去重（与原脚本一致）
+            '评论ID': f'{nick}_{content[:15]}',
+            '用户昵称': nick,
+            '评价日期': date_ele.text if date_ele else '',
+            '购买规格': spec_ele.text if spec_ele else '',
+            '评价内容': _one_line(content),
+            '追加评论': _one_line(after_ele.text) if after_ele else '',
+            '商家回复': _one_line(reply_ele.text.replace('商家回复：', '')) if reply_ele else '',
+            '评分': '',
+        }
+
+    def iter_pages(self, sku, state):
+        skip = state.get('count', 0)
+        tab = self._open(sku)
+        seen = set()
+        stalls = 0
+        passes = 0
+        try:
+            while stalls < self.max_stalls:
+                records = []
+                cards = tab.eles('css:.jdc-pc-rate-card')
+                for card in cards:
+                    try:
+                        record = self._parse_card(card, sku)
+                    except Exception:
+                        continue
+                    if record['评论ID'] in seen:
+                        continue
+                    seen.add(record['评论ID'])
+                    if skip:
+                        skip -= 1
+                        continue
+                    records.append(record)
+                if records:
+                    stalls = 0
+                    self.backoff.success()
+                    yield records, {}
+                else:
+                    stalls += 1
+                    self.backoff.failure()
+                passes += 1
+                if self.max_pages is not None and passes >= self.max_pages:
+                    return
+                # 滚到最后一张卡片触发虚拟列表加载，再按当前间隔等待
+                if cards:
+                    cards[-1].scroll.to_see()
+                else:
+                    tab.run_js('document.querySelector(\'div[data-virtuoso-scroller="true"]\').scrollTop += 1000')
+                self.backoff.wait()
+        finally:
+            self._close(tab)
@@ -0,0 +1,55 @@
+import csv
+import os
+import threading
+
+from .fetchers import RECORD_FIELDS
+
+
+class CsvSink:
+    """按 SKU 追加写入 jd_comments_<sku>.csv，每页写完即 flush，崩溃时已写入的数据不丢"""
+
+    def __init__(self, out_dir='.'):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def path(self, sku):
+        return os.path.join(self.out_dir, f'jd_comments_{sku}.csv')
+
+    def _sku_lock(self, sku):
+        with self._lock:
+            return self._locks.setdefault(str(sku), threading.Lock())
+
+    def write(self, sku, records):
+        if not records:
+            return
+        path = self.path(sku)
+        with self._sku_lock(sku):
+            is_new = not os.path.exists(path)
+            # utf-8-sig 方便直接用 Excel 打开
+            with open(path, 'a', newline='', encoding='utf-8-sig' if is_new else 'utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS, extrasaction='ignore')
+                if is_new:
+                    writer.writeheader()
+                writer.writerows(records)
+
+    def remove(self, sku):
+        """删除已有输出（配合 --restart 从头采集）"""
+        if os.path.exists(self.path(sku)):
+            os.remove(self.path(sku))
+
+    def finish(self, sku):
+        """单个 SKU 采集完成"""
+
+    def close(self):
+        pass
+
+    def export_xlsx(self, sku):
+        """把 CSV 转成原脚本的 jd_comments_<sku>.xlsx（带序号列），供 import_excel 使用"""
+        import pandas as pd
+        df = pd.read_csv(self.path(sku), dtype=str, keep_default_na=False)
+        df.insert(0, '序号', range(1, len(df) + 1))
+        xlsx_path = os.path.join(self.out_dir, f'jd_comments_{sku}.xlsx')
+        df.to_excel(xlsx_path, index=False)
+        return xlsx_path
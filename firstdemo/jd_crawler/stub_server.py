@@ -0,0 +1,149 @@
+"""本地桩服务：回放录制的评价接口响应，离线调试爬虫
+
+    python -m jd_crawler.stub_server --fixtures fixtures/            # 回放 HttpFetcher(record_dir=...) 录制的页面
+    python -m jd_crawler.stub_server --from-xlsx ../jd_comments_100283678024.xlsx --sku 100283678024
+    python -m jd_crawler --base-url http://127.0.0.1:8765/comment/productPageComments.action 100283678024
+
+--throttle 按比例随机返回 429（带 Retry-After）或空响应，用于验证自适应退避。
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PAGE_SIZE = 10
+
+
+def load_fixtures(path):
+    """读取 <sku>/page_<n>.json 录制文件，返回 {(sku, page): 原始响应}"""
+    pages = {}
+    for sku in os.listdir(path):
+        sku_dir = os.path.join(path, sku)
+        if not os.path.isdir(sku_dir):
+            continue
+        for name in os.listdir(sku_dir):
+            if name.startswith('page_') and name.endswith('.json'):
+                with open(os.path.join(sku_dir, name), encoding='utf-8') as f:
+                    pages[(sku, int(name[5:-5]))] = f.read()
+    return pages
+
+
+def pages_from_xlsx(path, sku):
+    """把原脚本导出的 Excel 转成接口格式的分页响应"""
+    import pandas as pd
+    df = pd.read_excel(path, dtype=str).fillna('')
+    comments = []
+    for i, row in enumerate(df.to_dict('records')):
+        spec = row.get('购买规格', '')
+        color, _, size = spec.partition(' ')
+        date = row.get('评价日期', '')
+        if len(date) == 5:
+            # 原表只有 MM-DD，补全为接口的时间格式
+            date = f'2025-{date} 12:00:00'
+        comments.append({
+            'id': int(sku) * 1000 + i,
+            'nickname': row.get('用户昵称', ''),
+            'content': row.get('评价内容', ''),
+            'creationTime': date,
+            'productColor': color,
+            'productSize': size,
+            'score': 5,
+            'afterUserComment': {'content': row['追加评论']} if row.get('追加评论') else None,
+            'replies': [{'content': row['商家回复']}] if row.get('商家回复') else [],
+        })
+    # 与 sortType=6 一致按时间倒序
+    comments.sort(key=lambda c: c['creationTime'], reverse=True)
+    max_page = max(1, -(-len(comments) // PAGE_SIZE))
+    return {
+        (str(sku), p): 'fetchJSON_comment98(%s);' % json.dumps({
+            'maxPage': max_page,
+            'comments': comments[p * PAGE_SIZE:(p + 1) * PAGE_SIZE],
+        }, ensure_ascii=False)
+        for p in range(max_page)
+    }
+
+
+def make_handler(pages, throttle=0.0, latency=0.0):
+    lock = threading.Lock()
+    stats = {'requests': 0, 'throttled': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            sku = query.get('productId', [''])[0]
+            page = int(query.get('page', ['0'])[0])
+            with lock:
+                stats['requests'] += 1
+            if latency:
+                time.sleep(latency)
+            if throttle and random.random() < throttle:
+                with lock:
+                    stats['throttled'] += 1
+                if random.random() < 0.5:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '1')
+                    self.end_headers()
+                else:
+                    self._send('')
+                return
+            body = pages.get((sku, page))
+            if body is None:
+                # 超出页数：与线上一致返回空评论列表
+                body = json.dumps({'maxPage': 0, 'comments': []})
+            self._send(body)
+
+        def _send(self, body):
+            data = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    Handler.stats = stats
+    return Handler
+
+
+def serve(pages, host='127.0.0.1', port=8765, throttle=0.0, latency=0.0):
+    """启动桩服务（后台线程），返回 server，调用 server.shutdown() 停止"""
+    server = ThreadingHTTPServer((host, port), make_handler(pages, throttle, latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='京东评价接口桩服务')
+    parser.add_argument('--fixtures', help='录制目录（<sku>/page_<n>.json）')
+    parser.add_argument('--from-xlsx', help='用原脚本导出的 Excel 生成响应')
+    parser.add_argument('--sku', default='100283678024', help='--from-xlsx 对应的 SKU')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--throttle', type=float, default=0.0, help='随机限流比例 0-1')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求附加延迟（秒）')
+    args = parser.parse_args(argv)
+
+    pages = {}
+    if args.fixtures:
+        pages.update(load_fixtures(args.fixtures))
+    if args.from_xlsx:
+        pages.update(pages_from_xlsx(args.from_xlsx, args.sku))
+    if not pages:
+        parser.error('需要 --fixtures 或 --from-xlsx')
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pages, args.throttle, args.latency))
+    skus = sorted({sku for sku, _ in pages})
+    print(f'桩服务已启动: http://{args.host}:{args.port}/comment/productPageComments.action （SKU: {", ".join(skus)}）')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""单条评论的预计算特征，入库时批量计算并写入 ReviewInsight
+
+页面与接口直接按这些字段筛选/排序，不再在视图里现算。
+"""
+import math
+import re
+
+from .nlp import tokenize_with_count
+from .sentiment import get_classifier
+
+# analyze_text 计算的 ReviewInsight 字段
+# spam_score 初值等于文本分数，之后由近似重复检测按组规模调整（duplicates.rescore_reviews）
+FEATURE_FIELDS = ['key_topics', 'emotion_score', 'word_count', 'reading_time', 'text_spam_score', 'spam_score']
+# 中文阅读速度（字/分钟）
+READING_SPEED = 400
+# 平台默认好评等模板文本
+TEMPLATE_PHRASES = ('此用户未填写评价内容', '此用户未及时填写评价内容', '系统默认好评', '默认好评')
+_AD_RE = re.compile(r'https?://|www\.|微信|vx|qq|加群|1[3-9]\d{9}', re.IGNORECASE)
+_REPEAT_RE = re.compile(r'(.{2,}?)\1{2,}')
+
+
+def reading_time(content):
+    """阅读时间（分钟，向上取整），非空评论至少 1 分钟"""
+    chars = len((content or '').strip())
+    return math.ceil(chars / READING_SPEED) if chars else 0
+
+
+def emotion_score(content):
+    """情感强度：词典分类器的正/负向得分（与当前配置的分类器无关，便于横向比较）"""
+    pos, neg = get_classifier('lexicon').score_text(content)
+    return {'positive': round(pos, 2), 'negative': round(neg, 2)}
+
+
+def spam_heuristic_score(content):
+    """基于文本本身的垃圾评论分数 [0, 1]：模板文本、过短、字符单一、大段重复、广告联系方式
+
+    各信号按 1 - Π(1 - s) 合并，任一强信号都会把分数推高。
+    """
+    text = (content or '').strip()
+    if not text:
+        return 1.0
+    if any(p in text for p in TEMPLATE_PHRASES):
+        return 1.0
+    signals = []
+    if len(text) < 5:
+        signals.append(0.4)
+    if len(text) >= 10 and len(set(text)) / len(text) < 0.3:
+        signals.append(0.4)
+    if _REPEAT_RE.search(text):
+        signals.append(0.3)
+    if _AD_RE.search(text):
+        signals.append(0.5)
+    keep = 1.0
+    for s in signals:
+        keep *= 1 - s
+    return round(1 - keep, 3)
+
+
+def analyze_text(content):
+    """计算 ReviewInsight 的全部特征字段，返回可直接传给模型的 dict"""
+    tokens, word_count = tokenize_with_count(content)
+    spam_score = spam_heuristic_score(content)
+    return {
+        'key_topics': tokens,
+        'emotion_score': emotion_score(content),
+        'word_count': word_count,
+        'reading_time': reading_time(content),
+        'text_spam_score': spam_score,
+        'spam_score': spam_score,
+    }
@@ -0,0 +1,185 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import InsightJob, ProductClusterCache, ProductInsight, Review, exclude_spam
+from .nlp import build_global_clusters_streaming, extract_product_clusters
+
+# 访问时间的刷新间隔，避免每次命中都写库
+TOUCH_INTERVAL = timedelta(minutes=1)
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'REVIEW_CLUSTER_CACHE_TTL', 24 * 3600))
+
+
+def _global_max_age():
+    return getattr(settings, 'REVIEW_GLOBAL_CLUSTERS_MAX_AGE', 600)
+
+
+def _max_entries():
+    return getattr(settings, 'REVIEW_CLUSTER_CACHE_MAX_ENTRIES', 1000)
+
+
+def _params_key(n_clusters, top_tokens):
+    return f'k{n_clusters}:t{top_tokens}'
+
+
+# 报告页与洞察接口使用的默认参数
+DEFAULT_PARAMS_KEY = _params_key(5, 3)
+
+
+def _evict(now):
+    """按 TTL 清理过期条目，超出上限时按最近访问时间淘汰（LRU）"""
+    ProductClusterCache.objects.filter(computed_at__lt=now - _ttl()).delete()
+    overflow = ProductClusterCache.objects.count() - _max_entries()
+    if overflow > 0:
+        ids = list(ProductClusterCache.objects.order_by('last_accessed').values_list('id', flat=True)[:overflow])
+        ProductClusterCache.objects.filter(id__in=ids).delete()
+
+
+def get_product_clusters(product, n_clusters=5, top_tokens=3, insight=None):
+    """读取产品话题聚类；评论集版本未变且未过期时直接返回缓存结果"""
+    if insight is None:
+        insight = ProductInsight.for_product(product)
+    key = _params_key(n_clusters, top_tokens)
+    now = timezone.now()
+    entry = ProductClusterCache.objects.filter(product_id=product.id, params=key).first()
+    if entry and entry.version == insight.reviews_version and now - entry.computed_at < _ttl():
+        if now - entry.last_accessed > TOUCH_INTERVAL:
+            ProductClusterCache.objects.filter(id=entry.id).update(last_accessed=now)
+        return entry.clusters
+    # 刷评模板等高垃圾分数评论不参与聚类
+    reviews = exclude_spam(product.reviews.select_related('insight'))
+    clusters = extract_product_clusters(reviews, n_clusters=n_clusters, top_tokens=top_tokens)
+    ProductClusterCache.objects.update_or_create(
+        product_id=product.id,
+        params=key,
+        defaults={'version': insight.reviews_version, 'clusters': clusters, 'computed_at': now, 'last_accessed': now},
+    )
+    if (n_clusters, top_tokens) == (5, 3):
+        # 默认参数的结果同时刷新产品的常见话题，导入后无需再全量重算
+        insight.common_topics = [c['label'] for c in clusters[:5]]
+        ProductInsight.objects.filter(pk=insight.pk).update(common_topics=insight.common_topics)
+    _evict(now)
+    return clusters
+
+
+def clusters_stale(version, computed_at, reviews_version, now=None):
+    """缓存的聚类是否需要重算：评论集版本已变，或超过 TTL"""
+    now = now or timezone.now()
+    return version != reviews_version or now - computed_at >= _ttl()
+
+
+def read_product_clusters(product, insight, n_clusters=5, top_tokens=3):
+    """视图读取聚类：返回 (聚类, 计算时间, 是否过期)
+
+    结果过期时直接返回上次的结果并排队后台重算，只有从未计算过才现场计算一次。
+    """
+    now = timezone.now()
+    entry = ProductClusterCache.objects.filter(product_id=product.id, params=_params_key(n_clusters, top_tokens)).first()
+    if entry is None:
+        return get_product_clusters(product, n_clusters, top_tokens, insight=insight), now, False
+    stale = clusters_stale(entry.version, entry.computed_at, insight.reviews_version, now)
+    if stale:
+        InsightJob.enqueue_recompute([product.id])
+    elif now - entry.last_accessed > TOUCH_INTERVAL:
+        ProductClusterCache.objects.filter(id=entry.id).update(last_accessed=now)
+    return entry.clusters, entry.computed_at, stale
+
+
+def get_clusters_for_insights(insights, n_clusters=5, top_tokens=3, inline_limit=None):
+    """批量读取多个产品的聚类：一次查询取缓存，未命中的最多现场计算 inline_limit 个
+
+    过期的缓存直接使用并排队后台重算；从未计算且超出预算的产品返回空列表，同样排队。
+    """
+    if inline_limit is None:
+        inline_limit = getattr(settings, 'REVIEW_ANALYTICS_INLINE_CLUSTERS', 10)
+    key = _params_key(n_clusters, top_tokens)
+    entries = {
+        e.product_id: e
+        for e in ProductClusterCache.objects.filter(product_id__in=[i.product_id for i in insights], params=key)
+    }
+    now = timezone.now()
+    result = {}
+    computed = 0
+    queued = []
+    for insight in insights:
+        entry = entries.get(insight.product_id)
+        if entry is not None:
+            result[insight.product_id] = entry.clusters
+            if entry.version != insight.reviews_version or now - entry.computed_at >= _ttl():
+                queued.append(insight.product_id)
+        elif computed < inline_limit:
+            result[insight.product_id] = get_product_clusters(insight.product, n_clusters, top_tokens, insight=insight)
+            computed += 1
+        else:
+            result[insight.product_id] = []
+            queued.append(insight.product_id)
+    InsightJob.enqueue_recompute(queued)
+    return result
+
+
+def store_product_clusters(results, n_clusters=5, top_tokens=3):
+    """批量写回离线计算的聚类：results 为 [(product_id, 评论集版本, clusters)]
+
+    缓存行一次 upsert，默认参数时常见话题一次 bulk_update，代替逐个产品 update_or_create。
+    """
+    if not results:
+        return
+    key = _params_key(n_clusters, top_tokens)
+    now = timezone.now()
+    ProductClusterCache.objects.bulk_create(
+        [
+            ProductClusterCache(product_id=pid, params=key, version=version, clusters=clusters,
+                                computed_at=now, last_accessed=now)
+            for pid, version, clusters in results
+        ],
+        update_conflicts=True,
+        unique_fields=['product', 'params'],
+        update_fields=['version', 'clusters', 'computed_at', 'last_accessed'],
+    )
+    if (n_clusters, top_tokens) == (5, 3):
+        insights = list(ProductInsight.objects.filter(product_id__in=[r[0] for r in results]))
+        topics = {pid: [c['label'] for c in clusters[:5]] for pid, _, clusters in results}
+        for insight in insights:
+            insight.common_topics = topics[insight.product_id]
+        ProductInsight.objects.bulk_update(insights, ['common_topics'])
+    _evict(now)
+
+
+def get_global_clusters(version, product=None, n_clusters=8, top_tokens=3, evidence_per_cluster=2):
+    """analytics 页面的全站（或单个产品）话题聚类，按评论集版本缓存在 Django 缓存中
+
+    version 为全站统计或产品洞察的版本号。版本未变直接返回；版本已变但结果未超过
+    REVIEW_GLOBAL_CLUSTERS_MAX_AGE 秒时仍返回上次结果（抽样聚类随少量新评论变化很小），
+    超过后只由一个请求重算，其余请求继续使用旧结果。
+    """
+    scope = product.id if product is not None else 'all'
+    key = f'review_insights:global_clusters:{scope}:k{n_clusters}:t{top_tokens}:e{evidence_per_cluster}'
+    lock_key = f'{key}:lock'
+    entry = cache.get(key)
+    locked = False
+    if entry is not None:
+        if entry['version'] == version or time.time() - entry['computed_at'] < _global_max_age():
+            return entry['clusters']
+        locked = cache.add(lock_key, 1, timeout=600)
+        if not locked:
+            return entry['clusters']
+    try:
+        reviews = product.reviews.all() if product is not None else Review.objects.all()
+        # 流式读取，在抽样上拟合，内存与评论总数无关；刷评不参与
+        clusters = build_global_clusters_streaming(
+            exclude_spam(reviews), n_clusters=n_clusters, top_tokens=top_tokens,
+            evidence_per_cluster=evidence_per_cluster,
+            sample_size=getattr(settings, 'REVIEW_CLUSTER_SAMPLE_SIZE', 20000),
+        )
+        cache.set(key, {'version': version, 'clusters': clusters, 'computed_at': time.time()},
+                  timeout=int(_ttl().total_seconds()))
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return clusters
@@ -0,0 +1,207 @@
+"""采集结果直接入库（jd_crawler 的数据库 sink）
+
+每页评价先追加写入 <spool_dir>/<sku>.jsonl 并 fsync，再按批转成 Review 调用 bulk_insert_reviews 入库；
+已入库的位置记在 <sku>.jsonl.offset。进程在任何时刻崩溃，重启后从 offset 重放暂存文件即可补齐，
+重放的数据由内容指纹去重，所以重复写入是幂等的。采集开始几分钟后评论即可查询，不再经过 xlsx。
+偏移量追上文件末尾（全部已入库）时清空暂存文件，长期运行的采集不会让它无限增长。
+"""
+import json
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .ingest import bulk_insert_reviews, parse_review_date, record_author, reviews_from_records
+from .models import Product, Review
+
+DEFAULT_BATCH_SIZE = 200
+
+
+def sku_products(skus, product_name=None):
+    """SKU -> Product：优先 settings.JD_SKU_PRODUCTS 中配置的产品名，否则按 '京东商品 <sku>' 新建"""
+    names = getattr(settings, 'JD_SKU_PRODUCTS', {})
+    products = {}
+    for sku in skus:
+        name = product_name or names.get(str(sku)) or f'京东商品 {sku}'
+        products[str(sku)], _ = Product.objects.get_or_create(
+            name=name,
+            defaults={'description': f'京东 SKU {sku}', 'price': 0, 'category': '未分类'},
+        )
+    return products
+
+
+class HighWaterMark:
+    """增量采集的高水位：产品已入库的最新评论时间，以及这之前 overlap 内评论的内容指纹
+
+    评价接口按时间倒序返回，遇到指纹已知、或早于最新时间 overlap 以上的记录即说明之后都已采过。
+    两个查询都走 (product, created_at) 索引，与产品评论总数无关。
+    """
+
+    def __init__(self, product, overlap=timedelta(days=1)):
+        self.product = product
+        self.latest = product.reviews.aggregate(latest=Max('created_at'))['latest']
+        self.cutoff = None
+        self.hashes = set()
+        if self.latest is not None:
+            self.cutoff = self.latest - overlap
+            self.hashes = set(
+                product.reviews.filter(created_at__gte=self.cutoff).values_list('content_hash', flat=True)
+            )
+
+    def reached(self, record):
+        if self.latest is None:
+            return False
+        created_at = parse_review_date(record.get('评价日期'))
+        if created_at < self.cutoff:
+            return True
+        content_hash = Review.compute_content_hash(self.product.id, record_author(record)[:100], record.get('评价内容'), created_at)
+        return content_hash in self.hashes
+
+
+class ReviewSpool:
+    """单个 SKU 的追加写暂存文件（每行一条 JSON 记录）与已入库偏移量"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset_path = f'{path}.offset'
+        # 追加与清空互斥，避免清空时丢掉刚追加的记录
+        self._lock = threading.Lock()
+        self._repair()
+
+    def _repair(self):
+        """截掉崩溃时写了一半的末行（该页没有写检查点，续采时会重新抓取）"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data_end = f.seek(0, os.SEEK_END)
+            if not data_end:
+                return
+            f.seek(max(0, data_end - 65536))
+            tail = f.read()
+            if tail.endswith(b'\n'):
+                return
+            keep = data_end - len(tail) + tail.rfind(b'\n') + 1 if b'\n' in tail else 0
+            f.truncate(keep)
+
+    def append(self, records):
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def offset(self):
+        if not os.path.exists(self.offset_path):
+            return 0
+        with open(self.offset_path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+
+    def commit(self, offset):
+        tmp = f'{self.offset_path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(offset))
+        os.replace(tmp, self.offset_path)
+
+    def compact(self):
+        """偏移量已到文件末尾时清空暂存文件，返回是否清空
+
+        先把偏移量归零再截断：两步之间崩溃只会在重启时重放已入库的记录，由内容指纹去重；
+        反过来则偏移量会大于文件长度，之后追加的记录会被跳过。
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return False
+            size = os.path.getsize(self.path)
+            if not size or self.offset() < size:
+                return False
+            self.commit(0)
+            with open(self.path, 'r+b') as f:
+                f.truncate(0)
+                os.fsync(f.fileno())
+            return True
+
+    def iter_pending(self, batch_size):
+        """从偏移量开始分批读取未入库的记录，产出 (记录列表, 这批之后的偏移量)，内存占用与文件大小无关"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset())
+            batch = []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch, f.tell()
+                    batch = []
+            if batch:
+                yield batch, f.tell()
+
+
+class DatabaseSink:
+    """jd_crawler 的 sink：先写暂存文件，攒够 batch_size 条后批量入库
+
+    入库按全局锁串行（SQLite 只允许一个写事务），抓取仍由各 worker 线程并发进行。
+    """
+
+    _db_lock = threading.Lock()
+
+    def __init__(self, products, spool_dir, batch_size=DEFAULT_BATCH_SIZE):
+        self.products = {str(k): v for k, v in products.items()}
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        os.makedirs(spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._spools = {}
+        self._unflushed = {}
+        self.inserted = {}
+
+    def spool(self, sku):
+        sku = str(sku)
+        with self._lock:
+            if sku not in self._spools:
+                self._spools[sku] = ReviewSpool(os.path.join(self.spool_dir, f'{sku}.jsonl'))
+            return self._spools[sku]
+
+    def write(self, sku, records):
+        if not records:
+            return
+        sku = str(sku)
+        self.spool(sku).append(records)
+        with self._lock:
+            self._unflushed[sku] = self._unflushed.get(sku, 0) + len(records)
+            due = self._unflushed[sku] >= self.batch_size
+        if due:
+            self.flush(sku)
+
+    def flush(self, sku):
+        """把暂存文件中未入库的记录分批写入数据库，返回新建评论数"""
+        sku = str(sku)
+        spool = self.spool(sku)
+        created = 0
+        with self._db_lock:
+            for records, offset in spool.iter_pending(self.batch_size):
+                with transaction.atomic():
+                    created += len(bulk_insert_reviews(reviews_from_records(records, self.products[sku])))
+                # 事务提交后才推进偏移量；两者之间崩溃只会导致重放，由内容指纹去重
+                spool.commit(offset)
+            spool.compact()
+        with self._lock:
+            self._unflushed[sku] = 0
+            self.inserted[sku] = self.inserted.get(sku, 0) + created
+        return created
+
+    def replay(self):
+        """启动时把上次未入库的暂存记录补写入库，返回 {sku: 新建评论数}"""
+        return {sku: self.flush(sku) for sku in self.products}
+
+    def finish(self, sku):
+        self.flush(sku)
+        # worker 线程结束前归还自己的数据库连接
+        connection.close()
+
+    def close(self):
+        pass
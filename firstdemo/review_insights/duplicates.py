@@ -0,0 +1,245 @@
+"""近似重复评论检测（SimHash + 分段索引）
+
+每条评论按分词结果计算 64 位 SimHash，拆成 4 段 16 位存入 ReviewFingerprint 并建索引。
+海明距离 <= HAMMING_THRESHOLD(3) 的两条评论至少有一段相同（抽屉原理），
+所以入库时只需按 4 段做等值查询取候选，再逐个比较海明距离，时间与库大小无关。
+
+候选命中多个已有组时按并查集合并为一组（A~B、B~C 即使 A、C 不相似也同组）。
+
+同组评论越多越可能是刷评模板：spam_score = max(文本规则分数, 组规模分数)，
+组扩大、缩小（删除/改内容）时重算组内评论的分数，可升可降；
+分数跨过阈值的评论随之移出/计回产品与全站计数器并重算所在天的趋势行，聚类等聚合通过 exclude_spam 排除。
+"""
+import hashlib
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import ProductInsight, ReviewFingerprint, ReviewInsight, spam_threshold
+from .trends import review_day, rollup_review_days
+
+HAMMING_THRESHOLD = 3
+BANDS = 4
+BAND_BITS = 16
+# 分词后少于该数量的评论不参与（"很好" 之类的短评天然相同，交给文本规则处理）
+MIN_FEATURES = 4
+# 每次候选查询处理的评论数，控制 IN 参数个数
+QUERY_CHUNK = 200
+_WORD_RE = re.compile(r'\w')
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@lru_cache(maxsize=100000)
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(tokens):
+    """按词频加权的 64 位 SimHash（无符号整数），标点不参与"""
+    weights = Counter(t for t in tokens if _WORD_RE.search(t))
+    hashes = [_token_hash(t) for t in weights]
+    counts = list(weights.values())
+    if np is not None:
+        bits = np.unpackbits(np.array(hashes, dtype='<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+        totals = (bits.astype(np.int64) * 2 - 1).T @ np.array(counts, dtype=np.int64)
+        return sum(1 << i for i in range(64) if totals[i] > 0)
+    totals = [0] * 64
+    for h, w in zip(hashes, counts):
+        for i in range(64):
+            totals[i] += w if (h >> i) & 1 else -w
+    return sum(1 << i for i in range(64) if totals[i] > 0)
+
+
+def bands(h):
+    return [(h >> (BAND_BITS * i)) & 0xFFFF for i in range(BANDS)]
+
+
+def _to_signed(h):
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def _to_unsigned(h):
+    return h + (1 << 64) if h < 0 else h
+
+
+def spam_signal(group_size):
+    """组规模 -> 垃圾分数：2 条 0.33，5 条 0.67，20 条 0.9"""
+    if group_size < 2:
+        return 0.0
+    return round(1 - 2 / (group_size + 1), 3)
+
+
+def index_fingerprints(pairs):
+    """入库钩子：为 [(review_id, 分词)] 计算指纹、归组并更新垃圾分数，返回写入的指纹数"""
+    entries = [
+        (rid, simhash(tokens)) for rid, tokens in pairs
+        if sum(1 for t in tokens if _WORD_RE.search(t)) >= MIN_FEATURES
+    ]
+    entries.sort()
+    touched = set()
+    for start in range(0, len(entries), QUERY_CHUNK):
+        chunk = entries[start:start + QUERY_CHUNK]
+        touched.update(_assign_groups(chunk))
+    _update_spam_scores(touched)
+    return len(entries)
+
+
+def _assign_groups(chunk):
+    """一次查询取回本批所有候选，按 ID 顺序归组，批内先处理的评论也作为后续候选
+
+    一条评论与多个组相似时，这些组并为一组（取最小的组 ID），已有指纹的组 ID 一并更新。
+    """
+    band_values = [set() for _ in range(BANDS)]
+    for _, h in chunk:
+        for i, b in enumerate(bands(h)):
+            band_values[i].add(b)
+    query = Q()
+    for i in range(BANDS):
+        query |= Q(**{f'band{i}__in': band_values[i]})
+    index = defaultdict(list)
+    parent = {}
+
+    def find(group):
+        root = group
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while group != root:
+            parent[group], group = root, parent[group]
+        return root
+
+    def add(rid, h, group):
+        for i, b in enumerate(bands(h)):
+            index[(i, b)].append((rid, h, group))
+
+    existing = set()
+    for rid, h, group in ReviewFingerprint.objects.filter(query).values_list('review_id', 'simhash', 'group_id'):
+        add(rid, _to_unsigned(h), group)
+        existing.add(group)
+
+    rows = []
+    for rid, h in chunk:
+        roots = {rid}
+        for i, b in enumerate(bands(h)):
+            for other_id, other_h, other_group in index[(i, b)]:
+                if other_id != rid and (h ^ other_h).bit_count() <= HAMMING_THRESHOLD:
+                    roots.add(find(other_group))
+        group = min(roots)
+        for root in roots:
+            if root != group:
+                parent[root] = group
+        add(rid, h, group)
+        b = bands(h)
+        rows.append(ReviewFingerprint(
+            review_id=rid, simhash=_to_signed(h),
+            band0=b[0], band1=b[1], band2=b[2], band3=b[3], group_id=group,
+        ))
+    for row in rows:
+        row.group_id = find(row.group_id)
+    ReviewFingerprint.objects.bulk_create(rows, ignore_conflicts=True)
+    merged = defaultdict(list)
+    for group in existing:
+        root = find(group)
+        if root != group:
+            merged[root].append(group)
+    for root, groups in merged.items():
+        ReviewFingerprint.objects.filter(group_id__in=groups).update(group_id=root)
+    return {r.group_id for r in rows}
+
+
+def _update_spam_scores(group_ids):
+    """按组规模重算组内评论的垃圾分数（可升可降），相同分数的组合并处理"""
+    by_score = defaultdict(list)
+    group_ids = sorted(group_ids)
+    for start in range(0, len(group_ids), QUERY_CHUNK):
+        chunk = group_ids[start:start + QUERY_CHUNK]
+        sizes = dict(ReviewFingerprint.objects.filter(
+            group_id__in=chunk,
+        ).values('group_id').annotate(n=Count('review_id')).values_list('group_id', 'n'))
+        for group in chunk:
+            # 已经没有成员的组（最后一条被删除）无需处理
+            if group in sizes:
+                by_score[spam_signal(sizes[group])].append(group)
+    for score, groups in by_score.items():
+        for start in range(0, len(groups), QUERY_CHUNK):
+            _rescore(ReviewInsight.objects.filter(review__simhash__group_id__in=groups[start:start + QUERY_CHUNK]), score)
+
+
+def _rescore(insights, group_score):
+    """把 insights 的垃圾分数设为 max(文本分数, group_score)，只写有变化的行
+
+    跨过阈值的评论同步移出/计回计数器。
+    """
+    target = Greatest('text_spam_score', Value(group_score))
+    rows = list(insights.exclude(spam_score=target).annotate(new_score=target).values_list(
+        'id', 'spam_score', 'new_score', 'review__product_id', 'review__rating', 'review__sentiment',
+        'review__created_at',
+    ))
+    if not rows:
+        return 0
+    ReviewInsight.objects.bulk_update(
+        [ReviewInsight(id=insight_id, spam_score=new) for insight_id, _, new, *_ in rows], ['spam_score'],
+    )
+    threshold = spam_threshold()
+    marked = [row for row in rows if row[1] < threshold <= row[2]]
+    cleared = [row for row in rows if row[2] < threshold <= row[1]]
+    ProductInsight.record_spam_changes(
+        marked=[(pid, rating, sentiment) for *_, pid, rating, sentiment, _ in marked],
+        cleared=[(pid, rating, sentiment) for *_, pid, rating, sentiment, _ in cleared],
+    )
+    # 趋势行同样不计垃圾评论
+    rollup_review_days({(pid, review_day(created_at)) for *_, pid, _, _, created_at in marked + cleared})
+    return len(rows)
+
+
+def rescore_reviews(review_ids):
+    """重算指定评论的垃圾分数：不在任何组中的回到文本分数，在组中的按组规模重算"""
+    review_ids = list(review_ids)
+    groups = set()
+    for start in range(0, len(review_ids), QUERY_CHUNK):
+        chunk = review_ids[start:start + QUERY_CHUNK]
+        _rescore(ReviewInsight.objects.filter(review_id__in=chunk, review__simhash__isnull=True), 0.0)
+        groups.update(ReviewFingerprint.objects.filter(review_id__in=chunk).values_list('group_id', flat=True))
+    _update_spam_scores(groups)
+
+
+def reset_spam_scores():
+    """清空全部指纹后调用：所有评论的垃圾分数回到文本分数"""
+    return _rescore(ReviewInsight.objects.all(), 0.0)
+
+
+def fingerprint_group(review_id):
+    return ReviewFingerprint.objects.filter(review_id=review_id).values_list('group_id', flat=True).first()
+
+
+def release_group(group_id, review_id):
+    """评论离开组（删除或改内容）后按剩余规模重算分数
+
+    离开的正是组 ID 对应的那条评论时，其余成员改用剩下最早的评论 ID 作组 ID，
+    否则这条评论重新入组时会与原组撞上同一个组 ID。
+    """
+    if group_id is None:
+        return
+    if group_id == review_id:
+        members = ReviewFingerprint.objects.filter(group_id=group_id)
+        new_id = members.order_by('review_id').values_list('review_id', flat=True).first()
+        if new_id is None:
+            return
+        members.update(group_id=new_id)
+        group_id = new_id
+    _update_spam_scores([group_id])
+
+
+def reindex_fingerprint(review_id, tokens):
+    """评论内容变更后重新计算指纹：原组按剩余规模重算，本条先回到文本分数再归入新组"""
+    old_group = fingerprint_group(review_id)
+    ReviewFingerprint.objects.filter(review_id=review_id).delete()
+    release_group(old_group, review_id)
+    rescore_reviews([review_id])
+    index_fingerprints([(review_id, tokens)])
@@ -0,0 +1,137 @@
+import math
+from datetime import date, datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Review, ReviewInsight, ProductInsight
+from .duplicates import index_fingerprints
+from .search import index_reviews
+from .sentiment import classify_batch
+from .trends import review_day_keys, rollup_review_days
+
+
+def chunked(values, size=500):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def parse_review_date(date_str):
+    """解析京东评价日期：网页导出的 'MM-DD'（按 2025 年，晚于今天则退一年）、接口返回的完整时间，
+    或 Excel/Parquet 中的日期单元格；失败时取当前时间"""
+    created_at = timezone.now()
+    if isinstance(date_str, datetime):
+        return timezone.make_aware(date_str) if timezone.is_naive(date_str) else date_str
+    if isinstance(date_str, date):
+        return timezone.make_aware(datetime(date_str.year, date_str.month, date_str.day))
+    try:
+        if isinstance(date_str, str) and '-' in date_str:
+            parts = date_str.split('-')
+            if len(parts) == 2:
+                current_year = 2025
+                dt = datetime(current_year, int(parts[0]), int(parts[1]))
+                if dt > datetime.now():
+                    dt = datetime(current_year - 1, int(parts[0]), int(parts[1]))
+                created_at = timezone.make_aware(dt)
+            elif len(parts) == 3:
+                # 例如 '2025-12-09 21:30:05'
+                created_at = timezone.make_aware(datetime.fromisoformat(date_str.strip()))
+    except Exception:
+        pass
+    return created_at
+
+
+def record_text(value):
+    """导出记录中的文本单元格：缺失/空值/NaN 为空字符串，数字等转成字符串"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    return str(value).strip()
+
+
+def record_author(record):
+    return record_text(record.get('用户昵称')) or 'Anonymous'
+
+
+def reviews_from_records(records, product):
+    """京东评价记录（导出表格列名：用户昵称/评价日期/评价内容/购买规格/追加评论/商家回复/评分）转成未保存的 Review
+
+    空内容跳过；情感整批分类，记录带 1-5 的评分时以评分为准。
+    """
+    records = [r for r in records if record_text(r.get('评价内容'))]
+    results = classify_batch([record_text(r['评价内容']) for r in records])
+    reviews = []
+    for record, result in zip(records, results):
+        try:
+            rating = int(float(record_text(record.get('评分'))))
+        except ValueError:
+            rating = 0
+        reviews.append(Review(
+            product=product,
+            author=record_author(record)[:100],
+            content=record_text(record['评价内容']),
+            rating=rating if 1 <= rating <= 5 else result.rating,
+            sentiment=result.label,
+            confidence=result.confidence,
+            created_at=parse_review_date(record.get('评价日期')),
+            spec=record_text(record.get('购买规格'))[:100],
+            follow_up=record_text(record.get('追加评论')),
+            merchant_reply=record_text(record.get('商家回复')),
+        ))
+    return reviews
+
+
+def existing_content_hashes(hashes):
+    """按唯一索引批量查询已入库的内容指纹"""
+    found = set()
+    for chunk in chunked(set(hashes)):
+        found.update(Review.objects.filter(content_hash__in=chunk).values_list('content_hash', flat=True))
+    return found
+
+
+def dedup_reviews(reviews):
+    """填充内容指纹，剔除库中已存在或本批次内重复的评论"""
+    for r in reviews:
+        if r.content_hash is None:
+            r.content_hash = r.fingerprint()
+    seen = existing_content_hashes(r.content_hash for r in reviews)
+    survivors = []
+    for r in reviews:
+        if r.content_hash in seen:
+            continue
+        seen.add(r.content_hash)
+        survivors.append(r)
+    return survivors
+
+
+def _bulk_create_unique(reviews, batch_size, attempts=3):
+    """插入已去重的评论
+
+    并发导入可能在查重与插入之间写入相同指纹，唯一索引冲突时回滚到保存点，重新查重后重试。
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                return Review.objects.bulk_create(reviews, batch_size=batch_size)
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+            reviews = dedup_reviews(reviews)
+
+
+def bulk_insert_reviews(reviews, batch_size=1000):
+    """批量写入评论并执行入库钩子（bulk_create 不触发 post_save 信号）
+
+    按内容指纹去重，重复导入是幂等的；返回实际新建的评论。
+    """
+    reviews = dedup_reviews(reviews)
+    for r in reviews:
+        r.fill_spec_fields()
+    created = _bulk_create_unique(reviews, batch_size)
+    # 先全部计入计数器，判为垃圾的评论在打分时再移出
+    ProductInsight.record_reviews_added(created)
+    insights = ReviewInsight.create_for_reviews(created, batch_size=batch_size)
+    index_reviews(created, batch_size=batch_size)
+    index_fingerprints([(r.id, i.key_topics) for r, i in zip(created, insights)])
+    rollup_review_days(review_day_keys(created))
+    return created
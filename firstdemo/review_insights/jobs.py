@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import InsightJob, ProductInsight
+
+
+def claim_jobs(limit=10, timeout=600):
+    """领取待执行任务并标记为 running
+
+    PostgreSQL 下用 SKIP LOCKED，多个 worker 并行时互不阻塞；
+    running 超过 timeout 秒仍未结束的任务视为 worker 崩溃，重新领取；等待重试的任务到 run_after 才领取。
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            InsightJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=InsightJob.STATUS_PENDING, run_after__isnull=True) |
+                    Q(status=InsightJob.STATUS_PENDING, run_after__lte=now) |
+                    Q(status=InsightJob.STATUS_RUNNING, started_at__lt=now - timedelta(seconds=timeout)))
+            .order_by('created_at')[:limit]
+        )
+        if jobs:
+            InsightJob.objects.filter(id__in=[j.id for j in jobs]).update(status=InsightJob.STATUS_RUNNING, started_at=now)
+    return jobs
+
+
+def run_job(job):
+    """执行单个任务，异常记录到任务上而不向外抛出"""
+    try:
+        if job.kind == InsightJob.KIND_RECOMPUTE:
+            # 计数器由信号增量维护，任务只重算话题，不写计数器和 reviews_version
+            insight = ProductInsight.for_product(job.product)
+            insight.refresh_topics()
+        status, error = InsightJob.STATUS_DONE, ''
+    except Exception as e:
+        status, error = InsightJob.STATUS_FAILED, f'{type(e).__name__}: {e}'
+    attempts = job.attempts + 1
+    now = timezone.now()
+    if status == InsightJob.STATUS_FAILED and attempts < getattr(settings, 'INSIGHT_JOB_MAX_ATTEMPTS', 5):
+        if _requeue(job, attempts, error, now):
+            return False
+    InsightJob.objects.filter(id=job.id).update(
+        status=status,
+        error=error,
+        attempts=attempts,
+        finished_at=now,
+    )
+    return status == InsightJob.STATUS_DONE
+
+
+def _retry_delay(attempts):
+    """第 n 次失败后等待 INSIGHT_JOB_RETRY_DELAY * 2^(n-1) 秒，最多一小时"""
+    delay = getattr(settings, 'INSIGHT_JOB_RETRY_DELAY', 30) * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, 3600))
+
+
+def _requeue(job, attempts, error, now):
+    """失败的任务改回 pending 等待重试；期间已有新的 pending 任务（同产品又有写入）时由它代替，返回 False"""
+    try:
+        with transaction.atomic():
+            InsightJob.objects.filter(id=job.id).update(
+                status=InsightJob.STATUS_PENDING,
+                error=error,
+                attempts=attempts,
+                finished_at=now,
+                run_after=now + _retry_delay(attempts),
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def run_pending(limit=10, timeout=600):
+    """领取并执行一批任务，返回 (成功数, 失败数)"""
+    ok = failed = 0
+    for job in claim_jobs(limit, timeout):
+        if run_job(job):
+            ok += 1
+        else:
+            failed += 1
+    return ok, failed
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+from review_insights.models import Review, ReviewInsight, spam_threshold
+from review_insights.analysis import FEATURE_FIELDS, analyze_text
+from review_insights.duplicates import rescore_reviews
+from review_insights.trends import review_day_keys, rollup_review_days
+
+class Command(BaseCommand):
+    help = '为已有评论回填分词缓存与预计算特征（ReviewInsight 的话题、情感强度、词数、阅读时间、垃圾分数）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的评论数量'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='重新计算所有评论的特征（默认只处理缺失洞察或尚未计算特征的评论）'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recompute = options['all']
+
+        created = self._create_missing(batch_size)
+        self.stdout.write(f'  新建评论洞察: {created} 条')
+
+        updated = self._recompute_existing(batch_size, recompute)
+        self.stdout.write(f'  重新计算特征: {updated} 条')
+
+        self.stdout.write(self.style.SUCCESS('评论洞察回填完成！'))
+
+    def _create_missing(self, batch_size):
+        reviews = Review.objects.filter(insight__isnull=True).only(
+            'id', 'product_id', 'content', 'rating', 'sentiment', 'created_at',
+        )
+        created = 0
+        batch = []
+        for review in reviews.iterator(chunk_size=batch_size):
+            batch.append(review)
+            if len(batch) >= batch_size:
+                created += self._create_batch(batch)
+                batch = []
+        if batch:
+            created += self._create_batch(batch)
+        return created
+
+    def _create_batch(self, batch):
+        insights = ReviewInsight.create_for_reviews(batch)
+        # 没有洞察的评论原先计入趋势，判为垃圾的从所在天移出
+        threshold = spam_threshold()
+        rollup_review_days(review_day_keys(i.review for i in insights if i.spam_score >= threshold))
+        return len(insights)
+
+    def _recompute_existing(self, batch_size, recompute_all):
+        insights = ReviewInsight.objects.all()
+        if not recompute_all:
+            # 只有分词缓存、尚未计算特征的旧行
+            insights = insights.filter(word_count=0)
+        rows = insights.values_list('id', 'review_id', 'review__content')
+        # spam_score 不直接覆盖，按新的文本分数与近似重复组重算（跨过阈值时同步计数器）
+        fields = [f for f in FEATURE_FIELDS if f != 'spam_score']
+        updated = 0
+        batch = []
+        for insight_id, review_id, content in rows.iterator(chunk_size=batch_size):
+            batch.append((review_id, ReviewInsight(id=insight_id, **analyze_text(content))))
+            if len(batch) >= batch_size:
+                updated += self._flush(batch, fields)
+                batch = []
+        if batch:
+            updated += self._flush(batch, fields)
+        return updated
+
+    def _flush(self, batch, fields):
+        updated = ReviewInsight.objects.bulk_update([insight for _, insight in batch], fields)
+        rescore_reviews([review_id for review_id, _ in batch])
+        return updated
@@ -0,0 +1,146 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+import random
+import time
+from review_insights.models import Product, Review, ReviewTrend
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = '评论筛选/排序热点查询基准：输出查询计划与 p50/p95 延迟（有索引 vs 无索引）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='临时生成的合成评论数量（例如 1000000），结束后回滚'
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=100,
+            help='合成数据的产品数量'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='每个查询重复执行次数'
+        )
+        parser.add_argument(
+            '--no-compare',
+            action='store_true',
+            help='只测当前索引，不临时删除索引做对比'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.stdout.write(f'数据库: {connection.vendor}')
+        # 合成数据与删除索引都在事务内完成，最后整体回滚，不污染数据库
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'], options['products'])
+                product_id = self.pick_product()
+                if product_id is None:
+                    self.stdout.write(self.style.WARNING('没有评论数据，请使用 --seed 生成合成数据'))
+                    raise Rollback()
+                self.stdout.write(self.style.SUCCESS('== 使用索引 =='))
+                after = self.run_queries(product_id)
+                if not options['no_compare']:
+                    self.drop_indexes()
+                    self.stdout.write(self.style.SUCCESS('== 删除索引后 =='))
+                    before = self.run_queries(product_id)
+                    self.summary(before, after)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def seed(self, total, products_count):
+        self.stdout.write(f'生成 {products_count} 个产品、{total} 条合成评论...')
+        started = time.monotonic()
+        products = Product.objects.bulk_create([
+            Product(name=f'bench-{i}', price=0, category='bench') for i in range(products_count)
+        ])
+        now = timezone.now()
+        sentiments = ['positive', 'negative', 'neutral']
+        batch = []
+        for i in range(total):
+            batch.append(Review(
+                product=products[i % products_count],
+                author=f'user{random.randint(1, 50000)}',
+                content='合成评论',
+                rating=random.randint(1, 5),
+                sentiment=random.choice(sentiments),
+                created_at=now - timedelta(minutes=random.randint(0, 365 * 24 * 60)),
+            ))
+            if len(batch) >= 5000:
+                Review.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Review.objects.bulk_create(batch)
+        today = now.date()
+        trends = [
+            ReviewTrend(product=p, date=today - timedelta(days=d), review_count=1)
+            for p in products for d in range(365)
+        ]
+        ReviewTrend.objects.bulk_create(trends, batch_size=5000)
+        self.stdout.write(f'  用时 {time.monotonic() - started:.1f}s')
+
+    def pick_product(self):
+        return Review.objects.order_by().values_list('product_id', flat=True).first()
+
+    def queries(self, product_id):
+        today = timezone.now().date()
+        return [
+            ('product 按时间分页', lambda: Review.objects.filter(product_id=product_id).order_by('-created_at')[:10]),
+            ('product+sentiment 分页', lambda: Review.objects.filter(product_id=product_id, sentiment='negative').order_by('-created_at')[:10]),
+            ('product+sentiment 计数', lambda: Review.objects.filter(product_id=product_id, sentiment='negative').order_by()),
+            ('sentiment+rating 分页', lambda: Review.objects.filter(sentiment='negative', rating=1).order_by('-created_at')[:10]),
+            ('全部评论按时间分页', lambda: Review.objects.order_by('-created_at')[:10]),
+            ('趋势 date__range', lambda: ReviewTrend.objects.filter(date__range=[today - timedelta(days=90), today])[:100]),
+            ('趋势 product+date__range', lambda: ReviewTrend.objects.filter(product_id=product_id, date__range=[today - timedelta(days=90), today])),
+        ]
+
+    def run_queries(self, product_id):
+        results = {}
+        for name, build in self.queries(product_id):
+            qs = build()
+            self.stdout.write(f'-- {name}')
+            for line in qs.explain().splitlines():
+                self.stdout.write(f'   {line}')
+            is_count = name.endswith('计数')
+            timings = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                if is_count:
+                    build().count()
+                else:
+                    list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            results[name] = p95
+            self.stdout.write(f'   p50 {p50:.2f}ms  p95 {p95:.2f}ms')
+        return results
+
+    def drop_indexes(self):
+        # SQLite 的 schema_editor 不能在事务中使用，直接执行 DROP INDEX（可随事务回滚）
+        with connection.cursor() as cursor:
+            for model in (Review, ReviewTrend):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def summary(self, before, after):
+        self.stdout.write(self.style.SUCCESS('== p95 对比 =='))
+        for name, p95_after in after.items():
+            p95_before = before[name]
+            speedup = p95_before / p95_after if p95_after else 0
+            self.stdout.write(f'{name}: {p95_before:.2f}ms -> {p95_after:.2f}ms ({speedup:.1f}x)')
@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import os
+from jd_crawler import AdaptiveBackoff, BrowserFetcher, Checkpoint, HttpFetcher, crawl
+from jd_crawler.fetchers import JD_COMMENT_URL
+from review_insights.crawl_sink import DEFAULT_BATCH_SIZE, DatabaseSink, HighWaterMark, sku_products
+
+class Command(BaseCommand):
+    help = '采集京东评价并直接批量写入数据库（经 JSONL 暂存文件，中断后重新运行即可补齐）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('skus', nargs='+', help='商品 SKU')
+        parser.add_argument(
+            '--product',
+            help='评论归属的产品名（只能与单个 SKU 一起使用），默认读取 settings.JD_SKU_PRODUCTS'
+        )
+        parser.add_argument('--mode', choices=['http', 'browser'], default='http', help='采集方式')
+        parser.add_argument('--workers', type=int, default=4, help='并发 SKU 数')
+        parser.add_argument('--target', type=int, default=None, help='每个 SKU 最多采集条数')
+        parser.add_argument('--max-pages', type=int, default=None, help='每个 SKU 最多翻页/滚动次数')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='每累计多少条评论入库一次'
+        )
+        parser.add_argument(
+            '--spool-dir',
+            default=None,
+            help='暂存文件与检查点目录，默认 settings.JD_CRAWL_SPOOL_DIR'
+        )
+        parser.add_argument('--restart', action='store_true', help='忽略检查点从头采集（已入库的评论按指纹去重）')
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='增量采集：按时间倒序抓取，遇到库中已有的评论即停止（适合定时任务）'
+        )
+        parser.add_argument('--base-url', default=JD_COMMENT_URL, help='评价接口地址（可指向本地桩服务）')
+        parser.add_argument('--min-delay', type=float, default=0.2, help='请求最小间隔（秒）')
+        parser.add_argument('--browser-path', default=None, help='browser 模式的浏览器可执行文件路径')
+
+    def handle(self, *args, **options):
+        skus = [str(s) for s in options['skus']]
+        if options['product'] and len(skus) > 1:
+            raise CommandError('--product 只能与单个 SKU 一起使用，多个 SKU 请配置 JD_SKU_PRODUCTS')
+        if options['incremental'] and options['mode'] != 'http':
+            raise CommandError('--incremental 依赖接口按时间倒序返回，只支持 http 模式')
+        spool_dir = str(options['spool_dir'] or getattr(settings, 'JD_CRAWL_SPOOL_DIR', 'crawl_spool'))
+        products = sku_products(skus, options['product'])
+        sink = DatabaseSink(products, spool_dir, batch_size=options['batch_size'])
+
+        # 上次中断时暂存但未入库的记录先补齐
+        replayed = sum(sink.replay().values())
+        if replayed:
+            self.stdout.write(f'  从暂存文件补写 {replayed} 条评论')
+
+        checkpoint = Checkpoint(os.path.join(spool_dir, 'checkpoint.json'))
+        if options['restart']:
+            for sku in skus:
+                checkpoint.reset(sku)
+
+        stop_when = None
+        if options['incremental']:
+            # 上次已完成的 SKU 从第一页重新开始；中断的增量采集仍从检查点继续
+            for sku in skus:
+                if checkpoint.get(sku).get('done'):
+                    checkpoint.reset(sku)
+            marks = {sku: HighWaterMark(products[sku]) for sku in skus}
+            for sku, mark in marks.items():
+                if mark.latest is not None:
+                    self.stdout.write(f'  {sku}: 库中最新评论 {mark.latest:%Y-%m-%d %H:%M}，抓到该位置即停止')
+            stop_when = lambda sku, record: marks[str(sku)].reached(record)
+
+        if options['mode'] == 'browser':
+            fetcher = BrowserFetcher(
+                browser_path=options['browser_path'], max_pages=options['max_pages'],
+                backoff=AdaptiveBackoff(min_delay=max(options['min_delay'], 0.5), initial=1.0, max_delay=15.0),
+            )
+        else:
+            fetcher = HttpFetcher(
+                base_url=options['base_url'], max_pages=options['max_pages'],
+                backoff=AdaptiveBackoff(min_delay=options['min_delay']),
+            )
+
+        results = crawl(
+            skus, fetcher, sink, workers=options['workers'], target_count=options['target'],
+            checkpoint=checkpoint, log=self.stdout.write, stop_when=stop_when,
+        )
+        for sku, result in results.items():
+            if isinstance(result, Exception):
+                self.stdout.write(self.style.ERROR(f'{sku}: 采集失败（{result}），重新运行将从检查点继续'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{sku}: 采集 {result} 条，新入库 {sink.inserted.get(sku, 0)} 条 -> {products[sku].name}'
+                ))
+        # 入库事务提交时才排队重算：只有确实写入了评论的产品才有任务，采集失败或全部重复时不提示
+        queued = sorted({products[sku].name for sku, created in sink.inserted.items() if created})
+        if queued:
+            self.stdout.write(
+                f'已为 {"、".join(queued)} 排队洞察重算（没有常驻 worker 时运行 `manage.py run_insight_jobs --once`）'
+            )
+        else:
+            self.stdout.write('没有新评论入库，未排队洞察重算')
@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 import random
-from review_insights.models import Product, Review, ProductInsight
+from review_insights.models import DuplicateReview, Product, Review, ProductInsight
 
 class Command(BaseCommand):
     help = '创建示例评论数据用于演示'
@@ -93,6 +93,7 @@ class Command(BaseCommand):
             self.stdout.write(f'  创建产品: {product.name}')
         
         # 为每个产品创建评论
+        reviews_created = 0
         for product in created_products:
             for i in range(reviews_per_product):
                 # 随机选择评论类型（60%正面，25%中性，15%负面）
@@ -121,7 +122,7 @@ class Command(BaseCommand):
                 days_ago = random.randint(0, 30)
                 created_at = timezone.now() - timedelta(days=days_ago)
                 
-                review = Review.objects.create(
+                review = Review(
                     product=product,
                     author=author,
                     content=content,
@@ -130,6 +131,12 @@ class Command(BaseCommand):
                     confidence=confidence,
                     created_at=created_at
                 )
+                # 模板有限，同一作者同一天可能抽到相同内容，跳过重复评论
+                try:
+                    review.save()
+                except DuplicateReview:
+                    continue
+                reviews_created += 1
         
         # 创建或更新产品洞察
         for product in created_products:
@@ -143,6 +150,6 @@ class Command(BaseCommand):
         
         self.stdout.write(
             self.style.SUCCESS(
-                f'成功创建 {len(created_products)} 个产品，共 {len(created_products) * reviews_per_product} 条评论！'
+                f'成功创建 {len(created_products)} 个产品，共 {reviews_created} 条评论（跳过重复 {len(created_products) * reviews_per_product - reviews_created} 条）！'
             )
         )
\ No newline at end of file
@@ -1,44 +1,51 @@
-import pandas as pd
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import datetime
-from review_insights.models import Product, Review, ProductInsight
-import math
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from review_insights.models import Product, Review, InsightJob
+from review_insights.ingest import bulk_insert_reviews, reviews_from_records
+from review_insights.readers import READERS, expand_paths, iter_chunks
+import argparse
+import os
+import time
+
+DEFAULT_FILE = 'jd_comments_100283678024.xlsx'
+
 
 class Command(BaseCommand):
-    help = 'Import reviews from Excel file'
+    help = 'Import reviews from exported files (xlsx / CSV / JSONL / Parquet), streamed in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help=f'Files or glob patterns, e.g. "exports/**/*.csv" (default: {DEFAULT_FILE} in . or ..)'
+        )
+        parser.add_argument(
+            '--product',
+            default='iQOO 15',
+            help='Product name the reviews belong to (created if missing)'
+        )
+        parser.add_argument(
+            '--batch',
+            action=argparse.BooleanOptionalAction,
+            default=True,
+            help='Batched mode (default): batched sentiment + bulk_create, one transaction per chunk. '
+                 '--no-batch saves row by row through the post_save signals (~30 queries per review), '
+                 'only useful for debugging a single bad row'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Rows read and inserted per chunk'
+        )
 
     def handle(self, *args, **options):
-        # Look for file in current dir or parent dir
-        file_name = 'jd_comments_100283678024.xlsx'
-        import os
-        if os.path.exists(file_name):
-            file_path = file_name
-        elif os.path.exists(os.path.join('..', file_name)):
-            file_path = os.path.join('..', file_name)
-        else:
-            # Try absolute path if known
-            file_path = r'c:\Users\cby\Desktop\django_talk\jd_comments_100283678024.xlsx'
-            
-        try:
-            df = pd.read_excel(file_path)
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error reading excel: {e}'))
-            return
+        paths = self.resolve_paths(options['paths'])
 
-        # Create Product
-        # Try to infer product name from first row content or filename
-        product_name = 'iQOO 15' 
-        # Check if first row has "iQOO"
-        if not df.empty and '评价内容' in df.columns:
-            first_content = str(df.iloc[0]['评价内容'])
-            if 'iQOO 15' in first_content:
-                product_name = 'iQOO 15'
-        
         product, created = Product.objects.get_or_create(
-            name=product_name,
+            name=options['product'],
             defaults={
-                'description': 'Imported from Excel',
+                'description': 'Imported from file',
                 'price': 0,
                 'category': '手机'
             }
@@ -48,80 +55,63 @@ class Command(BaseCommand):
         else:
             self.stdout.write(f'Using existing product: {product.name}')
 
-        # Keywords for sentiment
-        pos_keywords = ['好', '棒', '强', '快', '满意', '惊喜', '顺滑', '喜欢', '不错', '爱', '美', '出色', '稳', '细节', '信赖']
-        neg_keywords = ['差', '慢', '卡', '坏', '失望', '不行', '贵', '退', '漏', '旧', '破', '问题', '一般']
-
-        count = 0
-        for index, row in df.iterrows():
-            content = row['评价内容']
-            if not isinstance(content, str) or not content.strip():
-                continue
-
-            author = row['用户昵称']
-            if not isinstance(author, str) or pd.isna(author):
-                author = 'Anonymous'
-            
-            date_str = row['评价日期']
-            # Parse date '12-09'
+        started = time.monotonic()
+        rows = count = 0
+        for path in paths:
+            self.stdout.write(f'Reading {path}')
             try:
-                created_at = timezone.now()
-                if isinstance(date_str, str) and '-' in date_str:
-                    parts = date_str.split('-')
-                    if len(parts) == 2:
-                        # Assume current year 2025
-                        current_year = 2025
-                        dt = datetime(current_year, int(parts[0]), int(parts[1]))
-                        # If date is in future (e.g. file from 2024 but we assume 2025), subtract a year
-                        if dt > datetime.now():
-                            dt = datetime(current_year - 1, int(parts[0]), int(parts[1]))
-                        
-                        created_at = timezone.make_aware(dt)
+                for i, chunk in enumerate(iter_chunks(path, options['chunk_size']), start=1):
+                    rows += len(chunk)
+                    if options['batch']:
+                        count += self.import_batched(chunk, product)
+                    else:
+                        count += self.import_rows(chunk, product)
+                    self.stdout.write(f'  chunk {i}: {rows} rows read, {count} imported')
             except Exception as e:
-                # self.stdout.write(f"Date parse error: {e}")
-                pass
+                # Chunks already committed stay; re-running skips them via the content hash
+                raise CommandError(f'Error reading {path}: {e}') from e
+        elapsed = max(time.monotonic() - started, 1e-6)
 
-            # Sentiment logic
-            sentiment = 'neutral'
-            rating = 5 # Default high for JD usually
-            
-            # Simple scoring
-            pos_score = sum(1 for w in pos_keywords if w in content)
-            neg_score = sum(1 for w in neg_keywords if w in content)
-            
-            if pos_score > neg_score:
-                sentiment = 'positive'
-                rating = 5
-            elif neg_score > pos_score:
-                sentiment = 'negative'
-                rating = 1 # Or 2/3
-            else:
-                sentiment = 'neutral'
-                rating = 3 # Neutral
-                # If content is long and no negative words, maybe positive?
-                if len(content) > 20 and neg_score == 0:
-                     sentiment = 'positive'
-                     rating = 5
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {count} reviews from {len(paths)} file(s) in {elapsed:.2f}s '
+            f'({rows / elapsed:.0f} rows/sec), {rows - count} rows skipped (empty or duplicate).'
+        ))
 
-            # Avoid duplicates (optional, slow for many reviews but fine here)
-            # if Review.objects.filter(product=product, author=author, content=content).exists():
-            #     continue
+        # Counters are maintained on insert; clustering is queued for the worker
+        InsightJob.enqueue_recompute([product.id])
+        self.stdout.write(self.style.SUCCESS(
+            'Queued insight recompute (run `manage.py run_insight_jobs --once` if no worker is running).'
+        ))
 
-            Review.objects.create(
-                product=product,
-                author=author,
-                content=content,
-                rating=rating,
-                sentiment=sentiment,
-                confidence=0.8 if sentiment != 'neutral' else 0.5,
-                created_at=created_at
-            )
-            count += 1
+    def resolve_paths(self, patterns):
+        if not patterns:
+            # Backwards compatible default: the crawler's export in the current or parent dir
+            for candidate in (DEFAULT_FILE, os.path.join('..', DEFAULT_FILE)):
+                if os.path.exists(candidate):
+                    return [candidate]
+            raise CommandError(f'{DEFAULT_FILE} not found; pass file paths or glob patterns')
+        paths, missing = expand_paths(patterns)
+        for pattern in missing:
+            self.stdout.write(self.style.WARNING(f'No files match {pattern}'))
+        unsupported = [p for p in paths if os.path.splitext(p)[1].lower() not in READERS]
+        if unsupported:
+            raise CommandError(f'Unsupported file type: {", ".join(unsupported)} (supported: {", ".join(sorted(READERS))})')
+        if not paths:
+            raise CommandError('No input files')
+        return paths
 
-        self.stdout.write(self.style.SUCCESS(f'Successfully imported {count} reviews.'))
+    def import_rows(self, chunk, product):
+        count = 0
+        for review in reviews_from_records(chunk, product):
+            # Duplicates (same content fingerprint) are rejected by Review.save or the unique index
+            try:
+                with transaction.atomic():
+                    review.save()
+            except IntegrityError:
+                continue
+            count += 1
+        return count
 
-        # Update Insights
-        insight, _ = ProductInsight.objects.get_or_create(product=product)
-        insight.update_insights()
-        insight.save()
-        self.stdout.write(self.style.SUCCESS('Updated product insights.'))
+    def import_batched(self, chunk, product):
+        with transaction.atomic():
+            return len(bulk_insert_reviews(reviews_from_records(chunk, product), batch_size=len(chunk)))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from review_insights.models import Review, ReviewFingerprint
+from review_insights.duplicates import index_fingerprints, reset_spam_scores
+from review_insights.nlp import tokenize_text
+
+class Command(BaseCommand):
+    help = '为已有评论建立 SimHash 指纹并标记近似重复（刷评）组，结果写入 spam_score'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='每批处理的评论数量'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='先清空全部指纹再重建（默认只处理还没有指纹的评论），垃圾分数从文本分数开始重新按组计算'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['clear']:
+            with transaction.atomic():
+                deleted, _ = ReviewFingerprint.objects.all().delete()
+                reset = reset_spam_scores()
+            self.stdout.write(f'  已清空指纹: {deleted} 条，恢复文本垃圾分数: {reset} 条')
+
+        # 按 ID 顺序处理，组 ID 固定为最早的那条评论
+        rows = Review.objects.filter(simhash__isnull=True).order_by('id').values_list('id', 'content', 'insight__key_topics')
+        indexed = 0
+        seen = 0
+        batch = []
+        for review_id, content, key_topics in rows.iterator(chunk_size=batch_size):
+            batch.append((review_id, list(key_topics) if key_topics else tokenize_text(content)))
+            if len(batch) >= batch_size:
+                indexed += self._flush(batch)
+                seen += len(batch)
+                batch = []
+                self.stdout.write(f'  已处理 {seen} 条')
+        if batch:
+            indexed += self._flush(batch)
+            seen += len(batch)
+
+        groups = ReviewFingerprint.objects.values('group_id').distinct().count()
+        self.stdout.write(self.style.SUCCESS(
+            f'指纹重建完成！处理 {seen} 条评论，写入 {indexed} 条指纹，共 {groups} 个内容组'
+        ))
+
+    def _flush(self, batch):
+        with transaction.atomic():
+            return index_fingerprints(batch)
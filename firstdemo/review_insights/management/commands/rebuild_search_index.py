@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from review_insights.models import Review, ReviewSearchDocument
+from review_insights.search import build_document, get_backend
+
+class Command(BaseCommand):
+    help = '重建评论全文检索索引（为缺失检索文档的评论补建）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='每批处理的评论数量'
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='先清空全部检索文档再重建'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        backend = get_backend()
+        if backend is None:
+            self.stdout.write(self.style.WARNING('当前数据库不支持全文索引，检索将退回 icontains'))
+        else:
+            self.stdout.write(f'检索后端: {backend.__name__}')
+
+        if options['clear']:
+            deleted, _ = ReviewSearchDocument.objects.all().delete()
+            self.stdout.write(f'  清空检索文档: {deleted} 条')
+
+        reviews = Review.objects.filter(search_document__isnull=True).select_related('product').order_by()
+        indexed = 0
+        batch = []
+        for review in reviews.iterator(chunk_size=batch_size):
+            batch.append(ReviewSearchDocument(review=review, document=build_document(review)))
+            if len(batch) >= batch_size:
+                indexed += len(ReviewSearchDocument.objects.bulk_create(batch))
+                batch = []
+                self.stdout.write(f'  已索引 {indexed} 条...')
+        if batch:
+            indexed += len(ReviewSearchDocument.objects.bulk_create(batch))
+
+        self.stdout.write(self.style.SUCCESS(f'检索索引重建完成，共索引 {indexed} 条评论！'))
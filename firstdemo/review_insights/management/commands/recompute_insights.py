@@ -0,0 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connections
+import os
+import time
+from review_insights.models import Product
+from review_insights.cluster_store import store_product_clusters
+from review_insights.parallel import compute_product_clusters, init_worker
+
+
+class Command(BaseCommand):
+    help = '多进程并行重算全部（或指定）产品的话题聚类与常见话题，结果批量写回'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='进程数，默认等于 CPU 核数；1 表示在当前进程内串行执行'
+        )
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            help='只重算指定产品ID，可重复传入'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='每累计多少个产品结果写库一次'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['product']:
+            products = products.filter(id__in=options['product'])
+        # 评论多的产品先派发，避免最后只剩一个大产品在跑
+        product_ids = list(products.order_by('-insight__total_reviews', 'id').values_list('id', flat=True))
+        if not product_ids:
+            self.stdout.write(self.style.WARNING('没有需要重算的产品'))
+            return
+        workers = max(1, min(options['workers'], len(product_ids)))
+        batch_size = options['batch_size']
+        self.stdout.write(f'重算 {len(product_ids)} 个产品，{workers} 个进程')
+
+        started = time.monotonic()
+        pending = []
+        done = 0
+        if workers == 1:
+            results = (compute_product_clusters(pid) for pid in product_ids)
+        else:
+            # fork 之前关闭数据库连接，子进程各自建立新连接，不共享父进程的 socket
+            connections.close_all()
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+            futures = [executor.submit(compute_product_clusters, pid) for pid in product_ids]
+            results = (f.result() for f in as_completed(futures))
+        try:
+            for result in results:
+                pending.append(result)
+                done += 1
+                if len(pending) >= batch_size:
+                    store_product_clusters(pending)
+                    pending = []
+                    self.stdout.write(f'  {done}/{len(product_ids)}')
+            store_product_clusters(pending)
+        finally:
+            if workers > 1:
+                executor.shutdown(cancel_futures=True)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'重算完成：{done} 个产品，用时 {elapsed:.1f}s（{done / elapsed:.1f} 个/秒）'
+        ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import date, timedelta
+from review_insights.trends import rollup_trends
+
+class Command(BaseCommand):
+    help = '把评论按天汇总到 ReviewTrend（一次 GROUP BY，只写入有变化的天）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            help='起始日期 YYYY-MM-DD（含）'
+        )
+        parser.add_argument(
+            '--end',
+            help='结束日期 YYYY-MM-DD（含），默认今天'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='只汇总最近 N 天（与 --start 二选一）；都不传则回填全部历史'
+        )
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            help='只汇总指定产品ID，可重复传入'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'日期格式错误: {e}')
+        if options['days']:
+            if start:
+                raise CommandError('--days 与 --start 不能同时使用')
+            end = end or timezone.localdate()
+            start = end - timedelta(days=options['days'] - 1)
+        if start and end and start > end:
+            raise CommandError('--start 不能晚于 --end')
+
+        span = f"{start or '最早'} ~ {end or '最新'}"
+        self.stdout.write(f'开始汇总评论趋势: {span}')
+        result = rollup_trends(start, end, product_ids=options['product'])
+        self.stdout.write(self.style.SUCCESS(
+            f"汇总完成！新增 {result['created']} 天，更新 {result['updated']} 天，删除 {result['deleted']} 天"
+        ))
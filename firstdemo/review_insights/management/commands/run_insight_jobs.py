@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+import time
+from review_insights.jobs import run_pending
+
+class Command(BaseCommand):
+    help = '后台 worker：消费洞察重算任务队列（聚类、常见话题、计数器校准）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='处理完当前队列后退出（适合 cron）'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='队列为空时的轮询间隔（秒）'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=10,
+            help='每次领取的任务数'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=600,
+            help='running 超过该秒数的任务视为中断，重新领取'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('洞察任务 worker 已启动')
+        total_ok = total_failed = 0
+        try:
+            while True:
+                ok, failed = run_pending(options['batch'], options['timeout'])
+                total_ok += ok
+                total_failed += failed
+                if ok or failed:
+                    self.stdout.write(f'  完成 {ok} 个，失败 {failed} 个')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'worker 退出：共完成 {total_ok} 个任务，失败 {total_failed} 个'))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from review_insights.models import Review
+from review_insights.sentiment import train_linear_model
+
+
+def label_from_rating(rating):
+    if rating >= 4:
+        return 'positive'
+    if rating <= 2:
+        return 'negative'
+    return 'neutral'
+
+
+class Command(BaseCommand):
+    help = '用库中已有评论训练 linear 情感分类器（TF-IDF + LogisticRegression）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=getattr(settings, 'REVIEW_SENTIMENT_MODEL_PATH', None),
+            help='模型保存路径，默认 settings.REVIEW_SENTIMENT_MODEL_PATH'
+        )
+        parser.add_argument(
+            '--from-rating',
+            action='store_true',
+            help='用星级生成标签（4-5 正面，3 中性，1-2 负面），默认使用 sentiment 字段'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=200000,
+            help='最多使用的评论条数（取最新的）'
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('请通过 --output 或 REVIEW_SENTIMENT_MODEL_PATH 指定模型保存路径')
+        rows = list(
+            Review.objects.order_by('-created_at').values_list('content', 'sentiment', 'rating')[:options['limit']]
+        )
+        if not rows:
+            raise CommandError('没有评论数据')
+        texts = [content for content, _, _ in rows]
+        if options['from_rating']:
+            labels = [label_from_rating(rating) for _, _, rating in rows]
+        else:
+            labels = [sentiment for _, sentiment, _ in rows]
+        if len(set(labels)) < 2:
+            raise CommandError('标签只有一种，无法训练')
+        try:
+            accuracy = train_linear_model(texts, labels, options['output'])
+        except ImportError:
+            raise CommandError('训练需要安装 scikit-learn')
+        self.stdout.write(self.style.SUCCESS(
+            f"已训练 {len(rows)} 条评论，训练集准确率 {accuracy:.3f}，模型保存到 {options['output']}"
+        ))
+        self.stdout.write('设置 REVIEW_SENTIMENT_CLASSIFIER = "linear" 后生效')
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:50
+
+from django.db import migrations, models
+
+
+def backfill_counters(apps, schema_editor):
+    """按评论表一次分组聚合，回填已有洞察行的计数器"""
+    Review = apps.get_model('review_insights', 'Review')
+    ProductInsight = apps.get_model('review_insights', 'ProductInsight')
+    rows = Review.objects.values('product_id').annotate(
+        total=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        positive=models.Count('id', filter=models.Q(sentiment='positive')),
+        negative=models.Count('id', filter=models.Q(sentiment='negative')),
+        neutral=models.Count('id', filter=models.Q(sentiment='neutral')),
+    )
+    stats = {r['product_id']: r for r in rows}
+    for insight in ProductInsight.objects.all():
+        r = stats.get(insight.product_id)
+        if r is None:
+            insight.total_reviews = 0
+            insight.rating_sum = 0
+            insight.avg_rating = 0.0
+            insight.sentiment_distribution = {'positive': 0, 'negative': 0, 'neutral': 0}
+        else:
+            insight.total_reviews = r['total']
+            insight.rating_sum = r['rating_sum'] or 0
+            insight.avg_rating = insight.rating_sum / r['total'] if r['total'] else 0.0
+            insight.sentiment_distribution = {k: r[k] for k in ('positive', 'negative', 'neutral')}
+        insight.save(update_fields=['total_reviews', 'rating_sum', 'avg_rating', 'sentiment_distribution'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinsight',
+            name='rating_sum',
+            field=models.IntegerField(default=0, verbose_name='评分总和'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0002_productinsight_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productinsight',
+            name='reviews_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='评论集版本'),
+        ),
+        migrations.CreateModel(
+            name='ProductClusterCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('params', models.CharField(max_length=50, verbose_name='聚类参数')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='评论集版本')),
+                ('clusters', models.JSONField(default=list, verbose_name='聚类结果')),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='计算时间')),
+                ('last_accessed', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='最近访问')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cluster_caches', to='review_insights.product', verbose_name='产品')),
+            ],
+            options={
+                'verbose_name': '聚类缓存',
+                'verbose_name_plural': '聚类缓存',
+                'unique_together': {('product', 'params')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:54
+
+import datetime
+import hashlib
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _content_hash(product_id, author, content, created_at):
+    # 与 Review.compute_content_hash 保持一致（迁移中不能依赖模型方法）
+    if isinstance(created_at, datetime.datetime):
+        if timezone.is_aware(created_at):
+            created_at = timezone.localtime(created_at)
+        created_at = created_at.date()
+    normalized = '\x1f'.join([
+        str(product_id),
+        (author or '').strip(),
+        ' '.join((content or '').split()),
+        created_at.isoformat() if created_at else '',
+    ])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def backfill_content_hash(apps, schema_editor):
+    """回填指纹；重复评论只给最早一条写指纹，其余保持为空"""
+    Review = apps.get_model('review_insights', 'Review')
+    seen = set()
+    batch = []
+    rows = Review.objects.order_by('id').values_list('id', 'product_id', 'author', 'content', 'created_at')
+    for review_id, product_id, author, content, created_at in rows.iterator(chunk_size=2000):
+        h = _content_hash(product_id, author, content, created_at)
+        if h in seen:
+            continue
+        seen.add(h)
+        batch.append(Review(id=review_id, content_hash=h))
+        if len(batch) >= 2000:
+            Review.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        Review.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0003_cluster_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='内容指纹'),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0004_review_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='内容指纹'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DOC_TABLE = 'review_insights_reviewsearchdocument'
+FTS_TABLE = 'review_insights_review_fts'
+
+
+def create_fulltext_index(apps, schema_editor):
+    """SQLite 建 FTS5 外部内容表并用触发器同步；PostgreSQL 建 GIN 全文索引"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = [
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(document, content='{DOC_TABLE}', content_rowid='review_id')",
+            f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOC_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.review_id, new.document);
+            END""",
+            f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOC_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.review_id, old.document);
+            END""",
+            f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOC_TABLE} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, document) VALUES ('delete', old.review_id, old.document);
+                INSERT INTO {FTS_TABLE}(rowid, document) VALUES (new.review_id, new.document);
+            END""",
+        ]
+    elif vendor == 'postgresql':
+        statements = [
+            f"CREATE INDEX review_search_document_gin ON {DOC_TABLE} USING GIN (to_tsvector('simple', document))",
+        ]
+    else:
+        # 其他数据库退回 icontains 检索
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS review_search_document_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0006_review_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSearchDocument',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='review_insights.review', verbose_name='评论')),
+                ('document', models.TextField(blank=True, verbose_name='检索文本')),
+            ],
+            options={
+                'verbose_name': '检索文档',
+                'verbose_name_plural': '检索文档',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:00
+
+from django.db import migrations, models
+
+
+def backfill_rating_distribution(apps, schema_editor):
+    """一次分组聚合回填各产品的评分分布；全站统计行在首次读取时生成"""
+    Review = apps.get_model('review_insights', 'Review')
+    ProductInsight = apps.get_model('review_insights', 'ProductInsight')
+    dists = {}
+    for row in Review.objects.order_by().values('product_id', 'rating').annotate(n=models.Count('id')):
+        dists.setdefault(row['product_id'], {})[str(row['rating'])] = row['n']
+    for insight in ProductInsight.objects.all():
+        dist = {str(r): 0 for r in range(1, 6)}
+        dist.update(dists.get(insight.product_id, {}))
+        insight.rating_distribution = dist
+        insight.save(update_fields=['rating_distribution'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0007_review_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.IntegerField(default=0, verbose_name='产品数')),
+                ('total_reviews', models.IntegerField(default=0, verbose_name='总评论数')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='评分总和')),
+                ('sentiment_distribution', models.JSONField(default=dict, verbose_name='情感分布')),
+                ('rating_distribution', models.JSONField(default=dict, verbose_name='评分分布')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='版本')),
+                ('last_updated', models.DateTimeField(auto_now=True, verbose_name='最后更新')),
+            ],
+            options={
+                'verbose_name': '全站统计',
+                'verbose_name_plural': '全站统计',
+            },
+        ),
+        migrations.AddField(
+            model_name='productinsight',
+            name='rating_distribution',
+            field=models.JSONField(default=dict, verbose_name='评分分布'),
+        ),
+        migrations.RunPython(backfill_rating_distribution, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0008_review_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recompute', '重算产品洞察')], default='recompute', max_length=20, verbose_name='任务类型')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '执行中'), ('done', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='执行次数')),
+                ('error', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='创建时间')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='insight_jobs', to='review_insights.product', verbose_name='产品')),
+            ],
+            options={
+                'verbose_name': '洞察任务',
+                'verbose_name_plural': '洞察任务',
+                'indexes': [models.Index(fields=['status', 'created_at'], name='insightjob_status_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('product', 'kind'), name='insightjob_one_pending')],
+            },
+        ),
+    ]
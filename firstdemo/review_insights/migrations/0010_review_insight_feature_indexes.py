@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0009_insight_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reviewinsight',
+            index=models.Index(fields=['spam_score'], name='reviewinsight_spam_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reviewinsight',
+            index=models.Index(fields=['-word_count'], name='reviewinsight_words_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0010_review_insight_feature_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewFingerprint',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='simhash', serialize=False, to='review_insights.review', verbose_name='评论')),
+                ('simhash', models.BigIntegerField(verbose_name='SimHash')),
+                ('band0', models.IntegerField(db_index=True)),
+                ('band1', models.IntegerField(db_index=True)),
+                ('band2', models.IntegerField(db_index=True)),
+                ('band3', models.IntegerField(db_index=True)),
+                ('group_id', models.BigIntegerField(db_index=True, verbose_name='近似重复组')),
+            ],
+            options={
+                'verbose_name': '评论指纹',
+                'verbose_name_plural': '评论指纹',
+            },
+        ),
+    ]
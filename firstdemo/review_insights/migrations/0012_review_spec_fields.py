@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0011_review_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='follow_up',
+            field=models.TextField(blank=True, default='', verbose_name='追加评论'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='merchant_reply',
+            field=models.TextField(blank=True, default='', verbose_name='商家回复'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spec',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='购买规格'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spec_color',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='颜色/版本'),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='spec_memory',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='内存规格'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'spec_color'], name='review_product_color_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', 'spec_memory'], name='review_product_memory_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import re
+
+from django.db import migrations
+
+_WORD_RE = re.compile(r'\w')
+
+
+def search_tokens(text):
+    # 编写本迁移时 search.search_tokens 的副本（含 nlp.is_word），之后修改分词规则不影响本迁移的结果
+    try:
+        import jieba
+        words = jieba.cut_for_search(text or '')
+    except Exception:
+        words = re.findall(r"[\w\-]+", text or '')
+    return [w.strip().lower() for w in words if _WORD_RE.search(w or '')]
+
+
+def rebuild_search_documents(apps, schema_editor):
+    """旧检索文档按话题分词生成（同义词归并、去停用词），按原始检索分词重建；触发器/GIN 随之更新"""
+    Review = apps.get_model('review_insights', 'Review')
+    ReviewSearchDocument = apps.get_model('review_insights', 'ReviewSearchDocument')
+    batch = []
+    rows = Review.objects.filter(search_document__isnull=False).order_by('id').values_list(
+        'id', 'product__name', 'author', 'content',
+    )
+    for review_id, product_name, author, content in rows.iterator(chunk_size=1000):
+        document = ' '.join(search_tokens(product_name) + search_tokens(author) + search_tokens(content))
+        batch.append(ReviewSearchDocument(review_id=review_id, document=document))
+        if len(batch) >= 1000:
+            ReviewSearchDocument.objects.bulk_update(batch, ['document'])
+            batch = []
+    if batch:
+        ReviewSearchDocument.objects.bulk_update(batch, ['document'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0012_review_spec_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_search_documents, migrations.RunPython.noop),
+    ]
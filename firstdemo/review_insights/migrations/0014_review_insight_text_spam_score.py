@@ -0,0 +1,110 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:38
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+SENTIMENT_KEYS = ('positive', 'negative', 'neutral')
+RATING_VALUES = (1, 2, 3, 4, 5)
+TEMPLATE_PHRASES = ('此用户未填写评价内容', '此用户未及时填写评价内容', '系统默认好评', '默认好评')
+_AD_RE = re.compile(r'https?://|www\.|微信|vx|qq|加群|1[3-9]\d{9}', re.IGNORECASE)
+_REPEAT_RE = re.compile(r'(.{2,}?)\1{2,}')
+
+
+def spam_heuristic_score(content):
+    # 编写本迁移时 analysis.spam_heuristic_score 的副本，之后修改规则不影响本迁移的结果
+    text = (content or '').strip()
+    if not text:
+        return 1.0
+    if any(p in text for p in TEMPLATE_PHRASES):
+        return 1.0
+    signals = []
+    if len(text) < 5:
+        signals.append(0.4)
+    if len(text) >= 10 and len(set(text)) / len(text) < 0.3:
+        signals.append(0.4)
+    if _REPEAT_RE.search(text):
+        signals.append(0.3)
+    if _AD_RE.search(text):
+        signals.append(0.5)
+    keep = 1.0
+    for s in signals:
+        keep *= 1 - s
+    return round(1 - keep, 3)
+
+
+def _counter_aggregates():
+    # 与 models.counter_aggregates 保持一致（迁移中不能依赖模型模块）
+    return dict(
+        total=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        **{k: models.Count('id', filter=models.Q(sentiment=k)) for k in SENTIMENT_KEYS},
+        **{f'rating_{r}': models.Count('id', filter=models.Q(rating=r)) for r in RATING_VALUES},
+    )
+
+
+def backfill_text_spam_score(apps, schema_editor):
+    """回填文本垃圾分数，并按“垃圾评论不计入”重算产品洞察与全站统计的计数器"""
+    ReviewInsight = apps.get_model('review_insights', 'ReviewInsight')
+    Review = apps.get_model('review_insights', 'Review')
+    Product = apps.get_model('review_insights', 'Product')
+    ProductInsight = apps.get_model('review_insights', 'ProductInsight')
+    ReviewStats = apps.get_model('review_insights', 'ReviewStats')
+
+    batch = []
+    rows = ReviewInsight.objects.order_by('id').values_list('id', 'review__content')
+    for insight_id, content in rows.iterator(chunk_size=2000):
+        batch.append(ReviewInsight(id=insight_id, text_spam_score=spam_heuristic_score(content)))
+        if len(batch) >= 2000:
+            ReviewInsight.objects.bulk_update(batch, ['text_spam_score'])
+            batch = []
+    if batch:
+        ReviewInsight.objects.bulk_update(batch, ['text_spam_score'])
+
+    threshold = getattr(settings, 'REVIEW_SPAM_THRESHOLD', 0.6)
+    counted = Review.objects.filter(
+        models.Q(insight__spam_score__lt=threshold) | models.Q(insight__isnull=True)
+    ).order_by()
+    aggs = {row['product_id']: row for row in counted.values('product_id').annotate(**_counter_aggregates())}
+    insights = list(ProductInsight.objects.all())
+    for insight in insights:
+        agg = aggs.get(insight.product_id) or {}
+        insight.total_reviews = agg.get('total') or 0
+        insight.rating_sum = agg.get('rating_sum') or 0
+        insight.avg_rating = (insight.rating_sum / insight.total_reviews) if insight.total_reviews else 0.0
+        insight.sentiment_distribution = {k: agg.get(k) or 0 for k in SENTIMENT_KEYS}
+        insight.rating_distribution = {str(r): agg.get(f'rating_{r}') or 0 for r in RATING_VALUES}
+        # 计数口径变化，按版本号缓存的结果一并失效
+        insight.reviews_version += 1
+    ProductInsight.objects.bulk_update(insights, [
+        'total_reviews', 'rating_sum', 'avg_rating', 'sentiment_distribution',
+        'rating_distribution', 'reviews_version',
+    ], batch_size=500)
+
+    stats = ReviewStats.objects.filter(pk=1).first()
+    if stats is not None:
+        agg = counted.aggregate(**_counter_aggregates())
+        stats.total_products = Product.objects.count()
+        stats.total_reviews = agg['total'] or 0
+        stats.rating_sum = agg['rating_sum'] or 0
+        stats.sentiment_distribution = {k: agg[k] for k in SENTIMENT_KEYS}
+        stats.rating_distribution = {str(r): agg[f'rating_{r}'] for r in RATING_VALUES}
+        stats.version += 1
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0013_rebuild_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewinsight',
+            name='text_spam_score',
+            field=models.FloatField(default=0.0, verbose_name='文本垃圾分数'),
+        ),
+        migrations.RunPython(backfill_text_spam_score, migrations.RunPython.noop),
+    ]
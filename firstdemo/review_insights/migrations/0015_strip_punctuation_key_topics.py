@@ -0,0 +1,31 @@
+import re
+
+from django.db import migrations
+
+_WORD_RE = re.compile(r'\w')
+
+
+def strip_punctuation(apps, schema_editor):
+    """去掉已缓存分词结果中的标点/空白/emoji（与 nlp.is_word 一致），只改写有变化的行"""
+    ReviewInsight = apps.get_model('review_insights', 'ReviewInsight')
+    batch = []
+    for insight_id, key_topics in ReviewInsight.objects.order_by('id').values_list('id', 'key_topics').iterator(chunk_size=2000):
+        tokens = [t for t in (key_topics or []) if _WORD_RE.search(t or '')]
+        if tokens != (key_topics or []):
+            batch.append(ReviewInsight(id=insight_id, key_topics=tokens))
+        if len(batch) >= 2000:
+            ReviewInsight.objects.bulk_update(batch, ['key_topics'])
+            batch = []
+    if batch:
+        ReviewInsight.objects.bulk_update(batch, ['key_topics'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0014_review_insight_text_spam_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_punctuation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def confidence_to_percent(apps, schema_editor):
+    """置信度统一为 0-100 的百分数（页面按 % 展示）；旧版 import_excel 写入的 0-1 小数乘以 100"""
+    Review = apps.get_model('review_insights', 'Review')
+    Review.objects.filter(confidence__gt=0, confidence__lte=1).update(confidence=F('confidence') * 100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0015_strip_punctuation_key_topics'),
+    ]
+
+    operations = [
+        migrations.RunPython(confidence_to_percent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def rebuild_trends(apps, schema_editor):
+    """趋势行按“垃圾评论不计入”全量重建，与产品/全站计数器口径一致（迁移中不能依赖 trends 模块）"""
+    Review = apps.get_model('review_insights', 'Review')
+    ReviewTrend = apps.get_model('review_insights', 'ReviewTrend')
+    threshold = getattr(settings, 'REVIEW_SPAM_THRESHOLD', 0.6)
+    rows = Review.objects.filter(
+        models.Q(insight__spam_score__lt=threshold) | models.Q(insight__isnull=True)
+    ).order_by().annotate(day=TruncDate('created_at')).values('product_id', 'day').annotate(
+        review_count=models.Count('id'),
+        avg_rating=models.Avg('rating'),
+        positive=models.Count('id', filter=models.Q(sentiment='positive')),
+        negative=models.Count('id', filter=models.Q(sentiment='negative')),
+    )
+    trends = []
+    for row in rows:
+        count = row['review_count']
+        trends.append(ReviewTrend(
+            product_id=row['product_id'],
+            date=row['day'],
+            review_count=count,
+            avg_rating=round(float(row['avg_rating'] or 0), 4),
+            sentiment_score=round((row['positive'] - row['negative']) / count, 4) if count else 0.0,
+        ))
+    ReviewTrend.objects.all().delete()
+    ReviewTrend.objects.bulk_create(trends, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0016_review_confidence_percent'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_trends, migrations.RunPython.noop),
+    ]
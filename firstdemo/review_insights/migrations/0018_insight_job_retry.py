@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0017_rebuild_trends_without_spam'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightjob',
+            name='run_after',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='重试时间'),
+        ),
+    ]
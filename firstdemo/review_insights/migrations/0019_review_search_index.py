@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import DatabaseError, migrations, models, transaction
+
+REVIEW_TABLE = 'review_insights_review'
+TRIGRAM_INDEX = 'review_content_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    """PostgreSQL 建 pg_trgm 三元组索引，供全文检索漏检时做子串兜底
+
+    表达式与 icontains 生成的 UPPER(content) 一致；没有建扩展的权限时跳过，
+    检索端查不到索引就只走全文索引。
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(
+                f"CREATE INDEX {TRIGRAM_INDEX} ON {REVIEW_TABLE} USING GIN (UPPER(content) gin_trgm_ops)"
+            )
+    except DatabaseError:
+        pass
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('review_insights', '0018_insight_job_retry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSearchIndex',
+            fields=[
+                ('review', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='review_insights.review', verbose_name='评论')),
+                ('document', models.TextField(verbose_name='检索文本')),
+                ('rank', models.FloatField(verbose_name='相关度')),
+            ],
+            options={
+                'verbose_name': '全文索引',
+                'verbose_name_plural': '全文索引',
+                'db_table': 'review_insights_review_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,6 +1,58 @@
-from django.db import models
+import datetime
+import hashlib
+import random
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
+SENTIMENT_KEYS = ('positive', 'negative', 'neutral')
+RATING_VALUES = (1, 2, 3, 4, 5)
+# 购买规格中的内存组合，如 12GB+256GB、16G+1T
+SPEC_MEMORY_RE = re.compile(r'\d+\s*GB?\s*\+\s*\d+\s*[GT]B?', re.IGNORECASE)
+_SPEC_UNIT_RE = re.compile(r'(\d+)\s*([GT])B?', re.IGNORECASE)
+
+
+def counter_aggregates():
+    """计数器聚合表达式：总数、评分和、情感分布、评分分布，一次查询取回"""
+    return dict(
+        total=models.Count('id'),
+        rating_sum=models.Sum('rating'),
+        **{k: models.Count('id', filter=models.Q(sentiment=k)) for k in SENTIMENT_KEYS},
+        **{f'rating_{r}': models.Count('id', filter=models.Q(rating=r)) for r in RATING_VALUES},
+    )
+
+
+def spam_threshold():
+    return getattr(settings, 'REVIEW_SPAM_THRESHOLD', 0.6)
+
+
+def exclude_spam(reviews):
+    """聚合前排除垃圾分数达到阈值的评论；还没有洞察行的评论保留
+
+    计数器（产品洞察、全站统计）、聚类都只统计这部分评论。
+    """
+    return reviews.filter(models.Q(insight__spam_score__lt=spam_threshold()) | models.Q(insight__isnull=True))
+
+
+def merge_sentiment_counts(current, delta, clamp=True):
+    dist = {k: int((current or {}).get(k, 0) or 0) for k in SENTIMENT_KEYS}
+    for k, v in (delta or {}).items():
+        dist[k if k in dist else 'neutral'] += v
+    return {k: max(0, v) for k, v in dist.items()} if clamp else dist
+
+
+def merge_rating_counts(current, delta, clamp=True):
+    # JSON 键只能是字符串
+    dist = {str(r): int((current or {}).get(str(r), 0) or 0) for r in RATING_VALUES}
+    for k, v in (delta or {}).items():
+        k = str(k)
+        dist[k] = dist.get(k, 0) + v
+    return {k: max(0, v) for k, v in dist.items()} if clamp else dist
+
+
 class Product(models.Model):
     """产品模型"""
     name = models.CharField(max_length=200, verbose_name='产品名称')
@@ -16,6 +68,18 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的产品名，改名时信号据此重建检索文档
+        if 'name' in field_names:
+            instance._loaded_name = values[field_names.index('name')]
+        return instance
+
+class DuplicateReview(IntegrityError):
+    """评论与已有评论的内容指纹相同；在写库前抛出，不会打断所在事务"""
+
+
 class Review(models.Model):
     """评论模型"""
     SENTIMENT_CHOICES = [
@@ -37,17 +101,111 @@ class Review(models.Model):
     content = models.TextField(verbose_name='评论内容')
     rating = models.IntegerField(choices=RATING_CHOICES, verbose_name='评分')
     sentiment = models.CharField(max_length=20, choices=SENTIMENT_CHOICES, verbose_name='情感倾向')
+    # 0-100 的百分数，与 sentiment.SentimentResult.confidence 一致（迁移 0016 换算了旧的 0-1 取值）
     confidence = models.FloatField(default=0.0, verbose_name='情感置信度')
     created_at = models.DateTimeField(default=timezone.now, verbose_name='评论时间')
+    content_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False, verbose_name='内容指纹')
+    # 京东评价附带的结构化信息；spec 原样保存，颜色/内存拆出来建索引供按款式分组
+    spec = models.CharField(max_length=100, blank=True, default='', verbose_name='购买规格')
+    spec_color = models.CharField(max_length=50, blank=True, default='', verbose_name='颜色/版本')
+    spec_memory = models.CharField(max_length=50, blank=True, default='', verbose_name='内存规格')
+    follow_up = models.TextField(blank=True, default='', verbose_name='追加评论')
+    merchant_reply = models.TextField(blank=True, default='', verbose_name='商家回复')
     
     class Meta:
         verbose_name = '评论'
         verbose_name_plural = '评论'
         ordering = ['-created_at']
+        indexes = [
+            # reviews_list / api_reviews：按产品筛选并按时间倒序分页
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+            models.Index(fields=['product', 'sentiment'], name='review_product_sentiment_idx'),
+            models.Index(fields=['sentiment', 'rating', '-created_at'], name='review_sentiment_rating_idx'),
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+            # 按款式分组统计 / 筛选
+            models.Index(fields=['product', 'spec_color'], name='review_product_color_idx'),
+            models.Index(fields=['product', 'spec_memory'], name='review_product_memory_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.author}"
 
+    @staticmethod
+    def compute_content_hash(product_id, author, content, created_at):
+        """规范化 产品/作者/内容/日期 后计算 sha256 指纹，用于去重
+
+        日期按本地时区取到天：京东导出只有评价日期，同一作者同一天对同一产品发表的相同内容视为重复。
+        """
+        if isinstance(created_at, datetime.datetime):
+            if timezone.is_aware(created_at):
+                created_at = timezone.localtime(created_at)
+            created_at = created_at.date()
+        normalized = '\x1f'.join([
+            str(product_id),
+            (author or '').strip(),
+            ' '.join((content or '').split()),
+            created_at.isoformat() if created_at else '',
+        ])
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def fingerprint(self):
+        return self.compute_content_hash(self.product_id, self.author, self.content, self.created_at)
+
+    @staticmethod
+    def parse_spec(spec):
+        """'凌云 16GB+512GB' -> ('凌云', '16GB+512GB')；没有内存规格时整段作为颜色/版本"""
+        spec = ' '.join((spec or '').split())
+        match = SPEC_MEMORY_RE.search(spec)
+        if not match:
+            return spec[:50], ''
+        color = ' '.join((spec[:match.start()] + ' ' + spec[match.end():]).split())
+        memory = _SPEC_UNIT_RE.sub(lambda m: m.group(1) + m.group(2).upper() + 'B', match.group())
+        return color[:50], memory.replace(' ', '')
+
+    def fill_spec_fields(self):
+        """由 spec 拆出颜色/内存：新评论未显式给出时拆分，已有评论的 spec 被修改时重新拆分"""
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if 'spec' in loaded:
+            if loaded['spec'] != self.spec:
+                self.spec_color, self.spec_memory = self.parse_spec(self.spec)
+        elif self.spec and not (self.spec_color or self.spec_memory):
+            self.spec_color, self.spec_memory = self.parse_spec(self.spec)
+
+    def _new_content_hash(self):
+        """保存时写入的指纹；迁移 0004 留下的历史重复数据指纹为空，保持为空"""
+        if self.content_hash is None and not self._state.adding:
+            return None
+        return self.fingerprint()
+
+    def _is_duplicate(self, content_hash):
+        return content_hash is not None and Review.objects.filter(content_hash=content_hash).exclude(pk=self.pk).exists()
+
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude)
+        # content_hash 不可编辑，表单不会校验它；在这里给出表单错误而不是保存时报错
+        if self._is_duplicate(self._new_content_hash()):
+            raise ValidationError('同一作者当天已对该产品发表过相同内容的评论', code='duplicate')
+
+    def save(self, *args, **kwargs):
+        """与已有评论重复（同一产品、作者、内容、日期）时抛出 DuplicateReview，不写入数据库"""
+        self.fill_spec_fields()
+        content_hash = self._new_content_hash()
+        if self._is_duplicate(content_hash):
+            raise DuplicateReview(f'重复评论: {content_hash}')
+        self.content_hash = content_hash
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 记录加载时的取值，供信号计算增量（修改评分/情感/产品时）
+        instance._loaded_values = {f: v for f, v in zip(field_names, values) if v is not models.DEFERRED}
+        return instance
+
+def _counter_state(review):
+    """评论在计数器中的取值 (product_id, rating, sentiment)"""
+    return review.product_id, int(review.rating or 0), review.sentiment
+
 class ReviewInsight(models.Model):
     """评论洞察模型"""
     review = models.OneToOneField(Review, on_delete=models.CASCADE, related_name='insight', verbose_name='评论')
@@ -55,17 +213,43 @@ class ReviewInsight(models.Model):
     emotion_score = models.JSONField(default=dict, verbose_name='情感分数')
     word_count = models.IntegerField(default=0, verbose_name='词数')
     reading_time = models.IntegerField(default=0, verbose_name='阅读时间(分钟)')
+    # spam_score = max(文本规则分数, 近似重复组分数)，组变化时可升可降
     spam_score = models.FloatField(default=0.0, verbose_name='垃圾评论分数')
+    text_spam_score = models.FloatField(default=0.0, verbose_name='文本垃圾分数')
     helpful_votes = models.IntegerField(default=0, verbose_name='有用投票')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='分析时间')
     
     class Meta:
         verbose_name = '评论洞察'
         verbose_name_plural = '评论洞察'
+        indexes = [
+            # 接口按垃圾分数过滤、按词数排序
+            models.Index(fields=['spam_score'], name='reviewinsight_spam_idx'),
+            models.Index(fields=['-word_count'], name='reviewinsight_words_idx'),
+        ]
     
     def __str__(self):
         return f"洞察: {self.review}"
 
+    @classmethod
+    def build_for_review(cls, review):
+        """生成评论的分词缓存与预计算特征（未保存）"""
+        from .analysis import analyze_text
+        return cls(review=review, **analyze_text(review.content))
+
+    @classmethod
+    def create_for_reviews(cls, reviews, batch_size=1000):
+        """批量导入钩子：为新评论一次性写入分词结果与特征
+
+        评论已按非垃圾计入计数器，文本规则判为垃圾的在这里移出。
+        """
+        insights = cls.objects.bulk_create([cls.build_for_review(r) for r in reviews], batch_size=batch_size)
+        threshold = spam_threshold()
+        ProductInsight.record_spam_changes(
+            marked=[_counter_state(i.review) for i in insights if i.spam_score >= threshold],
+        )
+        return insights
+
 class ProductInsight(models.Model):
     """产品洞察模型"""
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='insight', verbose_name='产品')
@@ -73,6 +257,9 @@ class ProductInsight(models.Model):
     avg_rating = models.FloatField(default=0.0, verbose_name='平均评分')
     sentiment_distribution = models.JSONField(default=dict, verbose_name='情感分布')
     common_topics = models.JSONField(default=list, verbose_name='常见话题')
+    rating_sum = models.IntegerField(default=0, verbose_name='评分总和')
+    rating_distribution = models.JSONField(default=dict, verbose_name='评分分布')
+    reviews_version = models.PositiveIntegerField(default=0, verbose_name='评论集版本')
     last_updated = models.DateTimeField(auto_now=True, verbose_name='最后更新')
     
     class Meta:
@@ -82,35 +269,388 @@ class ProductInsight(models.Model):
     def __str__(self):
         return f"洞察: {self.product.name}"
     
+    @classmethod
+    def for_product(cls, product):
+        """读取产品洞察；首次创建时做一次全量计算，之后由信号增量维护"""
+        insight, created = cls.objects.get_or_create(product=product)
+        if created:
+            insight.update_insights()
+        return insight
+
+    @classmethod
+    def for_products(cls, products):
+        """批量读取产品洞察：一次查询取已有行，缺失的用一次分组聚合补建"""
+        products = list(products)
+        insights = {i.product_id: i for i in cls.objects.filter(product__in=products)}
+        missing = [p for p in products if p.id not in insights]
+        if missing:
+            rows = exclude_spam(Review.objects.filter(product__in=missing)).order_by().values('product_id').annotate(**counter_aggregates())
+            aggs = {row['product_id']: row for row in rows}
+            new_rows = []
+            for p in missing:
+                agg = aggs.get(p.id) or {}
+                insight = cls(
+                    product=p,
+                    total_reviews=agg.get('total') or 0,
+                    rating_sum=agg.get('rating_sum') or 0,
+                    sentiment_distribution={k: agg.get(k) or 0 for k in SENTIMENT_KEYS},
+                    rating_distribution={str(r): agg.get(f'rating_{r}') or 0 for r in RATING_VALUES},
+                )
+                insight._derive_avg_rating()
+                new_rows.append(insight)
+            for insight in cls.objects.bulk_create(new_rows):
+                insights[insight.product_id] = insight
+        result = []
+        for p in products:
+            insight = insights[p.id]
+            insight.product = p
+            result.append(insight)
+        return result
+
+    @classmethod
+    def apply_review_delta(cls, product_id, count=0, rating_sum=0, sentiments=None, ratings=None, update_stats=True):
+        """按增量更新计数器，count/rating_sum/sentiments/ratings 可为负数（删除）
+
+        update_stats=False 时不写全站统计，由调用方把多个产品的增量合并后写一次。
+        """
+        with transaction.atomic():
+            if update_stats:
+                ReviewStats.apply_delta(count=count, rating_sum=rating_sum, sentiments=sentiments, ratings=ratings)
+            insight = cls.objects.select_for_update().filter(product_id=product_id).first()
+            if insight is None:
+                # 还没有洞察行：新增评论时全量建一次，删除时无需处理
+                if count > 0:
+                    insight = cls.objects.create(product_id=product_id)
+                    insight.refresh_counters()
+                    insight.save()
+                    InsightJob.enqueue_recompute([product_id])
+                return
+            insight.total_reviews = max(0, insight.total_reviews + count)
+            insight.rating_sum = max(0, insight.rating_sum + rating_sum)
+            insight.sentiment_distribution = merge_sentiment_counts(insight.sentiment_distribution, sentiments)
+            insight.rating_distribution = merge_rating_counts(insight.rating_distribution, ratings)
+            insight._derive_avg_rating()
+            # 评论集变化即递增版本号，聚类缓存据此失效
+            insight.reviews_version += 1
+            insight.save(update_fields=[
+                'total_reviews', 'rating_sum', 'avg_rating', 'sentiment_distribution',
+                'rating_distribution', 'reviews_version', 'last_updated',
+            ])
+            # 聚类等重计算交给后台任务，多次写入合并为一次
+            InsightJob.enqueue_recompute([product_id])
+
+    @classmethod
+    def touch(cls, product_id):
+        """评论的展示字段（作者、追评等）变化：计数和聚类不受影响，只刷新最后更新时间使 ETag 失效"""
+        cls.objects.filter(product_id=product_id).update(last_updated=timezone.now())
+
+    @classmethod
+    def record_reviews_added(cls, reviews):
+        """批量导入钩子：bulk_create 不触发信号，按产品合并增量后一次写入"""
+        cls._apply_state_deltas([(_counter_state(r), 1) for r in reviews])
+
+    @classmethod
+    def record_spam_changes(cls, marked=(), cleared=()):
+        """垃圾分数跨过阈值时调整计数器：marked 新判为垃圾（移出），cleared 不再是垃圾（计回）
+
+        元素为 (product_id, rating, sentiment)。
+        """
+        cls._apply_state_deltas([(state, -1) for state in marked] + [(state, 1) for state in cleared])
+
+    @classmethod
+    def _apply_state_deltas(cls, signed_states):
+        """[((product_id, rating, sentiment), +1/-1)] 按产品合并为一次 apply_review_delta，全站统计只写一次"""
+        if not signed_states:
+            return
+        deltas = {}
+        total = {'count': 0, 'rating_sum': 0, 'sentiments': {}, 'ratings': {}}
+        for (product_id, rating, sentiment), sign in signed_states:
+            per_product = deltas.setdefault(product_id, {'count': 0, 'rating_sum': 0, 'sentiments': {}, 'ratings': {}})
+            for d in (per_product, total):
+                d['count'] += sign
+                d['rating_sum'] += sign * int(rating or 0)
+                d['sentiments'][sentiment] = d['sentiments'].get(sentiment, 0) + sign
+                d['ratings'][rating] = d['ratings'].get(rating, 0) + sign
+        with transaction.atomic():
+            ReviewStats.apply_delta(**total)
+            for product_id, d in deltas.items():
+                cls.apply_review_delta(product_id, update_stats=False, **d)
+
+    def _derive_avg_rating(self):
+        self.avg_rating = (self.rating_sum / self.total_reviews) if self.total_reviews else 0.0
+
+    def refresh_counters(self):
+        """用一次聚合查询重算计数器（不保存），垃圾评论不计入"""
+        agg = exclude_spam(self.product.reviews.all()).aggregate(**counter_aggregates())
+        self.total_reviews = agg['total'] or 0
+        self.rating_sum = agg['rating_sum'] or 0
+        self.sentiment_distribution = {k: agg[k] for k in SENTIMENT_KEYS}
+        self.rating_distribution = {str(r): agg[f'rating_{r}'] for r in RATING_VALUES}
+        self._derive_avg_rating()
+
     def update_insights(self):
-        """更新产品洞察数据"""
-        reviews = self.product.reviews.all()
-        self.total_reviews = reviews.count()
-        
-        if self.total_reviews > 0:
-            # 计算平均评分
-            self.avg_rating = reviews.aggregate(models.Avg('rating'))['rating__avg'] or 0
-            
-            # 计算情感分布
-            sentiment_dist = {
-                'positive': reviews.filter(sentiment='positive').count(),
-                'negative': reviews.filter(sentiment='negative').count(),
-                'neutral': reviews.filter(sentiment='neutral').count(),
-            }
-            self.sentiment_distribution = sentiment_dist
-            
-            # 获取常见话题（这里简化处理）
-            # 实际应用中可能需要更复杂的NLP处理
-            self.common_topics = self.extract_common_topics(reviews)
-            
-            self.save()
+        """全量重算产品洞察数据（计数器 + 常见话题）"""
+        with transaction.atomic():
+            # 行锁内重算计数器，不会与信号的增量更新交错；reviews_version 只由 apply_review_delta 递增
+            locked = ProductInsight.objects.select_for_update().get(pk=self.pk)
+            self.reviews_version = locked.reviews_version
+            self.refresh_counters()
+            self.save(update_fields=[
+                'total_reviews', 'rating_sum', 'avg_rating', 'sentiment_distribution',
+                'rating_distribution', 'last_updated',
+            ])
+        self.refresh_topics()
+
+    def refresh_topics(self):
+        """只重算常见话题（后台任务调用）
+
+        聚类耗时较长，在锁外计算；写回时只更新 common_topics，计数器和 reviews_version
+        以数据库中的为准，不会被这里读到的旧值覆盖。
+        """
+        # 获取常见话题（这里简化处理）
+        # 实际应用中可能需要更复杂的NLP处理
+        topics = self.extract_common_topics() if self.total_reviews > 0 else []
+        with transaction.atomic():
+            locked = ProductInsight.objects.select_for_update().get(pk=self.pk)
+            locked.common_topics = topics
+            locked.save(update_fields=['common_topics', 'last_updated'])
+        self.common_topics = topics
     
-    def extract_common_topics(self, reviews):
-        from .nlp import extract_product_clusters
-        clusters = extract_product_clusters(reviews)
+    def extract_common_topics(self):
+        from .cluster_store import get_product_clusters
+        clusters = get_product_clusters(self.product, insight=self)
         labels = [c['label'] for c in clusters[:5]]
         return labels
 
+class ReviewSearchDocument(models.Model):
+    """评论全文检索文档：jieba 分词后以空格拼接，由 FTS5 / PostgreSQL 全文索引收录"""
+    review = models.OneToOneField(Review, on_delete=models.CASCADE, primary_key=True, related_name='search_document', verbose_name='评论')
+    document = models.TextField(blank=True, verbose_name='检索文本')
+
+    class Meta:
+        verbose_name = '检索文档'
+        verbose_name_plural = '检索文档'
+
+    def __str__(self):
+        return f"检索: {self.review_id}"
+
+class ReviewSearchIndex(models.Model):
+    """SQLite FTS5 倒排索引（迁移 0007 建的虚拟表，由触发器同步），只读，检索时与评论表联接
+
+    rowid 即评论 ID；rank 为 FTS5 隐藏列，MATCH 查询中等于 bm25()，越小越相关。
+    PostgreSQL 下没有这张表，检索直接用 ReviewSearchDocument 上的 GIN 索引。
+    """
+    review = models.OneToOneField(
+        Review, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        db_constraint=False, related_name='search_index', verbose_name='评论',
+    )
+    document = models.TextField(verbose_name='检索文本')
+    rank = models.FloatField(verbose_name='相关度')
+
+    class Meta:
+        managed = False
+        db_table = 'review_insights_review_fts'
+        verbose_name = '全文索引'
+        verbose_name_plural = '全文索引'
+
+class ReviewFingerprint(models.Model):
+    """评论 SimHash 指纹，用于近似重复检测
+
+    64 位指纹拆成 4 段 16 位分别建索引：海明距离 <= 3 的两条评论至少有一段完全相同，
+    按段等值查询即可取到候选，无需两两比较。group_id 为同组最早评论的 ID。
+    """
+    review = models.OneToOneField(Review, on_delete=models.CASCADE, primary_key=True, related_name='simhash', verbose_name='评论')
+    simhash = models.BigIntegerField(verbose_name='SimHash')
+    band0 = models.IntegerField(db_index=True)
+    band1 = models.IntegerField(db_index=True)
+    band2 = models.IntegerField(db_index=True)
+    band3 = models.IntegerField(db_index=True)
+    group_id = models.BigIntegerField(db_index=True, verbose_name='近似重复组')
+
+    class Meta:
+        verbose_name = '评论指纹'
+        verbose_name_plural = '评论指纹'
+
+    def __str__(self):
+        return f"指纹: {self.review_id} (组 {self.group_id})"
+
+class ReviewStats(models.Model):
+    """全站评论统计（物化表），随评论/产品写入增量维护
+
+    计数分散在 REVIEW_STATS_SHARDS 个分片行上：每次写入随机锁一行，并发写入者很少互相等待；
+    读取时把各分片相加。单个分片的计数可以为负，只有总和才有意义。
+    """
+    total_products = models.IntegerField(default=0, verbose_name='产品数')
+    total_reviews = models.IntegerField(default=0, verbose_name='总评论数')
+    rating_sum = models.IntegerField(default=0, verbose_name='评分总和')
+    sentiment_distribution = models.JSONField(default=dict, verbose_name='情感分布')
+    rating_distribution = models.JSONField(default=dict, verbose_name='评分分布')
+    version = models.PositiveIntegerField(default=0, verbose_name='版本')
+    last_updated = models.DateTimeField(auto_now=True, verbose_name='最后更新')
+
+    # 全量重算的结果写在这一行，其余分片只累计增量
+    BASE_SHARD = 1
+
+    class Meta:
+        verbose_name = '全站统计'
+        verbose_name_plural = '全站统计'
+
+    def __str__(self):
+        return f"全站统计 v{self.version}"
+
+    @property
+    def avg_rating(self):
+        return (self.rating_sum / self.total_reviews) if self.total_reviews else 0.0
+
+    @staticmethod
+    def shard_count():
+        return max(1, getattr(settings, 'REVIEW_STATS_SHARDS', 16))
+
+    @classmethod
+    def current(cls):
+        """各分片相加后的统计（未保存的实例）；版本号为各分片版本之和，任一分片写入都会变化"""
+        shards = list(cls.objects.all())
+        if not shards:
+            return cls.rebuild()
+        stats = cls(
+            pk=None,
+            total_products=max(0, sum(s.total_products for s in shards)),
+            total_reviews=max(0, sum(s.total_reviews for s in shards)),
+            rating_sum=max(0, sum(s.rating_sum for s in shards)),
+            version=sum(s.version for s in shards),
+            last_updated=max(s.last_updated for s in shards),
+        )
+        sentiments = {}
+        ratings = {}
+        for s in shards:
+            sentiments = merge_sentiment_counts(sentiments, s.sentiment_distribution, clamp=False)
+            ratings = merge_rating_counts(ratings, s.rating_distribution, clamp=False)
+        stats.sentiment_distribution = merge_sentiment_counts(sentiments, None)
+        stats.rating_distribution = merge_rating_counts(ratings, None)
+        return stats
+
+    @classmethod
+    def rebuild(cls):
+        """全量重算（首次使用或数据修复时）：结果写入基准分片，其余分片清除"""
+        agg = exclude_spam(Review.objects.all()).aggregate(**counter_aggregates())
+        with transaction.atomic():
+            # 版本号接着原来的总和递增，ETag 不会与重算前的某个版本重复
+            version = sum(cls.objects.select_for_update().values_list('version', flat=True)) + 1
+            cls.objects.exclude(pk=cls.BASE_SHARD).delete()
+            stats, _ = cls.objects.update_or_create(pk=cls.BASE_SHARD, defaults={
+                'total_products': Product.objects.count(),
+                'total_reviews': agg['total'] or 0,
+                'rating_sum': agg['rating_sum'] or 0,
+                'sentiment_distribution': {k: agg[k] for k in SENTIMENT_KEYS},
+                'rating_distribution': {str(r): agg[f'rating_{r}'] for r in RATING_VALUES},
+                'version': version,
+            })
+        return stats
+
+    @classmethod
+    def apply_delta(cls, products=0, count=0, rating_sum=0, sentiments=None, ratings=None):
+        shard = random.randint(1, cls.shard_count())
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(pk=shard).first()
+            if stats is None:
+                if not cls.objects.exists():
+                    # 第一次写入时全量建一次，已包含本次变更
+                    cls.rebuild()
+                    return
+                stats, _ = cls.objects.get_or_create(pk=shard)
+                stats = cls.objects.select_for_update().get(pk=shard)
+            stats.total_products += products
+            stats.total_reviews += count
+            stats.rating_sum += rating_sum
+            stats.sentiment_distribution = merge_sentiment_counts(stats.sentiment_distribution, sentiments, clamp=False)
+            stats.rating_distribution = merge_rating_counts(stats.rating_distribution, ratings, clamp=False)
+            stats.version += 1
+            stats.save()
+
+class ProductClusterCache(models.Model):
+    """产品话题聚类结果缓存，按评论集版本失效"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cluster_caches', verbose_name='产品')
+    params = models.CharField(max_length=50, verbose_name='聚类参数')
+    version = models.PositiveIntegerField(default=0, verbose_name='评论集版本')
+    clusters = models.JSONField(default=list, verbose_name='聚类结果')
+    computed_at = models.DateTimeField(default=timezone.now, verbose_name='计算时间')
+    last_accessed = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='最近访问')
+
+    class Meta:
+        verbose_name = '聚类缓存'
+        verbose_name_plural = '聚类缓存'
+        unique_together = ['product', 'params']
+
+    def __str__(self):
+        return f"{self.product.name} - {self.params} (v{self.version})"
+
+class InsightJob(models.Model):
+    """后台洞察重算任务队列，由 run_insight_jobs 命令消费
+
+    同一产品同一类型最多一个 pending 任务，多次写入合并为一次重算。
+    执行失败的任务按指数退避重新排队（run_after 之后才会被领取），达到 INSIGHT_JOB_MAX_ATTEMPTS 次后标记为失败。
+    """
+    KIND_RECOMPUTE = 'recompute'
+    KIND_CHOICES = [
+        (KIND_RECOMPUTE, '重算产品洞察'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '排队中'),
+        (STATUS_RUNNING, '执行中'),
+        (STATUS_DONE, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='insight_jobs', verbose_name='产品')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_RECOMPUTE, verbose_name='任务类型')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='状态')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='执行次数')
+    error = models.TextField(blank=True, verbose_name='错误信息')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='创建时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    run_after = models.DateTimeField(null=True, blank=True, verbose_name='重试时间')
+
+    class Meta:
+        verbose_name = '洞察任务'
+        verbose_name_plural = '洞察任务'
+        constraints = [
+            # 合并排队：数据库层保证并发写入也只留一个 pending 任务
+            models.UniqueConstraint(
+                fields=['product', 'kind'],
+                condition=models.Q(status='pending'),
+                name='insightjob_one_pending',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='insightjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.kind} ({self.status})"
+
+    @classmethod
+    def enqueue_recompute(cls, product_ids):
+        """排队重算，事务提交后才写入（回滚或产品被级联删除时不会留下任务）"""
+        product_ids = set(product_ids)
+        if product_ids:
+            transaction.on_commit(lambda: cls._enqueue(product_ids, cls.KIND_RECOMPUTE))
+
+    @classmethod
+    def _enqueue(cls, product_ids, kind):
+        pending = set(cls.objects.filter(
+            product_id__in=product_ids, kind=kind, status=cls.STATUS_PENDING,
+        ).values_list('product_id', flat=True))
+        missing = Product.objects.filter(id__in=product_ids - pending).values_list('id', flat=True)
+        cls.objects.bulk_create(
+            [cls(product_id=pid, kind=kind) for pid in missing],
+            ignore_conflicts=True,
+        )
+
 class ReviewTrend(models.Model):
     """评论趋势模型"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='trends', verbose_name='产品')
@@ -124,6 +664,10 @@ class ReviewTrend(models.Model):
         verbose_name_plural = '评论趋势'
         unique_together = ['product', 'date']
         ordering = ['-date']
+        indexes = [
+            # analytics 未选产品时按日期区间查询
+            models.Index(fields=['date'], name='reviewtrend_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product.name} - {self.date}"
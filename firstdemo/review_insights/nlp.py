@@ -30,9 +30,15 @@ def _safe_tokenize(text):
     except Exception:
         return re.findall(r"[\w\-]+", text or '')
 
+_WORD_RE = re.compile(r"\w")
+
+def is_word(t):
+    """含字母/数字/汉字的词；标点、空白、emoji 不算"""
+    return bool(_WORD_RE.search(t or ''))
+
 def _normalize_token(t):
     t = t.strip().lower()
-    if not t or t in STOPWORDS:
+    if not is_word(t) or t in STOPWORDS:
         return ''
     if re.match(r"^[0-9]+$", t):
         return ''
@@ -46,22 +52,44 @@ def _clean_tokens(tokens):
             out.append(nt)
     return out
 
+def tokenize_text(text):
+    """分词并清洗，入库时调用一次，结果存到 ReviewInsight.key_topics"""
+    return _clean_tokens(_safe_tokenize(text))
+
+def tokenize_with_count(text):
+    """只切一次词，同时返回清洗后的话题词与原始词数（含停用词，不含标点空白）"""
+    raw = _safe_tokenize(text)
+    word_count = sum(1 for w in raw if is_word(w))
+    return _clean_tokens(raw), word_count
+
+def review_tokens(review):
+    """优先读取入库时缓存的分词结果，缺失时现场分词"""
+    insight = getattr(review, 'insight', None)
+    if insight is not None and insight.key_topics:
+        return list(insight.key_topics)
+    return tokenize_text(review.content)
+
 def extract_product_clusters(reviews, n_clusters=5, top_tokens=3):
-    texts = []
     sentiments = []
+    token_lists = []
     for r in reviews:
-        texts.append(r.content or '')
         sentiments.append(r.sentiment)
-    if not texts:
+        token_lists.append(review_tokens(r))
+    return cluster_token_lists(sentiments, token_lists, n_clusters, top_tokens)
+
+def cluster_token_lists(sentiments, token_lists, n_clusters=5, top_tokens=3):
+    """extract_product_clusters 的核心，输入为已分词的列表，便于在子进程中直接使用 values_list 结果"""
+    if not token_lists:
         return []
-    docs = [' '.join(_clean_tokens(_safe_tokenize(t))) for t in texts]
+    docs = [' '.join(tl) for tl in token_lists]
     try:
         from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.cluster import KMeans
         k = max(1, min(n_clusters, len(docs)))
         vec = TfidfVectorizer(token_pattern=r"(?u)\b\w+\b")
         X = vec.fit_transform(docs)
-        km = KMeans(n_clusters=k, n_init=10)
+        # 固定随机种子：并行与串行、多次重算的结果一致，常见话题不会无故变化
+        km = KMeans(n_clusters=k, n_init=10, random_state=0)
         km.fit(X)
         labels = km.labels_.tolist()
         terms = vec.get_feature_names_out()
@@ -88,7 +116,6 @@ def extract_product_clusters(reviews, n_clusters=5, top_tokens=3):
         clusters.sort(key=lambda x: x['score'], reverse=True)
         return clusters
     except Exception:
-        token_lists = [ _clean_tokens(_safe_tokenize(t)) for t in texts ]
         flat = []
         for tl in token_lists:
             flat.extend(tl)
@@ -132,13 +159,15 @@ def build_global_clusters(reviews, n_clusters=8, top_tokens=3, evidence_per_clus
     texts = []
     sentiments = []
     objs = []
+    token_lists = []
     for r in reviews:
         texts.append(r.content or '')
         sentiments.append(r.sentiment)
         objs.append(r)
+        token_lists.append(review_tokens(r))
     if not texts:
         return []
-    docs = [' '.join(_clean_tokens(_safe_tokenize(t))) for t in texts]
+    docs = [' '.join(tl) for tl in token_lists]
     try:
         from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.cluster import KMeans
@@ -173,7 +202,6 @@ def build_global_clusters(reviews, n_clusters=8, top_tokens=3, evidence_per_clus
             clusters.append({'label': label, 'positive': pos, 'negative': neg, 'neutral': neu, 'samples': samples})
         return clusters
     except Exception:
-        token_lists = [ _clean_tokens(_safe_tokenize(t)) for t in texts ]
         flat = []
         for tl in token_lists:
             flat.extend(tl)
@@ -196,4 +224,92 @@ def build_global_clusters(reviews, n_clusters=8, top_tokens=3, evidence_per_clus
                     if len(samples) < evidence_per_cluster:
                         samples.append(texts[i][:200])
             clusters.append({'label': cw, 'positive': pos, 'negative': neg, 'neutral': neu, 'samples': samples})
-        return clusters
\ No newline at end of file
+        return clusters
+
+def _stream_review_rows(reviews, chunk_size):
+    """逐块读取 (内容, 情感, 分词)，不实例化 Review 对象"""
+    rows = reviews.order_by().values_list('content', 'sentiment', 'insight__key_topics')
+    for content, sentiment, key_topics in rows.iterator(chunk_size=chunk_size):
+        content = content or ''
+        tokens = list(key_topics) if key_topics else tokenize_text(content)
+        yield content, sentiment, tokens
+
+def _sentiment_tally():
+    return {'positive': 0, 'negative': 0, 'neutral': 0, 'samples': []}
+
+def _tally_row(tally, sentiment, content, evidence_per_cluster):
+    key = sentiment if sentiment in ('positive', 'negative') else 'neutral'
+    tally[key] += 1
+    if len(tally['samples']) < evidence_per_cluster:
+        tally['samples'].append(content[:200])
+
+def build_global_clusters_streaming(reviews, n_clusters=8, top_tokens=3, evidence_per_cluster=2,
+                                    sample_size=20000, chunk_size=2000, seed=0):
+    """build_global_clusters 的流式版本，内存占用与评论总数无关
+
+    第一遍用蓄水池抽样取最多 sample_size 条拟合 TF-IDF + KMeans，
+    第二遍按 chunk_size 分块 transform/predict 统计每个簇的情感分布与证据样本。
+    评论总数不超过 sample_size 时样本即全集，省掉第二遍查询。
+    reviews 需为 QuerySet，返回结构与 build_global_clusters 相同。
+    """
+    import random
+    rng = random.Random(seed)
+    sample = []
+    seen = 0
+    for row in _stream_review_rows(reviews, chunk_size):
+        seen += 1
+        if len(sample) < sample_size:
+            sample.append(row)
+        else:
+            j = rng.randrange(seen)
+            if j < sample_size:
+                sample[j] = row
+    if not sample:
+        return []
+    # 样本即全集时直接在样本上分配，否则再流式读一遍
+    complete = seen <= sample_size
+
+    def all_rows():
+        return iter(sample) if complete else _stream_review_rows(reviews, chunk_size)
+
+    try:
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.cluster import KMeans
+        docs = [' '.join(tokens) for _, _, tokens in sample]
+        k = max(1, min(n_clusters, len(docs)))
+        vec = TfidfVectorizer(token_pattern=r"(?u)\b\w+\b")
+        km = KMeans(n_clusters=k, n_init=10, random_state=seed)
+        km.fit(vec.fit_transform(docs))
+        terms = vec.get_feature_names_out()
+        order_centroids = km.cluster_centers_.argsort()[:, ::-1]
+        tallies = [_sentiment_tally() for _ in range(k)]
+
+        def assign(chunk):
+            labels = km.predict(vec.transform([' '.join(tokens) for _, _, tokens in chunk]))
+            for (content, sentiment, _), c in zip(chunk, labels):
+                _tally_row(tallies[c], sentiment, content, evidence_per_cluster)
+
+        chunk = []
+        for row in all_rows():
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                assign(chunk)
+                chunk = []
+        if chunk:
+            assign(chunk)
+        clusters = []
+        for i in range(k):
+            top = [terms[ind] for ind in order_centroids[i, :top_tokens]]
+            label = '·'.join([SYNONYMS.get(t, t) for t in top])
+            clusters.append({'label': label, **tallies[i]})
+        return clusters
+    except Exception:
+        flat = Counter()
+        for _, _, tokens in sample:
+            flat.update(tokens)
+        common = [w for w, _ in flat.most_common(n_clusters)]
+        tallies = {w: _sentiment_tally() for w in common}
+        for content, sentiment, tokens in all_rows():
+            for w in set(tokens).intersection(tallies):
+                _tally_row(tallies[w], sentiment, content, evidence_per_cluster)
+        return [{'label': w, **tallies[w]} for w in common]
@@ -0,0 +1,52 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(review, direction):
+    """把 (created_at, id) 编码为不透明游标，direction 为 'next' 或 'prev'"""
+    raw = json.dumps({'t': review.created_at.isoformat(), 'i': review.id, 'd': direction[0]})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return datetime.fromisoformat(data['t']), int(data['i']), 'prev' if data['d'] == 'p' else 'next'
+    except Exception:
+        raise InvalidCursor(token)
+
+
+def keyset_page(queryset, cursor=None, page_size=10):
+    """按 (created_at, id) 倒序做游标分页，不做 OFFSET 扫描也不做 COUNT
+
+    返回 (本页评论列表, next 游标或 None, prev 游标或 None)。
+    """
+    direction = 'next'
+    if cursor:
+        created_at, review_id, direction = decode_cursor(cursor)
+        if direction == 'next':
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=review_id))
+        else:
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=review_id))
+    if direction == 'next':
+        rows = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    else:
+        rows = list(queryset.order_by('created_at', 'id')[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, bool(cursor)
+    next_cursor = encode_cursor(rows[-1], 'next') if rows and has_next else None
+    prev_cursor = encode_cursor(rows[0], 'prev') if rows and has_previous else None
+    return rows, next_cursor, prev_cursor
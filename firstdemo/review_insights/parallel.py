@@ -0,0 +1,33 @@
+"""多进程重算用的子进程入口
+
+本模块顶层不导入模型：spawn/forkserver 模式下子进程反序列化任务时会先导入本模块，
+此时 Django 还没有 setup，模型在函数内部导入。
+"""
+import os
+
+
+def init_worker():
+    """子进程初始化：重新 setup Django；每个进程只用单线程做 BLAS/OpenMP，避免超订"""
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    import django
+    django.setup()
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def compute_product_clusters(product_id, n_clusters=5, top_tokens=3):
+    """计算单个产品的聚类，只读 values_list，不实例化模型；返回 (产品ID, 评论集版本, 聚类)"""
+    from .models import ProductInsight, Review, exclude_spam
+    from .nlp import cluster_token_lists, tokenize_text
+    # 先读版本号再读评论：计算期间有新评论时版本对不上，结果会被视为过期
+    version = ProductInsight.objects.filter(product_id=product_id).values_list('reviews_version', flat=True).first() or 0
+    sentiments = []
+    token_lists = []
+    rows = exclude_spam(Review.objects.filter(product_id=product_id)).order_by().values_list('content', 'sentiment', 'insight__key_topics')
+    for content, sentiment, key_topics in rows.iterator(chunk_size=2000):
+        sentiments.append(sentiment)
+        token_lists.append(list(key_topics) if key_topics else tokenize_text(content))
+    return product_id, version, cluster_token_lists(sentiments, token_lists, n_clusters, top_tokens)
@@ -0,0 +1,103 @@
+"""评论导出文件的流式读取
+
+按扩展名选择读取方式，逐行产出 {列名: 值}，不把整个文件载入内存：
+
+- .xlsx/.xlsm：openpyxl 只读模式逐行迭代（默认读第一个工作表）
+- .csv：标准库 csv 逐行读取，兼容带 BOM 的 UTF-8（Excel 导出）
+- .jsonl/.ndjson：每行一个 JSON 对象（crawl_reviews 的暂存文件即此格式）
+- .parquet：pyarrow 按 record batch 读取，需要安装 pyarrow
+
+iter_chunks 再把行按固定条数分块，配合 bulk_insert_reviews 批量入库，内存占用与文件大小无关。
+"""
+import csv
+import glob
+import json
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def iter_xlsx(path):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = [str(h).strip() if h is not None else '' for h in header]
+        for values in rows:
+            if values is None or all(v is None for v in values):
+                continue
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def iter_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_parquet(path, batch_size=5000):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImproperlyConfigured('读取 Parquet 文件需要安装 pyarrow')
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
+
+
+READERS = {
+    '.xlsx': iter_xlsx,
+    '.xlsm': iter_xlsx,
+    '.csv': iter_csv,
+    '.jsonl': iter_jsonl,
+    '.ndjson': iter_jsonl,
+    '.parquet': iter_parquet,
+}
+
+
+def iter_rows(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f'不支持的文件格式: {path}（可选: {", ".join(sorted(READERS))}）')
+    return READERS[ext](path)
+
+
+def iter_chunks(path, chunk_size=1000):
+    """按 chunk_size 行分块产出"""
+    chunk = []
+    for row in iter_rows(path):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def expand_paths(patterns):
+    """展开路径与通配符（支持 ** 递归），按参数顺序、同一通配符内按名称排序并去重，返回 (文件列表, 没有匹配的参数)"""
+    paths = []
+    missing = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else (
+            [pattern] if os.path.exists(pattern) else []
+        )
+        matches = [m for m in matches if os.path.isfile(m)]
+        if not matches:
+            missing.append(pattern)
+        for m in matches:
+            if m not in paths:
+                paths.append(m)
+    return paths, missing
@@ -0,0 +1,187 @@
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, Func, Lookup, Q, Value
+
+from .models import ReviewSearchDocument, ReviewSearchIndex
+from .nlp import is_word
+
+FTS_TABLE = ReviewSearchIndex._meta.db_table
+TRIGRAM_INDEX = 'review_content_trgm'
+TRIGRAM_MIN_LENGTH = 3
+
+
+def search_tokens(text):
+    """检索用分词：jieba 搜索引擎模式的原始词（长词再切出短词），只去掉标点空白并转小写
+
+    与话题分词（nlp.tokenize_text）不同，不做同义词归并、不去停用词：
+    搜“做工”不应命中只写了“质量”的评论，文档与查询用同一套切分才能对上。
+    """
+    try:
+        import jieba
+        words = jieba.cut_for_search(text or '')
+    except Exception:
+        words = re.findall(r"[\w\-]+", text or '')
+    return [w.strip().lower() for w in words if is_word(w)]
+
+
+class FTSMatch(Lookup):
+    """SQLite：<FTS5 列> MATCH <查询>，作为查询条件才会让 FTS 表以 INNER JOIN 驱动"""
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class TsMatch(Lookup):
+    """PostgreSQL：to_tsvector('simple', document) @@ to_tsquery('simple', 查询)
+
+    左侧表达式与迁移 0007 的 GIN 索引逐字一致，规划器才会走索引
+    （SearchVector 会包一层 COALESCE，匹配不上索引表达式）。
+    """
+    lookup_name = 'tsmatch'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"to_tsvector('simple', {lhs}) @@ to_tsquery('simple', {rhs})", lhs_params + rhs_params
+
+
+# 只注册在这两个字段实例上，不影响其他 TextField
+ReviewSearchIndex._meta.get_field('document').register_lookup(FTSMatch)
+ReviewSearchDocument._meta.get_field('document').register_lookup(TsMatch)
+
+
+class _TsRank(Func):
+    arg_joiner = "), to_tsquery('simple', "
+    template = "ts_rank(to_tsvector('simple', %(expressions)s))"
+    output_field = FloatField()
+
+
+class SQLiteFTSBackend:
+    """SQLite FTS5 倒排索引，bm25 越小越相关"""
+    # 与评论表联接一次：MATCH 过滤和 rank 隐藏列（即 bm25）共用同一次索引查询
+    rank_order = F('search_rank').asc()
+
+    @staticmethod
+    def build_query(tokens):
+        # 每个词加引号作为短语，空格分隔即 AND
+        return ' '.join('"%s"' % t.replace('"', '""') for t in tokens)
+
+    @staticmethod
+    def match(q):
+        return Q(search_index__document__match=q)
+
+    @staticmethod
+    def rank(q):
+        return F('search_index__rank')
+
+    @staticmethod
+    def substring_fallback(query):
+        # FTS5 的 MATCH 不能出现在 OR / LEFT JOIN 里，SQLite 不做子串兜底
+        return False
+
+
+class PostgresFTSBackend:
+    """PostgreSQL tsvector + GIN 索引，ts_rank 越大越相关
+
+    分词粒度与查询不一致时（如搜词是文档中某个长词的一部分）全文索引会漏检，
+    pg_trgm 可用时再以三元组索引做子串兜底，兜底命中的 ts_rank 为 NULL，排在最后。
+    """
+    rank_order = F('search_rank').desc(nulls_last=True)
+
+    @staticmethod
+    def build_query(tokens):
+        return ' & '.join("'%s'" % t.replace("'", "''").replace('\\', '\\\\') for t in tokens)
+
+    @staticmethod
+    def match(q):
+        return Q(search_document__document__tsmatch=q)
+
+    @staticmethod
+    def rank(q):
+        return _TsRank(F('search_document__document'), Value(q))
+
+    @staticmethod
+    def substring_fallback(query):
+        # 三元组索引对少于 3 个字符的子串无能为力，短查询只走全文索引
+        return len(query) >= TRIGRAM_MIN_LENGTH and _index_exists(TRIGRAM_INDEX)
+
+
+_fts_available = {}
+_indexes_available = {}
+
+
+def _index_exists(name):
+    key = (connection.alias, name)
+    if key not in _indexes_available:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [name])
+            _indexes_available[key] = cursor.fetchone() is not None
+    return _indexes_available[key]
+
+
+def get_backend():
+    """按当前数据库选择全文检索后端，不支持时返回 None（退回 icontains）"""
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        return PostgresFTSBackend
+    if vendor == 'sqlite':
+        alias = connection.alias
+        if alias not in _fts_available:
+            _fts_available[alias] = FTS_TABLE in connection.introspection.table_names()
+        return SQLiteFTSBackend if _fts_available[alias] else None
+    return None
+
+
+def build_document(review):
+    """检索文本 = 产品名 + 作者 + 评论内容的检索分词结果"""
+    return ' '.join(search_tokens(review.product.name) + search_tokens(review.author) + search_tokens(review.content))
+
+
+def index_reviews(reviews, batch_size=1000):
+    """批量导入钩子：为新评论写入检索文档，索引由触发器/GIN 增量维护"""
+    docs = [ReviewSearchDocument(review=r, document=build_document(r)) for r in reviews]
+    return ReviewSearchDocument.objects.bulk_create(docs, batch_size=batch_size)
+
+
+def reindex_review(review):
+    ReviewSearchDocument.objects.update_or_create(
+        review=review,
+        defaults={'document': build_document(review)},
+    )
+
+
+def reindex_product(product, batch_size=1000):
+    """产品改名后重建其全部评论的检索文档（文档里含产品名分词）"""
+    docs = []
+    reviews = product.reviews.filter(search_document__isnull=False).only('id', 'author', 'content').order_by()
+    for review in reviews.iterator(chunk_size=batch_size):
+        review.product = product
+        docs.append(ReviewSearchDocument(review_id=review.id, document=build_document(review)))
+        if len(docs) >= batch_size:
+            ReviewSearchDocument.objects.bulk_update(docs, ['document'])
+            docs = []
+    if docs:
+        ReviewSearchDocument.objects.bulk_update(docs, ['document'])
+
+
+def search_reviews(queryset, query):
+    """按关键词检索评论，结果按相关度排序；无全文索引时退回 icontains"""
+    tokens = search_tokens(query)
+    backend = get_backend()
+    if backend is None or not tokens:
+        return queryset.filter(
+            Q(content__icontains=query) |
+            Q(product__name__icontains=query) |
+            Q(author__icontains=query)
+        )
+    q = backend.build_query(tokens)
+    condition = backend.match(q)
+    if backend.substring_fallback(query):
+        condition |= Q(content__icontains=query)
+    return queryset.filter(condition).annotate(
+        search_rank=backend.rank(q),
+    ).order_by(backend.rank_order, '-created_at')
@@ -0,0 +1,228 @@
+"""评论情感分类引擎
+
+分类器按名称注册，通过 settings.REVIEW_SENTIMENT_CLASSIFIER 选择（默认 'lexicon'）：
+
+- lexicon：情感词典 + 否定词 + 程度副词，一遍多模式匹配（装了 pyahocorasick 用 Aho-Corasick 自动机，
+  否则用编译好的正则多选分支，同样是单遍扫描），不依赖第三方库
+- linear：scikit-learn 线性模型（TF-IDF + LogisticRegression），模型文件由 train_sentiment_model 命令生成，
+  路径为 settings.REVIEW_SENTIMENT_MODEL_PATH，批量预测
+
+所有分类器返回 SentimentResult，confidence 与 Review.confidence 一致，为 0-100 的百分数。
+"""
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+SentimentResult = namedtuple('SentimentResult', ['label', 'score', 'confidence', 'rating'])
+
+# 情感词 -> 权重
+POSITIVE_WORDS = {
+    '好': 1, '棒': 1.5, '强': 1, '快': 1, '满意': 1.5, '惊喜': 1.5, '顺滑': 1, '喜欢': 1.5, '不错': 1,
+    '爱': 1, '美': 1, '出色': 1.5, '稳': 1, '细节': 0.5, '信赖': 1, '流畅': 1, '推荐': 1, '值得': 1,
+    '清晰': 1, '耐用': 1, '划算': 1, '漂亮': 1,
+}
+NEGATIVE_WORDS = {
+    '差': 1.5, '慢': 1, '卡': 1, '坏': 1.5, '失望': 1.5, '不行': 1.5, '贵': 1, '退': 1, '漏': 1,
+    '旧': 1, '破': 1, '问题': 1, '一般': 0.5, '垃圾': 2, '发热': 1, '发烫': 1, '故障': 1.5, '后悔': 1.5,
+}
+# 否定词 -> 系数（"不太" 只减弱并反转一半）
+NEGATION_WORDS = {'不': -1, '没': -1, '没有': -1, '无': -1, '未': -1, '别': -1, '并不': -1, '不太': -0.5, '不是很': -0.5}
+# 程度副词 -> 系数
+DEGREE_WORDS = {
+    '非常': 2, '特别': 2, '超级': 2, '极其': 2.5, '十分': 1.8, '太': 1.8, '很': 1.5, '真': 1.3,
+    '挺': 1.2, '比较': 1.2, '还': 0.8, '有点': 0.6, '稍微': 0.6, '略': 0.6,
+}
+# 分句符：否定/程度只作用到本分句内
+CLAUSE_BREAKS = '，。！？；,.!?;~～\n'
+# 修饰词与情感词之间最多相隔的字符数
+MODIFIER_GAP = 2
+
+_classes = {}
+_instances = {}
+
+
+def register(name):
+    """注册分类器类，类需实现 classify_batch(texts) -> [SentimentResult]"""
+    def decorator(cls):
+        _classes[name] = cls
+        return cls
+    return decorator
+
+
+def get_classifier(name=None):
+    """按名称取分类器实例（进程内单例），默认读取 settings.REVIEW_SENTIMENT_CLASSIFIER"""
+    name = name or getattr(settings, 'REVIEW_SENTIMENT_CLASSIFIER', 'lexicon')
+    if name not in _instances:
+        if name not in _classes:
+            raise ImproperlyConfigured(f'未知的情感分类器: {name}（可选: {", ".join(sorted(_classes))}）')
+        _instances[name] = _classes[name]()
+    return _instances[name]
+
+
+def classify(text):
+    return get_classifier().classify(text)
+
+
+def classify_batch(texts):
+    return get_classifier().classify_batch(texts)
+
+
+def _rating_for(score):
+    """[-1, 1] 的情感分数映射到 1-5 星"""
+    return max(1, min(5, int(round(3 + 2 * score))))
+
+
+class BaseClassifier:
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts):
+        raise NotImplementedError
+
+
+class _RegexMatcher:
+    """编译后的正则多选分支：长词在前，finditer 单遍给出最左最长、互不重叠的匹配"""
+
+    def __init__(self, words):
+        ordered = sorted(words, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(w) for w in ordered))
+
+    def iter_matches(self, text):
+        for m in self.pattern.finditer(text):
+            yield m.start(), m.end(), m.group()
+
+
+class _AhoCorasickMatcher:
+    def __init__(self, words):
+        import ahocorasick
+        self.automaton = ahocorasick.Automaton()
+        for w in words:
+            self.automaton.add_word(w, w)
+        self.automaton.make_automaton()
+
+    def iter_matches(self, text):
+        for end, w in self.automaton.iter_long(text):
+            yield end - len(w) + 1, end + 1, w
+
+
+def _build_matcher(words):
+    try:
+        return _AhoCorasickMatcher(words)
+    except ImportError:
+        return _RegexMatcher(words)
+
+
+@register('lexicon')
+class LexiconClassifier(BaseClassifier):
+    """词典打分：一遍扫描同时识别情感词、否定词、程度副词与分句符"""
+
+    def __init__(self, positive=None, negative=None, negations=None, degrees=None):
+        self.lexicon = {}
+        for w, v in (degrees or DEGREE_WORDS).items():
+            self.lexicon[w] = ('degree', v)
+        for w, v in (negations or NEGATION_WORDS).items():
+            self.lexicon[w] = ('negation', v)
+        for w, v in (negative or NEGATIVE_WORDS).items():
+            self.lexicon[w] = ('sentiment', -v)
+        for w, v in (positive or POSITIVE_WORDS).items():
+            self.lexicon[w] = ('sentiment', v)
+        for ch in CLAUSE_BREAKS:
+            self.lexicon[ch] = ('break', 0)
+        self.matcher = _build_matcher(self.lexicon)
+
+    def score_text(self, text):
+        """返回 (正向得分, 负向得分)，均为非负数"""
+        pos = neg = 0.0
+        modifier = 1.0
+        last_end = None
+        for start, end, word in self.matcher.iter_matches(text or ''):
+            kind, value = self.lexicon[word]
+            if kind == 'break':
+                modifier, last_end = 1.0, None
+                continue
+            if last_end is not None and start - last_end > MODIFIER_GAP:
+                modifier = 1.0
+            if kind == 'sentiment':
+                value *= modifier
+                if value > 0:
+                    pos += value
+                else:
+                    neg -= value
+                modifier, last_end = 1.0, None
+            else:
+                modifier *= value
+                last_end = end
+        return pos, neg
+
+    def classify_batch(self, texts):
+        return [self._result(text or '', *self.score_text(text)) for text in texts]
+
+    @staticmethod
+    def _result(text, pos, neg):
+        total = pos + neg
+        if total == 0:
+            # 没有情感词：长评论且无负面表达时按弱正面处理（京东长评多为好评）
+            if len(text) > 20:
+                return SentimentResult('positive', 0.2, 55.0, 4)
+            return SentimentResult('neutral', 0.0, 50.0, 3)
+        # 加 1 平滑：命中词越多、越一边倒，分数绝对值越接近 1
+        score = (pos - neg) / (total + 1)
+        if score > 0.1:
+            label = 'positive'
+        elif score < -0.1:
+            label = 'negative'
+        else:
+            label = 'neutral'
+        # 置信度随分数绝对值增长，落在 [50, 100)
+        confidence = 50 + 50 * abs(score)
+        return SentimentResult(label, round(score, 4), round(confidence, 1), _rating_for(score))
+
+
+@register('linear')
+class LinearModelClassifier(BaseClassifier):
+    """scikit-learn 线性模型，输入为 jieba 分词后的文本，一次 predict_proba 处理整批"""
+
+    def __init__(self, path=None):
+        path = path or getattr(settings, 'REVIEW_SENTIMENT_MODEL_PATH', None)
+        if not path:
+            raise ImproperlyConfigured('使用 linear 分类器需要设置 REVIEW_SENTIMENT_MODEL_PATH')
+        try:
+            import joblib
+        except ImportError:
+            raise ImproperlyConfigured('使用 linear 分类器需要安装 scikit-learn')
+        self.pipeline = joblib.load(path)
+        self.classes = list(self.pipeline.classes_)
+
+    def classify_batch(self, texts):
+        from .nlp import tokenize_text
+        texts = list(texts)
+        if not texts:
+            return []
+        docs = [' '.join(tokenize_text(t)) for t in texts]
+        results = []
+        for probs in self.pipeline.predict_proba(docs):
+            p = dict(zip(self.classes, probs))
+            label = str(self.classes[int(probs.argmax())])
+            score = p.get('positive', 0.0) - p.get('negative', 0.0)
+            results.append(SentimentResult(label, round(float(score), 4), round(float(probs.max()) * 100, 1), _rating_for(score)))
+        return results
+
+
+def train_linear_model(texts, labels, path):
+    """训练 linear 分类器并保存到 path，返回训练集准确率"""
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from .nlp import tokenize_text
+    docs = [' '.join(tokenize_text(t)) for t in texts]
+    pipeline = make_pipeline(
+        TfidfVectorizer(token_pattern=r"(?u)\b\w+\b", ngram_range=(1, 2), min_df=2),
+        LogisticRegression(max_iter=1000, class_weight='balanced'),
+    )
+    pipeline.fit(docs, labels)
+    joblib.dump(pipeline, path)
+    _instances.pop('linear', None)
+    return pipeline.score(docs, labels)
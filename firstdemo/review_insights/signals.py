@@ -0,0 +1,150 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Product, Review, ProductInsight, ReviewInsight, ReviewStats, spam_threshold
+from .analysis import analyze_text
+from .duplicates import fingerprint_group, index_fingerprints, reindex_fingerprint, release_group
+from .search import index_reviews, reindex_product, reindex_review
+from .trends import review_day_keys, rollup_review_days
+
+
+def _review_state(review):
+    return review.product_id, int(review.rating or 0), review.sentiment
+
+
+def _is_spam(review_id):
+    """垃圾评论不在计数器中，修改/删除时不产生增量"""
+    return ReviewInsight.objects.filter(review_id=review_id, spam_score__gte=spam_threshold()).exists()
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, raw=False, **kwargs):
+    """新增/修改评论时增量维护产品洞察计数器"""
+    if raw:
+        return
+    if created:
+        ProductInsight.record_reviews_added([instance])
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if not all(k in loaded for k in ('product_id', 'rating', 'sentiment')):
+        return
+    old = (loaded.get('product_id'), int(loaded.get('rating') or 0), loaded.get('sentiment'))
+    new = _review_state(instance)
+    if old != new and _is_spam(instance.id):
+        return
+    if old == new:
+        # 只改了内容或款式：计数不变，但聚类/常见话题/按款式分组的结果要随版本号失效
+        if any(f in loaded and loaded[f] != getattr(instance, f) for f in ('content', 'spec_color', 'spec_memory')):
+            ProductInsight.apply_review_delta(instance.product_id)
+        elif any(loaded[f] != getattr(instance, f) for f in loaded):
+            # 作者、追评等只影响页面展示
+            ProductInsight.touch(instance.product_id)
+        return
+    old_pid, old_rating, old_sentiment = old
+    new_pid, new_rating, new_sentiment = new
+    if old_pid == new_pid:
+        sentiments = {}
+        if old_sentiment != new_sentiment:
+            sentiments = {old_sentiment: -1, new_sentiment: 1}
+        ratings = {}
+        if old_rating != new_rating:
+            ratings = {old_rating: -1, new_rating: 1}
+        ProductInsight.apply_review_delta(new_pid, rating_sum=new_rating - old_rating, sentiments=sentiments, ratings=ratings)
+    else:
+        ProductInsight.apply_review_delta(old_pid, count=-1, rating_sum=-old_rating,
+                                          sentiments={old_sentiment: -1}, ratings={old_rating: -1})
+        ProductInsight.apply_review_delta(new_pid, count=1, rating_sum=new_rating,
+                                          sentiments={new_sentiment: 1}, ratings={new_rating: 1})
+
+
+@receiver(pre_delete, sender=Review)
+def review_deleting(sender, instance, **kwargs):
+    """洞察行和指纹会被级联删除，先记下是否计入计数器以及所在的近似重复组"""
+    instance._counted = not _is_spam(instance.id)
+    instance._fingerprint_group = fingerprint_group(instance.id)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_counted', True):
+        product_id, rating, sentiment = _review_state(instance)
+        ProductInsight.apply_review_delta(product_id, count=-1, rating_sum=-rating,
+                                          sentiments={sentiment: -1}, ratings={rating: -1})
+    # 组变小后组内其余评论的垃圾分数随之下降
+    release_group(getattr(instance, '_fingerprint_group', None), instance.id)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ReviewStats.apply_delta(products=1)
+        return
+    # 检索文档包含产品名，改名后重建该产品评论的文档
+    loaded_name = getattr(instance, '_loaded_name', None)
+    if loaded_name is not None and loaded_name != instance.name:
+        reindex_product(instance)
+        instance._loaded_name = instance.name
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    ReviewStats.apply_delta(products=-1)
+
+
+@receiver(post_save, sender=Review)
+def review_text_saved(sender, instance, created, raw=False, **kwargs):
+    """入库时分词一次并缓存，同时写入检索文档；内容变更时重新分词"""
+    if raw:
+        return
+    if created:
+        insights = ReviewInsight.create_for_reviews([instance])
+        index_reviews([instance])
+        index_fingerprints([(instance.id, insights[0].key_topics)])
+        return
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    content_changed = loaded.get('content', None) != instance.content
+    if content_changed:
+        features = analyze_text(instance.content)
+        # spam_score 不直接覆盖：由 reindex_fingerprint 按新文本分数与新组重算，跨过阈值时同步计数器
+        ReviewInsight.objects.update_or_create(
+            review=instance,
+            defaults={k: v for k, v in features.items() if k != 'spam_score'},
+            create_defaults={**features, 'spam_score': 0.0},
+        )
+        reindex_review(instance)
+        reindex_fingerprint(instance.id, features['key_topics'])
+    elif any(loaded.get(k) != getattr(instance, k) for k in ('author', 'product_id')):
+        reindex_review(instance)
+
+
+@receiver(post_save, sender=Review)
+def review_trend_saved(sender, instance, created, raw=False, **kwargs):
+    """增量更新受影响日期的趋势行"""
+    if raw:
+        return
+    keys = review_day_keys([instance])
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if not created and loaded:
+        fields = ('product_id', 'created_at', 'rating', 'sentiment')
+        if all(loaded.get(k) == getattr(instance, k) for k in fields):
+            return
+        if loaded.get('product_id') and loaded.get('created_at'):
+            old = Review(product_id=loaded['product_id'], created_at=loaded['created_at'])
+            keys |= review_day_keys([old])
+    rollup_review_days(keys)
+
+
+@receiver(post_delete, sender=Review)
+def review_trend_deleted(sender, instance, **kwargs):
+    rollup_review_days(review_day_keys([instance]), allow_create=False)
+
+
+@receiver(post_save, sender=Review)
+def review_loaded_values_sync(sender, instance, raw=False, **kwargs):
+    """最后执行：把本次保存后的取值作为下一次比较的基准"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded:
+        for k in ('product_id', 'rating', 'sentiment', 'author', 'content', 'created_at', 'spec', 'spec_color', 'spec_memory'):
+            loaded[k] = getattr(instance, k)
@@ -1,3 +1,1230 @@
-from django.test import TestCase
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from jd_crawler.backoff import AdaptiveBackoff
+from jd_crawler.checkpoint import Checkpoint
+from jd_crawler.crawler import crawl
+from jd_crawler.fetchers import BrowserFetcher
+
+from .analysis import analyze_text
+from .crawl_sink import DatabaseSink, HighWaterMark, ReviewSpool
+from .ingest import bulk_insert_reviews
+from .jobs import claim_jobs, run_job, run_pending
+from .models import (
+    DuplicateReview, InsightJob, ReviewTrend, Product, ProductInsight, Review, ReviewFingerprint, ReviewInsight, ReviewSearchDocument, ReviewStats,
+)
+from .nlp import is_word, tokenize_text
+from .readers import expand_paths, iter_chunks, iter_rows
+from . import sentiment
+from .search import get_backend, search_reviews
+
+
+def make_product(name='测试手机'):
+    return Product.objects.create(name=name, description='', price=1999, category='手机')
+
+
+def make_review(product, content='物流很快，做工不错', author='张三', rating=5, sentiment='positive', **kwargs):
+    return Review.objects.create(
+        product=product, author=author, content=content,
+        rating=rating, sentiment=sentiment, confidence=90, **kwargs
+    )
+
+
+class ContentHashTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+
+    def test_duplicate_create_is_rejected(self):
+        first = make_review(self.product)
+        with self.assertRaises(DuplicateReview):
+            make_review(self.product)
+        self.assertIsNotNone(first.content_hash)
+        self.assertEqual(self.product.reviews.count(), 1)
+        self.assertEqual(ProductInsight.for_product(self.product).total_reviews, 1)
+        duplicate = Review(product=self.product, author='张三', content='物流很快，做工不错', rating=5, sentiment='positive')
+        with self.assertRaises(ValidationError):
+            duplicate.full_clean()
+
+    def test_same_content_on_another_day_is_not_duplicate(self):
+        first = make_review(self.product)
+        second = make_review(self.product, created_at=timezone.now() - timedelta(days=2))
+        self.assertIsNotNone(second.content_hash)
+        self.assertNotEqual(first.content_hash, second.content_hash)
+
+    def test_hash_normalizes_whitespace(self):
+        created_at = timezone.now()
+        self.assertEqual(
+            Review.compute_content_hash(1, ' 张三 ', '物流很快，\n做工  不错', created_at),
+            Review.compute_content_hash(1, '张三', '物流很快， 做工 不错', created_at),
+        )
+
+    def test_edit_into_duplicate_is_rejected(self):
+        make_review(self.product)
+        other = make_review(self.product, content='屏幕很清晰')
+        other.content = '物流很快，做工不错'
+        with self.assertRaises(DuplicateReview):
+            other.save()
+        other.refresh_from_db()
+        self.assertEqual(other.content, '屏幕很清晰')
+
+    def test_legacy_null_hash_is_kept(self):
+        review = make_review(self.product)
+        Review.objects.filter(pk=review.pk).update(content_hash=None)
+        legacy = Review.objects.get(pk=review.pk)
+        legacy.rating = 4
+        legacy.save()
+        self.assertIsNone(Review.objects.get(pk=review.pk).content_hash)
+
+    def test_concurrent_import_conflict_is_skipped(self):
+        from . import ingest
+        existing = make_review(self.product)
+        real = ingest.existing_content_hashes
+        calls = []
+
+        def stale_check(hashes):
+            # 第一次查重发生在另一个导入提交之前：看不到已有的指纹
+            calls.append(1)
+            return set() if len(calls) == 1 else real(hashes)
+
+        batch = [
+            Review(product=self.product, author='张三', content=existing.content, rating=5, sentiment='positive'),
+            Review(product=self.product, author='李四', content='屏幕很清晰', rating=4, sentiment='positive'),
+        ]
+        with mock.patch.object(ingest, 'existing_content_hashes', side_effect=stale_check):
+            created = bulk_insert_reviews(batch)
+        self.assertEqual([r.author for r in created], ['李四'])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.product.reviews.count(), 2)
+        self.assertEqual(ProductInsight.for_product(self.product).total_reviews, 2)
+
+    def test_sample_data_skips_duplicates(self):
+        from django.core.management import call_command
+        from io import StringIO
+        for _ in range(3):
+            call_command('create_sample_data', products=1, reviews=60, stdout=StringIO())
+        hashes = list(Review.objects.exclude(content_hash=None).values_list('content_hash', flat=True))
+        self.assertEqual(len(hashes), len(set(hashes)))
+
+
+class ReviewSignalTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        make_review(self.product, content='电池很耐用，充电也快')
+        make_review(self.product, content='屏幕显示细腻，色彩准确', author='李四', rating=4)
+        self.review = make_review(self.product, content='系统有点卡顿', author='王五', rating=2, sentiment='negative')
+
+    def insight(self):
+        return ProductInsight.objects.get(product=self.product)
+
+    def test_counters_follow_create_edit_delete(self):
+        insight = self.insight()
+        self.assertEqual(insight.total_reviews, 3)
+        self.assertEqual(insight.rating_sum, 11)
+        self.assertEqual(insight.sentiment_distribution['negative'], 1)
+
+        review = Review.objects.get(pk=self.review.pk)
+        review.rating = 4
+        review.sentiment = 'positive'
+        review.save()
+        insight = self.insight()
+        self.assertEqual(insight.rating_sum, 13)
+        self.assertEqual(insight.sentiment_distribution, {'positive': 3, 'negative': 0, 'neutral': 0})
+        self.assertEqual(insight.rating_distribution['2'], 0)
+
+        review.delete()
+        insight = self.insight()
+        self.assertEqual(insight.total_reviews, 2)
+        self.assertEqual(insight.rating_sum, 9)
+        self.assertEqual(ReviewStats.current().total_reviews, 2)
+
+    def test_move_to_other_product(self):
+        other = make_product('另一款手机')
+        review = Review.objects.get(pk=self.review.pk)
+        review.product = other
+        review.save()
+        self.assertEqual(self.insight().total_reviews, 2)
+        self.assertEqual(ProductInsight.objects.get(product=other).total_reviews, 1)
+
+    def test_content_edit_invalidates_etag_and_clusters(self):
+        from .cluster_store import get_product_clusters, read_product_clusters
+        url = reverse('review_insights:api_product_insight', args=[self.product.id])
+        get_product_clusters(self.product)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        version = self.insight().reviews_version
+
+        review = Review.objects.get(pk=self.review.pk)
+        review.content = '系统更新后流畅多了，续航也不错'
+        review.save()
+
+        self.assertGreater(self.insight().reviews_version, version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        _, _, stale = read_product_clusters(self.product, self.insight())
+        self.assertTrue(stale)
+        self.assertIn('续航', ReviewInsight.objects.get(review=review).key_topics)
+
+    def test_author_edit_invalidates_etag_without_version_bump(self):
+        from .cluster_store import get_product_clusters
+        url = reverse('review_insights:api_product_insight', args=[self.product.id])
+        get_product_clusters(self.product)
+        etag = self.client.get(url)['ETag']
+        version = self.insight().reviews_version
+
+        review = Review.objects.get(pk=self.review.pk)
+        review.author = '改名用户'
+        review.save()
+
+        self.assertEqual(self.insight().reviews_version, version)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('改名用户', [r['author'] for r in response.json()['recent_reviews']])
+
+    def test_expired_clusters_change_etag(self):
+        from .cluster_store import get_product_clusters
+        url = reverse('review_insights:api_product_insight', args=[self.product.id])
+        get_product_clusters(self.product)
+        response = self.client.get(url)
+        self.assertFalse(response.json()['stale'])
+        etag = response['ETag']
+
+        # 超过 TTL：版本号和计算时间都没变，ETag 也要变，客户端才能看到过期标记
+        with self.settings(REVIEW_CLUSTER_CACHE_TTL=0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.json()['stale'])
+
+
+class InsightJobTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_review(self.product, content='电池很耐用，充电也快')
+            make_review(self.product, content='拍照清晰，夜景很好', author='李四', rating=4)
+
+    def test_writes_coalesce_into_one_pending_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_review(self.product, content='音质一般', author='王五', rating=3, sentiment='neutral')
+        self.assertEqual(InsightJob.objects.filter(product=self.product, status=InsightJob.STATUS_PENDING).count(), 1)
+
+    def test_run_pending_refreshes_topics(self):
+        self.assertEqual(run_pending(), (1, 0))
+        job = InsightJob.objects.get(product=self.product)
+        self.assertEqual((job.status, job.attempts), (InsightJob.STATUS_DONE, 1))
+        self.assertTrue(ProductInsight.objects.get(product=self.product).common_topics)
+        self.assertEqual(run_pending(), (0, 0))
+
+    def test_job_does_not_overwrite_concurrent_counters(self):
+        # worker 读到洞察行后，计算期间又写入一条评论
+        stale = ProductInsight.objects.get(product=self.product)
+        make_review(self.product, content='发热有点严重', author='赵六', rating=2, sentiment='negative')
+        fresh = ProductInsight.objects.get(product=self.product)
+        stale.refresh_topics()
+        insight = ProductInsight.objects.get(product=self.product)
+        self.assertEqual(insight.total_reviews, 3)
+        self.assertEqual(insight.reviews_version, fresh.reviews_version)
+        self.assertEqual(insight.rating_sum, fresh.rating_sum)
+
+    def test_claim_skips_fresh_running_jobs(self):
+        claimed = claim_jobs()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claim_jobs(), [])
+        # running 超时视为 worker 崩溃，重新领取
+        self.assertEqual(len(claim_jobs(timeout=-1)), 1)
+
+    def fail_topics(self):
+        return mock.patch.object(ProductInsight, 'refresh_topics', side_effect=RuntimeError('boom'))
+
+    def test_failed_job_is_retried_with_backoff(self):
+        with self.fail_topics():
+            self.assertEqual(run_pending(), (0, 1))
+        job = InsightJob.objects.get(product=self.product)
+        self.assertEqual((job.status, job.attempts, job.error), (InsightJob.STATUS_PENDING, 1, 'RuntimeError: boom'))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+        # 退避期内不领取
+        self.assertEqual(run_pending(), (0, 0))
+
+        InsightJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        with self.fail_topics():
+            self.assertEqual(run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        # 第二次失败后的等待时间翻倍
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=50))
+
+        InsightJob.objects.filter(id=job.id).update(run_after=timezone.now())
+        self.assertEqual(run_pending(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (InsightJob.STATUS_DONE, 3))
+
+    @override_settings(INSIGHT_JOB_MAX_ATTEMPTS=2, INSIGHT_JOB_RETRY_DELAY=0)
+    def test_job_fails_after_max_attempts(self):
+        with self.fail_topics():
+            self.assertEqual(run_pending(), (0, 1))
+            self.assertEqual(run_pending(), (0, 1))
+            self.assertEqual(run_pending(), (0, 0))
+        job = InsightJob.objects.get(product=self.product)
+        self.assertEqual((job.status, job.attempts), (InsightJob.STATUS_FAILED, 2))
+        # 永久失败的任务不占用 pending 名额，新的写入可以重新排队
+        with self.captureOnCommitCallbacks(execute=True):
+            make_review(self.product, content='音质一般', author='王五', rating=3, sentiment='neutral')
+        self.assertEqual(InsightJob.objects.filter(product=self.product, status=InsightJob.STATUS_PENDING).count(), 1)
+
+    def test_one_pending_job_per_product(self):
+        from django.db import IntegrityError, transaction
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            InsightJob.objects.create(product=self.product)
+        # 执行期间又有写入：失败的任务不再重新排队，由新排队的任务代替
+        job = claim_jobs()[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            make_review(self.product, content='音质一般', author='王五', rating=3, sentiment='neutral')
+        with self.fail_topics():
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, InsightJob.STATUS_FAILED)
+        pending = InsightJob.objects.get(product=self.product, status=InsightJob.STATUS_PENDING)
+        self.assertNotEqual(pending.id, job.id)
+        self.assertIsNone(pending.run_after)
+
+
+class ReviewImportApiTests(TestCase):
+    url = '/reviews/api/reviews/import/'
+
+    def post(self, items):
+        return self.client.post(self.url, data=json.dumps({'items': items}), content_type='application/json')
+
+    def test_bad_items_are_counted_not_fatal(self):
+        items = [
+            {'product_name': '导入测试机', 'author': '张三', 'content': '续航很强', 'rating': 5, 'sentiment': 'positive'},
+            {'product_name': '导入测试机', 'author': '长' * 300, 'content': '手感不错', 'rating': 4},
+            {'product_name': '超' * 201, 'content': '名字太长'},
+            {'product_name': '价格异常机', 'product_price': '12345678901', 'content': '价格溢出'},
+            {'product_name': '价格异常机', 'product_price': 'abc', 'content': '价格不是数字'},
+            {'product_name': '导入测试机', 'content': '评分不是数字', 'rating': 'five'},
+            {'product_name': '导入测试机', 'content': ''},
+            'not an object',
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 2, 'skipped': 0, 'errors': 6})
+        self.assertEqual(Review.objects.get(content='手感不错').author, '长' * 100)
+        self.assertFalse(Product.objects.filter(name='价格异常机').exists())
+
+    def test_reimport_is_skipped(self):
+        items = [{'product_name': '导入测试机', 'author': '张三', 'content': '续航很强', 'created_at': '2025-12-11T22:11:00'}]
+        self.assertEqual(self.post(items).json()['created'], 1)
+        self.assertEqual(self.post(items).json(), {'created': 0, 'skipped': 1, 'errors': 0})
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.product = make_product('星光手机')
+        self.quality = make_review(self.product, content='做工精细，手感很好')
+        self.synonym = make_review(self.product, content='质量一般，用了一个月就坏了', author='李四', rating=2, sentiment='negative')
+        self.battery = make_review(self.product, content='续航能力很强，重度使用一天', author='王五')
+
+    def ids(self, query):
+        return [r.id for r in search_reviews(Review.objects.all(), query)]
+
+    def test_uses_fts_backend(self):
+        self.assertIsNotNone(get_backend())
+        sql = str(search_reviews(Review.objects.all(), '续航').query)
+        self.assertIn('MATCH', sql)
+        self.assertEqual(sql.count('MATCH'), 1)
+        # MATCH 作为查询条件：FTS 表只以 INNER JOIN 联接一次，rank 隐藏列即 bm25
+        self.assertEqual(sql.count('INNER JOIN "review_insights_review_fts"'), 1)
+        self.assertIn('"review_insights_review_fts"."rank" AS "search_rank"', sql)
+
+    def test_search_composes_with_filters(self):
+        qs = search_reviews(Review.objects.filter(author='王五'), '续航')
+        self.assertEqual(qs.count(), 1)
+        self.assertEqual(list(search_reviews(Review.objects.filter(author='李四'), '续航')), [])
+
+    def test_raw_tokens_without_synonyms(self):
+        # “做工”在话题分词里会归并为“质量”，检索时不应互相命中
+        self.assertEqual(self.ids('做工'), [self.quality.id])
+        self.assertEqual(self.ids('质量'), [self.synonym.id])
+        self.assertEqual(self.ids('续航'), [self.battery.id])
+        self.assertEqual(self.ids('续航能力'), [self.battery.id])
+
+    def test_document_keeps_stopwords_and_drops_punctuation(self):
+        document = ReviewSearchDocument.objects.get(review=self.quality).document
+        self.assertIn('很', document.split())
+        self.assertNotIn('，', document)
+
+    def test_content_edit_reindexes(self):
+        review = Review.objects.get(pk=self.battery.pk)
+        review.content = '拍照效果出色'
+        review.save()
+        self.assertEqual(self.ids('续航'), [])
+        self.assertEqual(self.ids('拍照'), [review.id])
+
+    def test_product_rename_reindexes(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = '极光平板'
+        product.save()
+        self.assertEqual(sorted(self.ids('极光')), sorted([self.quality.id, self.synonym.id, self.battery.id]))
+        self.assertEqual(self.ids('星光'), [])
+
+    def test_rank_and_pagination(self):
+        make_review(self.product, content='续航续航续航，续航真的很好', author='赵六')
+        results = list(search_reviews(Review.objects.all(), '续航'))
+        self.assertEqual(len(results), 2)
+        self.assertLessEqual(results[0].search_rank, results[1].search_rank)
+        response = self.client.get('/reviews/api/reviews/', {'search': '续航'})
+        self.assertEqual(response.json()['pagination']['total_items'], 2)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        product = make_product()
+        base = timezone.now()
+        for i in range(25):
+            review = make_review(product, content=f'评价内容{i}')
+            # 每三条同一时间，验证按 id 打破并列
+            Review.objects.filter(pk=review.pk).update(created_at=base - timedelta(hours=i // 3))
+        self.expected = list(Review.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def page(self, **params):
+        response = self.client.get('/reviews/api/reviews/', dict(paginate='cursor', **params))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [r['id'] for r in data['reviews']], data['pagination']
+
+    def test_walks_forward_and_back(self):
+        ids, pages, cursor = [], [], None
+        while True:
+            page_ids, pagination = self.page(**({'cursor': cursor} if cursor else {}))
+            pages.append((page_ids, pagination))
+            ids += page_ids
+            cursor = pagination['next']
+            if cursor is None:
+                break
+        self.assertEqual(ids, self.expected)
+        self.assertEqual([len(p) for p, _ in pages], [10, 10, 5])
+        self.assertIsNone(pages[0][1]['prev'])
+        self.assertIsNone(pages[0][1]['total_items'])
+
+        back_ids, back = self.page(cursor=pages[2][1]['prev'])
+        self.assertEqual(back_ids, pages[1][0])
+        self.assertTrue(back['has_next'])
+        first_ids, first = self.page(cursor=back['prev'])
+        self.assertEqual((first_ids, first['prev']), (pages[0][0], None))
+
+    def test_exact_count_and_invalid_cursor(self):
+        self.assertEqual(self.page(count='exact')[1]['total_items'], 25)
+        response = self.client.get('/reviews/api/reviews/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # 固定时钟：请求跨过窗口边界时计数会清零，结果不能依赖测试运行的时刻
+        patcher = mock.patch('review_insights.views.time.time', return_value=1000.0)
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fixed_window_counter(self):
+        from .views import _rate_limited
+        self.assertEqual([_rate_limited('k', limit=3, window=10) for _ in range(4)], [False, False, False, True])
+        self.assertFalse(_rate_limited('other', limit=3, window=10))
+        self.clock.return_value = 1010.0
+        self.assertFalse(_rate_limited('k', limit=3, window=10))
+
+    def test_products_search_cached_and_limited(self):
+        make_product('iQOO 15')
+        self.client.get('/reviews/api/products/', {'search': 'iQOO'})
+        with self.assertNumQueries(0):
+            response = self.client.get('/reviews/api/products/', {'search': 'iQOO'})
+        self.assertEqual(response.json()['items'][0]['name'], 'iQOO 15')
+        statuses = []
+        for _ in range(9):
+            response = self.client.get('/reviews/api/products/', {'search': 'iQOO'})
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                self.assertEqual([p['name'] for p in response.json()['items']], ['iQOO 15'])
+        self.assertEqual(statuses, [200] * 8 + [429])
+        # 下一个窗口重新计数
+        self.clock.return_value = 1010.0
+        self.assertEqual(self.client.get('/reviews/api/products/', {'search': 'iQOO'}).status_code, 200)
+
+
+class SpamScoringTests(TestCase):
+    TEMPLATE = '收到货了，手机外观漂亮，运行流畅，拍照清晰，五星好评'
+
+    def setUp(self):
+        self.product = make_product()
+        make_review(self.product, content='电池很耐用，充电也快，整体满意', rating=4)
+
+    def add_copies(self, n, start=0):
+        return [make_review(self.product, content=self.TEMPLATE, author=f'用户{i}') for i in range(start, start + n)]
+
+    def insight(self):
+        return ProductInsight.objects.get(product=self.product)
+
+    def scores(self, reviews):
+        return [ReviewInsight.objects.get(review=r).spam_score for r in reviews]
+
+    def test_spam_is_excluded_from_counters(self):
+        copies = self.add_copies(3)
+        self.assertEqual(self.insight().total_reviews, 4)
+        copies += self.add_copies(1, start=3)
+        self.assertTrue(all(s >= 0.6 for s in self.scores(copies)))
+        insight = self.insight()
+        self.assertEqual((insight.total_reviews, insight.rating_sum), (1, 4))
+        self.assertEqual(insight.rating_distribution['5'], 0)
+        self.assertEqual(ReviewStats.current().total_reviews, 1)
+        # 全量重算与增量结果一致
+        insight.refresh_counters()
+        self.assertEqual(insight.total_reviews, 1)
+
+    def test_delete_lowers_group_scores(self):
+        copies = self.add_copies(4)
+        Review.objects.get(pk=copies[0].pk).delete()
+        remaining = copies[1:]
+        self.assertTrue(all(s < 0.6 for s in self.scores(remaining)))
+        self.assertEqual(self.insight().total_reviews, 4)
+        self.assertEqual(ReviewStats.current().total_reviews, 4)
+
+    def test_edit_out_of_group_lowers_scores(self):
+        copies = self.add_copies(4)
+        review = Review.objects.get(pk=copies[0].pk)
+        review.content = '用了一周，信号稳定，续航比上一代强不少'
+        review.save()
+        self.assertEqual(self.scores([review]), [0.0])
+        self.assertTrue(all(s < 0.6 for s in self.scores(copies[1:])))
+        self.assertEqual(self.insight().total_reviews, 5)
+
+    def test_rating_edit_of_spam_review_keeps_counters(self):
+        copies = self.add_copies(4)
+        review = Review.objects.get(pk=copies[0].pk)
+        review.rating = 1
+        review.save()
+        insight = self.insight()
+        self.assertEqual((insight.total_reviews, insight.rating_sum), (1, 4))
+
+    def test_groups_are_merged_transitively(self):
+        from .duplicates import _assign_groups, bands
+        a, b, c = (make_review(self.product, content=f'短评{i}', author=f'测试{i}') for i in range(3))
+        for review, h in ((a, 0), (c, 0b111111)):
+            parts = bands(h)
+            ReviewFingerprint.objects.create(
+                review=review, simhash=h, band0=parts[0], band1=parts[1], band2=parts[2], band3=parts[3],
+                group_id=review.id,
+            )
+        # b 与 a、c 的海明距离都是 3，a 与 c 为 6：三条应并为一组
+        touched = _assign_groups([(b.id, 0b111)])
+        groups = dict(ReviewFingerprint.objects.values_list('review_id', 'group_id'))
+        self.assertEqual({groups[a.id], groups[b.id], groups[c.id]}, {a.id})
+        self.assertEqual(touched, {a.id})
+
+    def test_rebuild_with_clear_resets_scores(self):
+        from django.core.management import call_command
+        from io import StringIO
+        copies = self.add_copies(4)
+        ReviewInsight.objects.filter(review=copies[0]).update(text_spam_score=0.0)
+        call_command('rebuild_review_fingerprints', clear=True, stdout=StringIO())
+        self.assertTrue(all(s >= 0.6 for s in self.scores(copies)))
+        self.assertEqual(self.insight().total_reviews, 1)
+
+
+@override_settings(REVIEW_STATS_SHARDS=4)
+class ReviewStatsTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.other = make_product('另一款手机')
+
+    def test_shards_sum_to_totals(self):
+        for i in range(12):
+            make_review(self.product if i % 2 else self.other, content=f'好用{i}', rating=4)
+        Review.objects.filter(product=self.other).first().delete()
+        self.assertGreater(ReviewStats.objects.count(), 1)
+        stats = ReviewStats.current()
+        rebuilt = ReviewStats.rebuild()
+        self.assertEqual(ReviewStats.objects.count(), 1)
+        for field in ('total_products', 'total_reviews', 'rating_sum', 'sentiment_distribution', 'rating_distribution'):
+            self.assertEqual(getattr(stats, field), getattr(rebuilt, field), field)
+        self.assertEqual((stats.total_reviews, stats.total_products), (11, 2))
+        self.assertGreater(rebuilt.version, stats.version)
+
+    def test_batch_import_writes_stats_once(self):
+        version = ReviewStats.current().version
+        bulk_insert_reviews([
+            Review(product=p, author=f'用户{i}', content=f'不错{i}', rating=5, sentiment='positive')
+            for i, p in enumerate([self.product, self.other] * 3)
+        ])
+        stats = ReviewStats.current()
+        self.assertEqual(stats.total_reviews, 6)
+        self.assertEqual(stats.version, version + 1)
+
+    def test_dashboard_api_reads_summed_stats(self):
+        make_review(self.product)
+        response = self.client.get('/reviews/api/dashboard/stats/')
+        self.assertEqual(response.json()['total_reviews'], 1)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/reviews/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        make_review(self.other)
+        response = self.client.get('/reviews/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_reviews'], 2)
+
+
+class AnalyticsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_product()
+        for i in range(3):
+            make_review(self.product, content=f'物流很快{i}')
+
+    def get(self, **params):
+        with mock.patch('review_insights.cluster_store.build_global_clusters_streaming', return_value=[]) as build:
+            response = self.client.get(reverse('review_insights:analytics'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, build.call_count
+
+    def test_global_clusters_cached_by_version(self):
+        response, calls = self.get()
+        self.assertEqual((response.context['total_reviews'], calls), (3, 1))
+        self.assertEqual(self.get()[1], 0)
+
+        make_review(self.product, content='屏幕清晰')
+        # 版本变化但结果仍较新：沿用上次结果
+        response, calls = self.get()
+        self.assertEqual((response.context['total_reviews'], calls), (4, 0))
+        with override_settings(REVIEW_GLOBAL_CLUSTERS_MAX_AGE=0):
+            self.assertEqual(self.get()[1], 1)
+            self.assertEqual(self.get()[1], 0)
+
+    def test_product_scope_uses_product_version(self):
+        other = make_product('另一款手机')
+        make_review(other, content='续航一般')
+        response, calls = self.get(product=self.product.id)
+        self.assertEqual(calls, 1)
+        counts = {row['sentiment']: row['count'] for row in response.context['sentiment_distribution']}
+        self.assertEqual((response.context['total_reviews'], counts['positive']), (3, 3))
+        with override_settings(REVIEW_GLOBAL_CLUSTERS_MAX_AGE=0):
+            make_review(other, content='拍照不错')
+            self.assertEqual(self.get(product=self.product.id)[1], 0)
+            make_review(self.product, content='拍照清楚')
+            self.assertEqual(self.get(product=self.product.id)[1], 1)
+
+
+class SpecVariantTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = make_product()
+
+    def test_parse_spec(self):
+        self.assertEqual(Review.parse_spec('凌云 16GB+512GB'), ('凌云', '16GB+512GB'))
+        self.assertEqual(Review.parse_spec(' 传奇版  12g + 256g 套装'), ('传奇版 套装', '12GB+256GB'))
+        self.assertEqual(Review.parse_spec('1T 典藏'), ('1T 典藏', ''))
+        self.assertEqual(Review.parse_spec(''), ('', ''))
+
+    def test_spec_edit_reparses_fields(self):
+        review = make_review(self.product, spec='凌云 16GB+512GB')
+        self.assertEqual((review.spec_color, review.spec_memory), ('凌云', '16GB+512GB'))
+        review = Review.objects.get(pk=review.pk)
+        review.spec = '传奇版 12GB+256GB'
+        review.save()
+        review.refresh_from_db()
+        self.assertEqual((review.spec_color, review.spec_memory), ('传奇版', '12GB+256GB'))
+        # 同一实例再次修改也以上次保存的值为基准
+        review.spec = ''
+        review.save()
+        self.assertEqual(Review.objects.filter(pk=review.pk).values_list('spec_color', 'spec_memory').get(), ('', ''))
+
+    def test_explicit_fields_kept_on_create(self):
+        review = make_review(self.product, spec='凌云 16GB+512GB', spec_color='凌云黑', spec_memory='16GB+512GB')
+        self.assertEqual(review.spec_color, '凌云黑')
+
+    def test_variants_api(self):
+        make_review(self.product, content='屏幕很好', spec='凌云 16GB+512GB', follow_up='用了一个月依然好用')
+        make_review(self.product, content='续航一般', rating=3, sentiment='neutral', spec='传奇版 16GB+512GB')
+        make_review(self.product, content='拍照清楚', rating=4, spec='凌云 12GB+256GB', merchant_reply='感谢支持')
+        url = f'/reviews/api/product/{self.product.id}/variants/'
+        data = self.client.get(url).json()
+        memory = {v['variant']: v for v in data['variants']}
+        self.assertEqual([v['variant'] for v in data['variants']], ['16GB+512GB', '12GB+256GB'])
+        self.assertEqual(memory['16GB+512GB']['review_count'], 2)
+        self.assertEqual(memory['16GB+512GB']['avg_rating'], 4.0)
+        self.assertEqual(memory['16GB+512GB']['sentiment_counts'], {'positive': 1, 'negative': 0, 'neutral': 1})
+        self.assertEqual((memory['16GB+512GB']['follow_up_count'], memory['12GB+256GB']['merchant_reply_count']), (1, 1))
+
+        data = self.client.get(url, {'by': 'color', 'clusters': '1'}).json()
+        color = {v['variant']: v for v in data['variants']}
+        self.assertEqual(color['凌云']['review_count'], 2)
+        self.assertIn('clusters', color['传奇版'])
+        self.assertEqual(self.client.get(url, {'by': 'size'}).status_code, 400)
+        self.assertEqual(self.client.get('/reviews/api/product/9999/variants/').status_code, 404)
+
+    def test_variants_follow_spec_edit(self):
+        review = make_review(self.product, spec='凌云 16GB+512GB')
+        url = f'/reviews/api/product/{self.product.id}/variants/'
+        self.assertEqual([v['variant'] for v in self.client.get(url).json()['variants']], ['16GB+512GB'])
+        review = Review.objects.get(pk=review.pk)
+        review.spec = '传奇版 12GB+256GB'
+        review.save()
+        self.assertEqual([v['variant'] for v in self.client.get(url).json()['variants']], ['12GB+256GB'])
+
+
+class FakeAutomaton:
+    """pyahocorasick.Automaton 的最小替身：iter_long 给出最左最长、互不重叠的匹配"""
+
+    def __init__(self):
+        self.words = {}
+
+    def add_word(self, word, value):
+        self.words[word] = value
+
+    def make_automaton(self):
+        self.longest = max(map(len, self.words))
+
+    def iter_long(self, text):
+        i = 0
+        while i < len(text):
+            for n in range(min(self.longest, len(text) - i), 0, -1):
+                if text[i:i + n] in self.words:
+                    yield i + n - 1, self.words[text[i:i + n]]
+                    i += n
+                    break
+            else:
+                i += 1
+
+
+class SentimentClassifierTests(SimpleTestCase):
+    def setUp(self):
+        self.classifier = sentiment.LexiconClassifier()
+
+    def test_negation_and_degree_words(self):
+        score = self.classifier.score_text
+        self.assertEqual(score('好'), (1, 0))
+        self.assertEqual(score('很好'), (1.5, 0))
+        self.assertEqual(score('不好'), (0, 1))
+        self.assertEqual(score('不太好'), (0, 0.5))
+        self.assertEqual(score('非常不好'), (0, 2))
+        self.assertEqual(score('没有问题'), (1, 0))
+        # 修饰只作用到本分句内、相隔不超过 MODIFIER_GAP 个字符
+        self.assertEqual(score('不，好'), (1, 0))
+        self.assertEqual(score('不知道怎么说好'), (1, 0))
+        self.assertEqual(score('很慢'), (0, 1.5))
+
+    def test_regex_fallback_matches_aho_corasick(self):
+        self.assertIsInstance(self.classifier.matcher, sentiment._RegexMatcher)
+        fake = type(sys)('ahocorasick')
+        fake.Automaton = FakeAutomaton
+        with mock.patch.dict(sys.modules, {'ahocorasick': fake}):
+            automaton = sentiment.LexiconClassifier()
+        self.assertIsInstance(automaton.matcher, sentiment._AhoCorasickMatcher)
+        texts = [
+            '物流非常快，包装不太好，但是手机很流畅！', '不是很满意，发热严重，有点失望', '没有问题，值得推荐',
+            '一般般吧', '垃圾，退货了', '', '拍照清晰，续航还行，性价比挺高的，总体来说非常满意的一次购物',
+        ]
+        for text in texts:
+            self.assertEqual(
+                list(automaton.matcher.iter_matches(text)), list(self.classifier.matcher.iter_matches(text)), text,
+            )
+        self.assertEqual(automaton.classify_batch(texts), self.classifier.classify_batch(texts))
+
+    def test_confidence_and_rating(self):
+        self.assertEqual([sentiment._rating_for(s) for s in (-1, -0.6, -0.2, 0, 0.2, 0.3, 1)], [1, 2, 3, 3, 3, 4, 5])
+        strong = self.classifier.classify('非常好，很满意，推荐')
+        weak = self.classifier.classify('好')
+        negative = self.classifier.classify('非常差，很失望')
+        self.assertEqual((strong.label, strong.rating, weak.label, negative.label), ('positive', 5, 'positive', 'negative'))
+        for result in (strong, weak, negative):
+            # 置信度为 0-100 的百分数，随分数绝对值增长
+            self.assertAlmostEqual(result.confidence, 50 + 50 * abs(result.score), places=0)
+            self.assertEqual(result.rating, sentiment._rating_for(result.score))
+        self.assertGreater(strong.confidence, weak.confidence)
+        self.assertEqual(negative.rating, 1)
+        self.assertEqual(self.classifier.classify('嗯'), ('neutral', 0.0, 50.0, 3))
+
+    def test_registry(self):
+        with self.assertRaises(ImproperlyConfigured):
+            sentiment.get_classifier('nope')
+        with override_settings(REVIEW_SENTIMENT_CLASSIFIER='nope'):
+            with self.assertRaises(ImproperlyConfigured):
+                sentiment.classify('好')
+        self.assertIs(sentiment.get_classifier('lexicon'), sentiment.get_classifier())
+        with override_settings(REVIEW_SENTIMENT_MODEL_PATH=''):
+            with self.assertRaises(ImproperlyConfigured):
+                sentiment.LinearModelClassifier()
+
+
+class TrendRollupTests(TestCase):
+    TEMPLATE = SpamScoringTests.TEMPLATE
+
+    def setUp(self):
+        self.product = make_product()
+        self.other = make_product('另一款手机')
+        self.now = timezone.now()
+
+    def day(self, n):
+        return self.now - timedelta(days=n)
+
+    def snapshot(self):
+        return sorted(ReviewTrend.objects.values_list('product_id', 'date', 'review_count', 'avg_rating', 'sentiment_score'))
+
+    def assert_matches_full_rollup(self):
+        from django.core.management import call_command
+        from io import StringIO
+        incremental = self.snapshot()
+        ReviewTrend.objects.all().delete()
+        call_command('rollup_review_trends', stdout=StringIO())
+        self.assertEqual(incremental, self.snapshot())
+        return incremental
+
+    def test_incremental_hooks_match_full_rollup(self):
+        make_review(self.product, content='电池很耐用', rating=4, created_at=self.day(0))
+        make_review(self.product, content='发热严重', rating=2, sentiment='negative', created_at=self.day(0))
+        moved = make_review(self.product, content='屏幕清晰', created_at=self.day(1))
+        deleted = make_review(self.other, content='拍照不错', created_at=self.day(2))
+        bulk_insert_reviews([
+            Review(product=self.other, author=f'用户{i}', content=f'续航一般{i}', rating=3, sentiment='neutral',
+                   created_at=self.day(2))
+            for i in range(3)
+        ])
+        moved = Review.objects.get(pk=moved.pk)
+        moved.product, moved.created_at, moved.rating = self.other, self.day(3), 3
+        moved.save()
+        Review.objects.get(pk=deleted.pk).delete()
+        trends = {(pid, date): count for pid, date, count, *_ in self.assert_matches_full_rollup()}
+        today = timezone.localtime(self.now).date()
+        self.assertEqual(trends, {
+            (self.product.id, today): 2,
+            (self.other.id, today - timedelta(days=2)): 3,
+            (self.other.id, today - timedelta(days=3)): 1,
+        })
+
+    def test_spam_is_excluded_incrementally(self):
+        make_review(self.product, content='电池很耐用', rating=4, created_at=self.day(0))
+        copies = [
+            make_review(self.product, content=self.TEMPLATE, author=f'用户{i}', created_at=self.day(i % 2))
+            for i in range(4)
+        ]
+        # 第 4 条让整组成为刷评：前几天已计入的副本也要移出
+        trends = {(pid, date): count for pid, date, count, *_ in self.assert_matches_full_rollup()}
+        self.assertEqual(trends, {(self.product.id, timezone.localtime(self.now).date()): 1})
+        self.assertEqual(sum(trends.values()), ProductInsight.for_product(self.product).total_reviews)
+
+        # 组缩小后副本重新计入
+        Review.objects.get(pk=copies[0].pk).delete()
+        trends = {(pid, date): count for pid, date, count, *_ in self.assert_matches_full_rollup()}
+        self.assertEqual(sum(trends.values()), 4)
+        self.assertEqual(sum(trends.values()), ProductInsight.for_product(self.product).total_reviews)
+
+
+class RecomputeInsightsTests(TestCase):
+    CONTENTS = ['物流很快，包装完好', '屏幕清晰，色彩漂亮', '续航一般，充电很快', '拍照清楚，夜景不错', '发热严重，有点失望']
+
+    def setUp(self):
+        self.products = [make_product(f'手机{n}') for n in range(3)]
+        for n, product in enumerate(self.products):
+            for i, content in enumerate(self.CONTENTS[:n + 3]):
+                make_review(product, content=content, author=f'用户{i}', rating=2 + i % 4)
+
+    def test_sequential_run_writes_back_in_batches(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .cluster_store import store_product_clusters
+        from .models import ProductClusterCache
+        from .parallel import compute_product_clusters
+        before = {p.id: ProductInsight.for_product(p) for p in self.products}
+        out = StringIO()
+        with mock.patch('review_insights.management.commands.recompute_insights.store_product_clusters',
+                        wraps=store_product_clusters) as store:
+            call_command('recompute_insights', workers=1, batch_size=2, stdout=out)
+        # 3 个产品、每批 2 个：两次批量写回
+        self.assertEqual([len(c.args[0]) for c in store.call_args_list], [2, 1])
+        self.assertIn('3 个产品', out.getvalue())
+
+        for product in self.products:
+            insight = ProductInsight.objects.get(product=product)
+            entry = ProductClusterCache.objects.get(product=product)
+            _, version, clusters = compute_product_clusters(product.id)
+            self.assertEqual((entry.version, entry.clusters), (insight.reviews_version, clusters))
+            self.assertEqual(insight.common_topics, [c['label'] for c in clusters[:5]])
+            # 计数器不受影响，与全量重算一致
+            counters = ('total_reviews', 'rating_sum', 'avg_rating', 'sentiment_distribution', 'rating_distribution')
+            self.assertEqual([getattr(insight, f) for f in counters], [getattr(before[product.id], f) for f in counters])
+            insight.refresh_counters()
+            self.assertEqual([getattr(insight, f) for f in counters], [getattr(before[product.id], f) for f in counters])
+
+    def test_product_filter(self):
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ProductClusterCache
+        call_command('recompute_insights', workers=1, product=[self.products[1].id], stdout=StringIO())
+        self.assertEqual(list(ProductClusterCache.objects.values_list('product_id', flat=True)), [self.products[1].id])
+
+
+class AnalyzeTextTests(TestCase):
+    def test_punctuation_is_not_a_topic_or_word(self):
+        features = analyze_text('物流很快！！做工不错，，，😀 好评~')
+        self.assertEqual(features['key_topics'], ['物流', '很快', '质量', '不错', '好评'])
+        self.assertEqual(features['word_count'], 5)
+
+    def test_topics_match_tokenize_text(self):
+        text = '屏幕很清晰，但是电池……一般。'
+        self.assertEqual(analyze_text(text)['key_topics'], tokenize_text(text))
+        self.assertTrue(all(is_word(t) for t in tokenize_text(text)))
+
+    def test_template_text_is_spam(self):
+        features = analyze_text('此用户未填写评价内容')
+        self.assertEqual((features['spam_score'], features['text_spam_score']), (1.0, 1.0))
+
+
+def jd_record(i, content=None):
+    return {'用户昵称': f'京东用户{i}', '评价日期': '2025-06-01 10:00:00', '评价内容': content or f'第{i}条：屏幕不错', '评分': 5}
+
+
+class ReviewSpoolTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, '100.jsonl')
+
+    def test_offsets_and_compaction(self):
+        spool = ReviewSpool(self.path)
+        spool.append([jd_record(i) for i in range(5)])
+        batches = list(spool.iter_pending(2))
+        self.assertEqual([len(b) for b, _ in batches], [2, 2, 1])
+        spool.commit(batches[1][1])
+        self.assertFalse(spool.compact())
+        self.assertEqual([r['用户昵称'] for b, _ in spool.iter_pending(10) for r in b], ['京东用户4'])
+
+        spool.commit(batches[-1][1])
+        self.assertTrue(spool.compact())
+        self.assertEqual((os.path.getsize(self.path), spool.offset()), (0, 0))
+        spool.append([jd_record(9)])
+        self.assertEqual([r['用户昵称'] for b, _ in spool.iter_pending(10) for r in b], ['京东用户9'])
+
+    def test_repair_drops_partial_line(self):
+        spool = ReviewSpool(self.path)
+        spool.append([jd_record(1)])
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"用户昵称": "写了一半')
+        spool = ReviewSpool(self.path)
+        self.assertEqual(len([r for b, _ in spool.iter_pending(10) for r in b]), 1)
+
+    def test_sink_flushes_compacts_and_replays(self):
+        product = make_product()
+        sink = DatabaseSink({'100': product}, self.dir, batch_size=3)
+        sink.write('100', [jd_record(i) for i in range(4)])
+        self.assertEqual(product.reviews.count(), 4)
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+        # 写入暂存后、入库前崩溃：新的 sink 启动时重放
+        ReviewSpool(self.path).append([jd_record(i) for i in range(3, 6)])
+        replayed = DatabaseSink({'100': product}, self.dir).replay()
+        self.assertEqual(replayed, {'100': 2})
+        self.assertEqual(product.reviews.count(), 6)
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+    def test_high_water_mark(self):
+        product = make_product()
+        sink = DatabaseSink({'100': product}, self.dir)
+        sink.write('100', [jd_record(1)])
+        sink.flush('100')
+        mark = HighWaterMark(product)
+        self.assertTrue(mark.reached(jd_record(1)))
+        self.assertFalse(mark.reached(dict(jd_record(2), 评价日期='2025-06-01 12:00:00')))
+        self.assertTrue(mark.reached(dict(jd_record(3), 评价日期='2025-05-01 12:00:00')))
+
+
+class StreamingReaderTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def write(self, name, text, encoding='utf-8'):
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            f.write(text)
+        return path
+
+    def test_csv_with_bom_in_chunks(self):
+        rows = ''.join(f'京东用户{i},评价{i}\r\n' for i in range(5))
+        path = self.write('a.csv', '用户昵称,评价内容\r\n' + rows, encoding='utf-8-sig')
+        chunks = list(iter_chunks(path, chunk_size=2))
+        self.assertEqual([len(c) for c in chunks], [2, 2, 1])
+        self.assertEqual(chunks[0][0], {'用户昵称': '京东用户0', '评价内容': '评价0'})
+
+    def test_jsonl_skips_blank_lines(self):
+        path = self.write('a.jsonl', json.dumps(jd_record(1), ensure_ascii=False) + '\n\n' +
+                          json.dumps(jd_record(2), ensure_ascii=False) + '\n')
+        self.assertEqual([r['用户昵称'] for r in iter_rows(path)], ['京东用户1', '京东用户2'])
+
+    def test_xlsx_skips_empty_rows(self):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['用户昵称', '评价内容'])
+        sheet.append(['京东用户1', '好用'])
+        sheet.append([None, None])
+        sheet.append(['京东用户2', '不错'])
+        path = os.path.join(self.dir, 'a.xlsx')
+        workbook.save(path)
+        self.assertEqual([r['评价内容'] for r in iter_rows(path)], ['好用', '不错'])
+
+    def test_unsupported_and_parquet_without_pyarrow(self):
+        with self.assertRaises(ValueError):
+            iter_rows(self.write('a.txt', ''))
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            with self.assertRaises(ImproperlyConfigured):
+                list(iter_rows(os.path.join(self.dir, 'a.parquet')))
+
+    def test_expand_paths(self):
+        b = self.write('x/b.csv', 'a\n')
+        a = self.write('x/y/a.csv', 'a\n')
+        paths, missing = expand_paths([os.path.join(self.dir, '**', '*.csv'), b, os.path.join(self.dir, 'none*.csv')])
+        self.assertEqual(paths, sorted([a, b]))
+        self.assertEqual(missing, [os.path.join(self.dir, 'none*.csv')])
+
+
+class CrawlReviewsCommandTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def run_command(self, fake_crawl):
+        from io import StringIO
+        from django.core.management import call_command
+        out = StringIO()
+        with mock.patch('review_insights.management.commands.crawl_reviews.crawl', side_effect=fake_crawl):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('crawl_reviews', '100', product='采集手机', spool_dir=self.dir, stdout=out)
+        return out.getvalue()
+
+    def test_reports_queue_only_after_insert(self):
+        def fake_crawl(skus, fetcher, sink, **kwargs):
+            sink.write('100', [jd_record(i) for i in range(3)])
+            sink.finish('100')
+            return {'100': 3}
+
+        output = self.run_command(fake_crawl)
+        self.assertIn('已为 采集手机 排队洞察重算', output)
+        self.assertTrue(InsightJob.objects.filter(product__name='采集手机', status=InsightJob.STATUS_PENDING).exists())
+
+    def test_no_queue_message_when_crawl_fails(self):
+        output = self.run_command(lambda skus, fetcher, sink, **kwargs: {'100': RuntimeError('blocked')})
+        self.assertIn('采集失败', output)
+        self.assertNotIn('排队洞察重算（', output)
+        self.assertIn('未排队洞察重算', output)
+        self.assertFalse(InsightJob.objects.exists())
+
+
+class ImportCommandTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'reviews.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            for i in range(3):
+                f.write(json.dumps(jd_record(i), ensure_ascii=False) + '\n')
+
+    def run_import(self, *args):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('import_excel', self.path, *args, product='导入手机', stdout=StringIO())
+        return ProductInsight.objects.get(product__name='导入手机')
+
+    def test_batched_by_default_and_idempotent(self):
+        with mock.patch('review_insights.management.commands.import_excel.Command.import_rows') as import_rows:
+            insight = self.run_import()
+        import_rows.assert_not_called()
+        self.assertEqual(insight.total_reviews, 3)
+        self.assertEqual(self.run_import().total_reviews, 3)
+
+    def test_no_batch_skips_duplicates(self):
+        self.run_import()
+        self.assertEqual(self.run_import('--no-batch').total_reviews, 3)
+        self.assertEqual(Review.objects.count(), 3)
+
+    def test_read_error_keeps_cause(self):
+        from django.core.management.base import CommandError
+        with mock.patch('review_insights.management.commands.import_excel.iter_chunks', side_effect=OSError('boom')):
+            with self.assertRaises(CommandError) as ctx:
+                self.run_import()
+        self.assertIsInstance(ctx.exception.__cause__, OSError)
+
+
+class ListSink:
+    def __init__(self):
+        self.records = []
+        self.finished = []
+
+    def write(self, sku, records):
+        self.records.extend(records)
+
+    def finish(self, sku):
+        self.finished.append(sku)
+
+    def close(self):
+        pass
+
+
+class PagedFetcher:
+    """每个 SKU 3 页、每页 2 条；fail_at 页抛错模拟中断"""
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.fetched = []
+
+    def iter_pages(self, sku, state):
+        for page in range(state.get('page', 0), 3):
+            if page == self.fail_at:
+                raise RuntimeError('connection reset')
+            self.fetched.append(page)
+            yield [{'sku': sku, 'page': page, 'i': i} for i in range(2)], {'page': page + 1}
+
+
+class FakeTab:
+    def __init__(self, owner):
+        self.owner = owner
+        self.thread = threading.get_ident()
+        self.scroll = self.wait = self
+
+    def _check(self):
+        if threading.get_ident() != self.thread:
+            self.owner.cross_thread = True
+
+    def down(self, _):
+        self._check()
+
+    def ele(self, _, timeout=None):
+        self._check()
+        return self
+
+    def click(self, by_js=False):
+        self._check()
+
+    def eles_loaded(self, _, timeout=None):
+        self._check()
+
+    def eles(self, _):
+        self._check()
+        return []
+
+    def run_js(self, _):
+        self._check()
+
+    def close(self):
+        self._check()
+        self.owner.enter()
+
+
+class FakeBrowser:
+    """记录浏览器级调用的最大并发数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = self.max_active = 0
+        self.cross_thread = False
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+
+    def new_tab(self, url):
+        self.enter()
+        return FakeTab(self)
+
+
+class CrawlerTests(SimpleTestCase):
+    def test_backoff_adapts_to_throttling(self):
+        backoff = AdaptiveBackoff(min_delay=0.2, max_delay=5.0, initial=1.0)
+        backoff.failure()
+        self.assertEqual(backoff.delay, 2.0)
+        backoff.failure(retry_after=4.5)
+        self.assertEqual(backoff.delay, 4.5)
+        backoff.failure()
+        self.assertEqual(backoff.delay, 5.0)
+        for _ in range(50):
+            backoff.success()
+        self.assertEqual(backoff.delay, 0.2)
+
+    def test_http_fetcher_against_stub_server(self):
+        from jd_crawler import HttpFetcher
+        from jd_crawler.fetchers import FetchError
+        from jd_crawler.stub_server import serve
+        comments = [{'id': i, 'nickname': f'京东用户{i}', 'content': f'第{i}条\n评价', 'creationTime': '2025-06-01 10:00:00',
+                     'productColor': '星光', 'productSize': '12+256', 'score': 5} for i in range(1, 26)]
+        pages = {('100', p): 'fetchJSON_comment98(%s);' % json.dumps({'maxPage': 3, 'comments': comments[p * 10:(p + 1) * 10]})
+                 for p in range(3)}
+        # 200 + 空响应是京东限流的表现
+        pages[('200', 0)] = ''
+        server = serve(pages, port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base_url = 'http://127.0.0.1:%d/comment/productPageComments.action' % server.server_address[1]
+
+        def fetcher(**kwargs):
+            return HttpFetcher(base_url=base_url, backoff=AdaptiveBackoff(min_delay=0, max_delay=0.01), timeout=5, **kwargs)
+
+        sink = ListSink()
+        results = crawl(['100'], fetcher(), sink, log=lambda m: None)
+        self.assertEqual(results['100'], 25)
+        self.assertEqual([r['评论ID'] for r in sink.records], [str(i) for i in range(1, 26)])
+        self.assertEqual(sink.records[0]['评价内容'], '第1条 评价')
+        self.assertEqual(sink.records[0]['购买规格'], '星光 12+256')
+
+        self.assertEqual(len(list(fetcher(max_pages=2).iter_pages('100', {}))), 2)
+        with self.assertRaises(FetchError):
+            fetcher(max_retries=2).fetch_page('200', 0)
+
+    def test_crawl_resumes_from_checkpoint(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'checkpoint.json')
+        sink = ListSink()
+        results = crawl(['1'], PagedFetcher(fail_at=2), sink, checkpoint=Checkpoint(path), log=lambda m: None)
+        self.assertIsInstance(results['1'], RuntimeError)
+        self.assertEqual(Checkpoint(path).get('1'), {'page': 2, 'count': 4, 'done': False})
+
+        fetcher = PagedFetcher()
+        sink = ListSink()
+        results = crawl(['1'], fetcher, sink, checkpoint=Checkpoint(path), log=lambda m: None)
+        self.assertEqual((results['1'], fetcher.fetched, len(sink.records)), (6, [2], 2))
+        self.assertTrue(Checkpoint(path).get('1')['done'])
+
+        # 已完成的 SKU 不再抓取
+        fetcher = PagedFetcher()
+        crawl(['1'], fetcher, ListSink(), checkpoint=Checkpoint(path), log=lambda m: None)
+        self.assertEqual(fetcher.fetched, [])
+
+    def test_browser_fetcher_serializes_browser_calls(self):
+        browser = FakeBrowser()
+        fetcher = BrowserFetcher(
+            backoff=AdaptiveBackoff(min_delay=0, max_delay=0, initial=0), max_stalls=1, page=browser,
+        )
+        sink = ListSink()
+        results = crawl([str(i) for i in range(8)], fetcher, sink, workers=4, log=lambda m: None)
+        self.assertEqual(set(results.values()), {0})
+        self.assertEqual(len(sink.finished), 8)
+        self.assertEqual(browser.max_active, 1)
+        self.assertFalse(browser.cross_thread)
@@ -0,0 +1,88 @@
+from datetime import datetime, time, timedelta
+
+from django.db.models import Avg, Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Review, ReviewTrend, exclude_spam
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def review_day(created_at):
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return created_at.date()
+
+
+def rollup_trends(start=None, end=None, product_ids=None, allow_create=True):
+    """一次 GROUP BY 把评论聚合为 (产品, 日期) 趋势行，只写入发生变化的天
+
+    start/end 为闭区间日期，None 表示不限；返回 {'created', 'updated', 'deleted'} 计数。
+    allow_create=False 时只更新/删除已有行（删除评论时使用，避免给正在级联删除的产品建新行）。
+    与产品/全站计数器一致，垃圾评论不计入；垃圾分数跨过阈值时由 duplicates._rescore 重算对应的天。
+    """
+    reviews = exclude_spam(Review.objects.order_by())
+    trends = ReviewTrend.objects.all()
+    if start:
+        reviews = reviews.filter(created_at__gte=_day_start(start))
+        trends = trends.filter(date__gte=start)
+    if end:
+        reviews = reviews.filter(created_at__lt=_day_start(end + timedelta(days=1)))
+        trends = trends.filter(date__lte=end)
+    if product_ids is not None:
+        reviews = reviews.filter(product_id__in=product_ids)
+        trends = trends.filter(product_id__in=product_ids)
+
+    rows = reviews.annotate(day=TruncDate('created_at')).values('product_id', 'day').annotate(
+        review_count=Count('id'),
+        avg_rating=Avg('rating'),
+        positive=Count('id', filter=Q(sentiment='positive')),
+        negative=Count('id', filter=Q(sentiment='negative')),
+    )
+    fresh = {}
+    for row in rows:
+        count = row['review_count']
+        fresh[(row['product_id'], row['day'])] = {
+            'review_count': count,
+            'avg_rating': round(float(row['avg_rating'] or 0), 4),
+            # 情感分数：(正面 - 负面) / 总数，范围 [-1, 1]
+            'sentiment_score': round((row['positive'] - row['negative']) / count, 4) if count else 0.0,
+        }
+
+    existing = {(t.product_id, t.date): t for t in trends}
+    to_create = []
+    to_update = []
+    for key, values in fresh.items():
+        trend = existing.pop(key, None)
+        if trend is None:
+            if allow_create:
+                to_create.append(ReviewTrend(product_id=key[0], date=key[1], **values))
+            continue
+        if any(getattr(trend, f) != v for f, v in values.items()):
+            for f, v in values.items():
+                setattr(trend, f, v)
+            to_update.append(trend)
+    # 剩下的旧行对应的天已经没有评论
+    stale_ids = [t.id for t in existing.values()]
+
+    ReviewTrend.objects.bulk_create(to_create, batch_size=1000)
+    ReviewTrend.objects.bulk_update(to_update, ['review_count', 'avg_rating', 'sentiment_score'], batch_size=1000)
+    if stale_ids:
+        ReviewTrend.objects.filter(id__in=stale_ids).delete()
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(stale_ids)}
+
+
+def rollup_review_days(day_keys, allow_create=True):
+    """增量钩子：只重算受影响的 (产品, 日期)，每个产品一次 GROUP BY"""
+    by_product = {}
+    for product_id, day in day_keys:
+        by_product.setdefault(product_id, set()).add(day)
+    for product_id, days in by_product.items():
+        rollup_trends(min(days), max(days), product_ids=[product_id], allow_create=allow_create)
+
+
+def review_day_keys(reviews):
+    return {(r.product_id, review_day(r.created_at)) for r in reviews}
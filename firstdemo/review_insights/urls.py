@@ -18,4 +18,5 @@ urlpatterns = [
     path('api/reviews/import/', views.api_reviews_import, name='api_reviews_import'),
     path('api/products/', views.api_products_search, name='api_products_search'),
     path('api/product/<int:product_id>/insight/', views.api_product_insight, name='api_product_insight'),
+    path('api/product/<int:product_id>/variants/', views.api_product_variants, name='api_product_variants'),
 ]
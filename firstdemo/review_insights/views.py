@@ -1,15 +1,28 @@
 from django.shortcuts import render
 from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, condition
+from django.utils.cache import patch_cache_control
+from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Avg, Count, Q
+from django.db import transaction
+from django.db.models import Avg, Count, OuterRef, Q, Subquery, Sum
 from django.utils import timezone
+from django.conf import settings
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import hashlib
 import json
 import time
 from django.http import JsonResponse
 
-from .models import Product, Review, ProductInsight, ReviewTrend
+from .models import (
+    Product, Review, ProductInsight, ProductClusterCache, ReviewTrend, ReviewStats,
+    RATING_VALUES, SENTIMENT_KEYS, counter_aggregates, exclude_spam,
+)
+from .ingest import bulk_insert_reviews, chunked
+from .search import search_reviews
+from .pagination import keyset_page, InvalidCursor
+from .sentiment import classify_batch
 from django.views.decorators.csrf import csrf_exempt
 
 def dashboard(request):
@@ -35,11 +48,8 @@ def reviews_list(request):
     if sentiment:
         reviews = reviews.filter(sentiment=sentiment)
     if search:
-        reviews = reviews.filter(
-            Q(content__icontains=search) |
-            Q(product__name__icontains=search) |
-            Q(author__icontains=search)
-        )
+        # 全文索引检索，按相关度排序
+        reviews = search_reviews(reviews, search)
     
     # 分页
     paginator = Paginator(reviews, 10)
@@ -52,8 +62,7 @@ def reviews_list(request):
     if product_id:
         try:
             product = Product.objects.get(id=product_id)
-            current_product_insight, created = ProductInsight.objects.get_or_create(product=product)
-            current_product_insight.update_insights()
+            current_product_insight = ProductInsight.for_product(product)
         except Product.DoesNotExist:
             current_product_insight = None
     risk_list = ['物流','售后','价格','包装','质量','服务']
@@ -81,27 +90,33 @@ def analytics(request):
     # 获取当前选中的产品ID
     selected_product_id = request.GET.get('product')
     
-    # 基础查询集
-    reviews_queryset = Review.objects.all()
-    
     # 如果选择了特定产品，进行筛选
     selected_product = None
     if selected_product_id:
         try:
             selected_product = Product.objects.get(id=selected_product_id)
-            reviews_queryset = reviews_queryset.filter(product_id=selected_product_id)
         except Product.DoesNotExist:
             pass
-            
-    # 获取总体统计（基于筛选后的结果）
-    total_reviews = reviews_queryset.count()
-    sentiment_distribution = reviews_queryset.values('sentiment').annotate(
-        count=Count('sentiment')
-    )
 
-    from .nlp import build_global_clusters
-    # 使用筛选后的评论集进行聚类分析
-    global_clusters = build_global_clusters(reviews_queryset, n_clusters=8, top_tokens=3, evidence_per_cluster=2)
+    # 始终显示所有产品的洞察，以便进行对比
+    # 计数器由信号增量维护：一次查询读取全部洞察，缺失的用一次分组聚合补建
+    product_insights = ProductInsight.for_products(products)
+
+    # 总体统计读取物化计数器（全站统计或所选产品的洞察），不做全表聚合
+    if selected_product:
+        counters = next(i for i in product_insights if i.product_id == selected_product.id)
+        version = counters.reviews_version
+    else:
+        counters = ReviewStats.current()
+        version = counters.version
+    total_reviews = counters.total_reviews
+    sentiment_distribution = [
+        {'sentiment': k, 'count': counters.sentiment_distribution.get(k, 0)} for k in SENTIMENT_KEYS
+    ]
+
+    # 话题聚类按评论集版本缓存，版本未变或结果较新时不重算
+    from .cluster_store import get_global_clusters
+    global_clusters = get_global_clusters(version, selected_product, n_clusters=8, top_tokens=3, evidence_per_cluster=2)
     topic_labels = []
     topic_pos = []
     topic_neg = []
@@ -136,24 +151,10 @@ def analytics(request):
     if neg_ratio_for_keyword('包装') > 0.15:
         consumer_advice.append('要求加固包装或当面签收验货，避免运输损伤')
     
-    # 获取产品洞察数据，如果不存在则创建空的
-    product_insights = []
-    
-    # 始终显示所有产品的洞察，以便进行对比
-    for product in products:
-        insight, created = ProductInsight.objects.get_or_create(
-            product=product,
-            defaults={
-                'total_reviews': 0,
-                'avg_rating': 0.0,
-                'sentiment_distribution': {'positive': 0, 'negative': 0, 'neutral': 0},
-                'common_topics': []
-            }
-        )
-        # 更新洞察数据
-        if not created:
-            insight.update_insights()
-        product_insights.append(insight)
+    # 聚类结果一次批量读取缓存，未命中的现场计算数量有上限
+    from .cluster_store import get_clusters_for_insights
+    from .nlp import pros_cons_from_clusters
+    clusters_by_product = get_clusters_for_insights(product_insights)
 
     reputation_guides = []
     for insight in product_insights:
@@ -173,8 +174,7 @@ def analytics(request):
             tier = '谨慎'
         else:
             tier = '不推荐'
-        from .nlp import extract_product_clusters, pros_cons_from_clusters
-        clusters = extract_product_clusters(insight.product.reviews.all())
+        clusters = clusters_by_product.get(insight.product_id, [])
         pros, cons = pros_cons_from_clusters(clusters, top_n=3)
         reputation_guides.append({
             'product': insight.product,
@@ -232,11 +232,49 @@ def review_detail(request, review_id):
     except Review.DoesNotExist:
         return JsonResponse({'error': '评论不存在'}, status=404)
 
+def _insight_version(request, product_id):
+    """产品洞察的版本信息 (评论集版本, 最后更新时间, 聚类计算时间, 聚类是否过期)，同一请求内只查一次
+
+    一次查询：洞察行 + 默认参数聚类缓存的计算时间和版本（子查询），不触发任何 NLP 计算。
+    """
+    if not hasattr(request, '_insight_version'):
+        from .cluster_store import DEFAULT_PARAMS_KEY, clusters_stale
+        clusters = ProductClusterCache.objects.filter(
+            product_id=OuterRef('product_id'), params=DEFAULT_PARAMS_KEY,
+        )
+        row = ProductInsight.objects.filter(product_id=product_id).annotate(
+            clusters_at=Subquery(clusters.values('computed_at')[:1]),
+            clusters_version=Subquery(clusters.values('version')[:1]),
+        ).values_list('reviews_version', 'last_updated', 'clusters_at', 'clusters_version').first()
+        if row is not None:
+            reviews_version, last_updated, clusters_at, clusters_version = row
+            stale = clusters_at is not None and clusters_stale(clusters_version, clusters_at, reviews_version)
+            row = (reviews_version, last_updated, clusters_at, stale)
+        request._insight_version = row
+    return request._insight_version
+
+def _insight_etag(request, product_id):
+    """ETag 含评论集版本、最后更新时间（作者等不影响版本号的修改也会更新它）、聚类时间和过期标记"""
+    version = _insight_version(request, product_id)
+    if version is None:
+        return None
+    reviews_version, last_updated, clusters_at, stale = version
+    updated_ts = int(last_updated.timestamp() * 1_000_000)
+    clusters_ts = int(clusters_at.timestamp()) if clusters_at else 0
+    return f'insight-{product_id}-v{reviews_version}-u{updated_ts}-c{clusters_ts}{"-stale" if stale else ""}'
+
+def _insight_last_modified(request, product_id):
+    version = _insight_version(request, product_id)
+    if version is None:
+        return None
+    _, last_updated, clusters_at, _ = version
+    return max(last_updated, clusters_at) if clusters_at else last_updated
+
+@condition(etag_func=_insight_etag, last_modified_func=_insight_last_modified)
 def product_report(request, product_id):
     try:
         product = Product.objects.get(id=product_id)
-        insight, created = ProductInsight.objects.get_or_create(product=product)
-        insight.update_insights()
+        insight = ProductInsight.for_product(product)
         total = max(insight.total_reviews, 1)
         pos = int(insight.sentiment_distribution.get('positive', 0) or 0)
         neg = int(insight.sentiment_distribution.get('negative', 0) or 0)
@@ -296,6 +334,7 @@ def product_report(request, product_id):
         content = "\n".join(lines)
         resp = HttpResponse(content, content_type='text/markdown; charset=utf-8')
         resp['Content-Disposition'] = f'attachment; filename="{product.name}-口碑报告.md"'
+        patch_cache_control(resp, max_age=0, must_revalidate=True)
         return resp
     except Product.DoesNotExist:
         return JsonResponse({'error': '产品不存在'}, status=404)
@@ -303,16 +342,28 @@ def product_report(request, product_id):
 # API视图
 @require_http_methods(["GET"])
 def api_reviews(request):
-    """API: 获取评论列表"""
+    """API: 获取评论列表
+
+    默认按页码分页；传 paginate=cursor 或 cursor=<token> 时改用 (created_at, id) 游标分页，
+    此时 count=exact|approx|none 控制 total_items（默认 none，不做 COUNT）。
+    min_words / max_spam 按入库时预计算的评论特征筛选；order=words 按词数倒序（仅页码分页）。
+    spec_color / spec_memory 按购买款式筛选。
+    """
     # 获取筛选参数
     product_id = request.GET.get('product')
     rating = request.GET.get('rating')
     sentiment = request.GET.get('sentiment')
     search = request.GET.get('search')
-    page = int(request.GET.get('page', 1))
+    min_words = request.GET.get('min_words')
+    max_spam = request.GET.get('max_spam')
+    order = request.GET.get('order')
+    spec_color = request.GET.get('spec_color')
+    spec_memory = request.GET.get('spec_memory')
+    cursor = request.GET.get('cursor')
+    cursor_mode = bool(cursor) or request.GET.get('paginate') == 'cursor'
     
     # 基础查询集
-    reviews = Review.objects.select_related('product').all()
+    reviews = Review.objects.select_related('product', 'insight').all()
     
     # 应用筛选
     if product_id:
@@ -321,30 +372,56 @@ def api_reviews(request):
         reviews = reviews.filter(rating=rating)
     if sentiment:
         reviews = reviews.filter(sentiment=sentiment)
+    if spec_color:
+        reviews = reviews.filter(spec_color=spec_color)
+    if spec_memory:
+        reviews = reviews.filter(spec_memory=spec_memory)
+    try:
+        if min_words:
+            reviews = reviews.filter(insight__word_count__gte=int(min_words))
+        if max_spam:
+            reviews = reviews.filter(insight__spam_score__lte=float(max_spam))
+    except ValueError:
+        return JsonResponse({'error': 'min_words/max_spam 参数无效'}, status=400)
     if search:
-        reviews = reviews.filter(
-            Q(content__icontains=search) |
-            Q(product__name__icontains=search) |
-            Q(author__icontains=search)
-        )
+        # 全文索引检索，按相关度排序（游标模式下按时间排序）
+        reviews = search_reviews(reviews, search)
+    elif order == 'words':
+        reviews = reviews.order_by('-insight__word_count', '-created_at')
+
+    if cursor_mode:
+        try:
+            page_reviews, next_cursor, prev_cursor = keyset_page(reviews, cursor, page_size=10)
+        except InvalidCursor:
+            return JsonResponse({'error': '无效游标'}, status=400)
+        count_mode = request.GET.get('count', 'none')
+        if count_mode == 'exact':
+            total_items = reviews.count()
+        elif count_mode == 'approx':
+            total_items = _approx_review_count(
+                product_id, rating, sentiment, search or min_words or max_spam or spec_color or spec_memory,
+            )
+        else:
+            total_items = None
+        return JsonResponse({
+            'reviews': [_serialize_review(r) for r in page_reviews],
+            'pagination': {
+                'mode': 'cursor',
+                'next': next_cursor,
+                'prev': prev_cursor,
+                'has_previous': prev_cursor is not None,
+                'has_next': next_cursor is not None,
+                'total_items': total_items
+            }
+        })
     
     # 分页
+    page = int(request.GET.get('page', 1))
     paginator = Paginator(reviews, 10)
     page_obj = paginator.get_page(page)
     
     # 序列化数据
-    reviews_data = []
-    for review in page_obj:
-        reviews_data.append({
-            'id': review.id,
-            'product_name': review.product.name,
-            'author': review.author,
-            'content': review.content,
-            'rating': review.rating,
-            'sentiment': review.sentiment,
-            'confidence': review.confidence,
-            'created_at': review.created_at.strftime('%Y-%m-%d %H:%M')
-        })
+    reviews_data = [_serialize_review(review) for review in page_obj]
     
     return JsonResponse({
         'reviews': reviews_data,
@@ -357,6 +434,46 @@ def api_reviews(request):
         }
     })
 
+def _serialize_review(review):
+    return {
+        'id': review.id,
+        'product_name': review.product.name,
+        'author': review.author,
+        'content': review.content,
+        'rating': review.rating,
+        'sentiment': review.sentiment,
+        'confidence': review.confidence,
+        'created_at': review.created_at.strftime('%Y-%m-%d %H:%M'),
+        'spec': review.spec,
+        'spec_color': review.spec_color,
+        'spec_memory': review.spec_memory,
+        'follow_up': review.follow_up,
+        'merchant_reply': review.merchant_reply,
+        **_review_features(review),
+    }
+
+def _review_features(review):
+    insight = getattr(review, 'insight', None)
+    if insight is None:
+        return {}
+    return {
+        'word_count': insight.word_count,
+        'reading_time': insight.reading_time,
+        'spam_score': insight.spam_score,
+        'emotion_score': insight.emotion_score,
+    }
+
+def _approx_review_count(product_id, rating, sentiment, other_filters):
+    """用增量维护的产品洞察计数器估算总数；无法估算的筛选组合返回 None"""
+    if rating or other_filters:
+        return None
+    insights = ProductInsight.objects.all()
+    if product_id:
+        insights = insights.filter(product_id=product_id)
+    if sentiment:
+        return sum(int(d.get(sentiment, 0) or 0) for d in insights.values_list('sentiment_distribution', flat=True))
+    return insights.aggregate(total=Sum('total_reviews'))['total'] or 0
+
 @require_http_methods(["GET"])
 def api_review_detail(request, review_id):
     """API: 获取评论详情"""
@@ -371,41 +488,79 @@ def api_review_detail(request, review_id):
             'rating': review.rating,
             'sentiment': review.sentiment,
             'confidence': review.confidence,
-            'created_at': review.created_at.strftime('%Y-%m-%d %H:%M')
+            'created_at': review.created_at.strftime('%Y-%m-%d %H:%M'),
+            'spec': review.spec,
+            'spec_color': review.spec_color,
+            'spec_memory': review.spec_memory,
+            'follow_up': review.follow_up,
+            'merchant_reply': review.merchant_reply,
         }
         
         return JsonResponse(review_data)
     except Review.DoesNotExist:
         return JsonResponse({'error': '评论不存在'}, status=404)
 
+def _dashboard_stats_row(request):
+    """读取物化统计行（全站或 ?product= 单个产品），同一请求内只查一次"""
+    if not hasattr(request, '_dashboard_stats'):
+        product_id = request.GET.get('product')
+        if product_id:
+            request._dashboard_stats = ProductInsight.objects.select_related('product').filter(product_id=product_id).first()
+        else:
+            request._dashboard_stats = ReviewStats.current()
+    return request._dashboard_stats
+
+def _dashboard_stats_etag(request):
+    stats = _dashboard_stats_row(request)
+    if stats is None:
+        return None
+    if isinstance(stats, ProductInsight):
+        return f'product-{stats.product_id}-v{stats.reviews_version}'
+    return f'stats-v{stats.version}'
+
+def _dashboard_stats_last_modified(request):
+    stats = _dashboard_stats_row(request)
+    return stats.last_updated if stats is not None else None
+
 @require_http_methods(["GET"])
+@condition(etag_func=_dashboard_stats_etag, last_modified_func=_dashboard_stats_last_modified)
 def api_dashboard_stats(request):
-    """API: 获取仪表板统计数据"""
-    total_products = Product.objects.count()
-    total_reviews = Review.objects.count()
-    avg_rating = Review.objects.aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0
-    
-    # 获取情感分布
-    sentiment_stats = list(Review.objects.values('sentiment').annotate(
-        count=Count('sentiment')
-    ).order_by('-count'))
+    """API: 获取仪表板统计数据（读取增量维护的物化统计，支持 ETag/304）"""
+    stats = _dashboard_stats_row(request)
+    if stats is None:
+        return JsonResponse({'error': '产品不存在'}, status=404)
+    if isinstance(stats, ProductInsight):
+        total_products = 1
+    else:
+        total_products = stats.total_products
     
-    # 获取评分分布
-    rating_stats = list(Review.objects.values('rating').annotate(
-        count=Count('rating')
-    ).order_by('rating'))
+    # 情感分布（按数量倒序）与评分分布（按评分升序），与分组查询的输出格式一致
+    sentiment_stats = sorted(
+        [{'sentiment': k, 'count': v} for k, v in (stats.sentiment_distribution or {}).items() if v],
+        key=lambda x: -x['count']
+    )
+    rating_stats = sorted(
+        [{'rating': int(k), 'count': v} for k, v in (stats.rating_distribution or {}).items() if v],
+        key=lambda x: x['rating']
+    )
     
-    return JsonResponse({
+    response = JsonResponse({
         'total_products': total_products,
-        'total_reviews': total_reviews,
-        'avg_rating': round(avg_rating, 1),
+        'total_reviews': stats.total_reviews,
+        'avg_rating': round(stats.avg_rating or 0, 1),
         'sentiment_stats': sentiment_stats,
         'rating_stats': rating_stats
     })
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
 
 @require_http_methods(["POST"])
 @csrf_exempt
 def api_reviews_import(request):
+    """API: 导入评论（JSON 数组或 {"items": [...]}）
+
+    confidence 为 0-100 的百分数；评分/情感/置信度缺失的条目整批交给情感分类器补齐。
+    """
     try:
         payload = json.loads(request.body.decode('utf-8'))
     except Exception:
@@ -413,34 +568,30 @@ def api_reviews_import(request):
     items = payload if isinstance(payload, list) else payload.get('items')
     if not isinstance(items, list):
         return JsonResponse({'error': '缺少items数组'}, status=400)
-    created = 0
-    skipped = 0
     errors = 0
-    products_updated = set()
+    # 先在内存中校验、规范化所有条目，不访问数据库
+    rows = []
     for it in items:
         try:
             product_name = (it.get('product_name') or '').strip()
-            if not product_name:
+            # 产品名用于匹配已有产品，超长时不截断（截断后可能并到别的产品上），按错误条目计
+            if not product_name or len(product_name) > PRODUCT_NAME_MAX_LENGTH:
                 errors += 1
                 continue
-            product, _ = Product.objects.get_or_create(name=product_name, defaults={
-                'description': it.get('product_description') or '',
-                'price': it.get('product_price') or 0,
-                'category': it.get('category') or ''
-            })
             content = (it.get('content') or '').strip()
             if not content:
                 errors += 1
                 continue
-            author = (it.get('author') or '').strip() or '匿名'
-            rating = int(it.get('rating') or 0)
-            if rating < 1:
-                rating = 1
-            if rating > 5:
-                rating = 5
-            sentiment = (it.get('sentiment') or 'neutral').strip()
+            author = (it.get('author') or '').strip()[:AUTHOR_MAX_LENGTH] or '匿名'
+            price = _parse_price(it.get('product_price'))
+            # 评分/情感缺失时留空，稍后整批交给情感分类器
+            rating = int(it.get('rating') or 0) or None
+            if rating is not None:
+                rating = min(max(rating, 1), 5)
+            sentiment = (it.get('sentiment') or '').strip()
             if sentiment not in ['positive', 'negative', 'neutral']:
-                sentiment = 'neutral'
+                sentiment = None
+            confidence = it.get('confidence')
             created_at_raw = it.get('created_at')
             dt = None
             if isinstance(created_at_raw, str):
@@ -448,40 +599,105 @@ def api_reviews_import(request):
                     dt = datetime.fromisoformat(created_at_raw)
                 except Exception:
                     dt = None
-            created_at = dt or timezone.now()
-            exists = Review.objects.filter(product=product, author=author, content=content, created_at=created_at).exists()
-            if exists:
-                skipped += 1
-                continue
-            Review.objects.create(
-                product=product,
-                author=author,
-                content=content,
-                rating=rating,
-                sentiment=sentiment,
-                confidence=float(it.get('confidence') or 0.0),
-                created_at=created_at
-            )
-            products_updated.add(product.id)
-            created += 1
+            if dt is not None and timezone.is_naive(dt):
+                dt = timezone.make_aware(dt)
+            rows.append({
+                'product_name': product_name,
+                'product_defaults': {
+                    'description': str(it.get('product_description') or ''),
+                    'price': price,
+                    'category': str(it.get('category') or '')[:CATEGORY_MAX_LENGTH],
+                },
+                'author': author,
+                'content': content,
+                'rating': rating,
+                'sentiment': sentiment,
+                'confidence': float(confidence) if confidence not in (None, '') else None,
+                'created_at': dt or timezone.now(),
+                'spec': (it.get('spec') or '').strip()[:100],
+                'follow_up': (it.get('follow_up') or '').strip(),
+                'merchant_reply': (it.get('merchant_reply') or '').strip(),
+            })
         except Exception:
             errors += 1
-    for pid in products_updated:
-        try:
-            p = Product.objects.get(id=pid)
-            insight, _ = ProductInsight.objects.get_or_create(product=p)
-            insight.update_insights()
-        except Exception:
-            pass
+    _fill_sentiment(rows)
+    with transaction.atomic():
+        products = _resolve_products(rows)
+        to_create = []
+        for r in rows:
+            to_create.append(Review(
+                product=products[r['product_name']],
+                author=r['author'],
+                content=r['content'],
+                rating=r['rating'],
+                sentiment=r['sentiment'],
+                confidence=r['confidence'],
+                created_at=r['created_at'],
+                spec=r['spec'],
+                follow_up=r['follow_up'],
+                merchant_reply=r['merchant_reply'],
+            ))
+        # 按内容指纹去重；计数器与分词缓存由入库钩子增量维护，话题聚类在读取时按版本重算
+        created = len(bulk_insert_reviews(to_create))
+    skipped = len(to_create) - created
     return JsonResponse({'created': created, 'skipped': skipped, 'errors': errors})
 
+# 逐条校验用的字段长度，取自模型定义
+PRODUCT_NAME_MAX_LENGTH = Product._meta.get_field('name').max_length
+CATEGORY_MAX_LENGTH = Product._meta.get_field('category').max_length
+AUTHOR_MAX_LENGTH = Review._meta.get_field('author').max_length
+
+def _parse_price(value):
+    """产品价格：缺省为 0，非数字、负数或超出 DecimalField(10, 2) 范围时抛 ValueError"""
+    if value in (None, ''):
+        return Decimal('0')
+    try:
+        price = Decimal(str(value)).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'无效价格: {value!r}')
+    field = Product._meta.get_field('price')
+    if not price.is_finite() or price < 0 or price >= Decimal(10) ** (field.max_digits - field.decimal_places):
+        raise ValueError(f'无效价格: {value!r}')
+    return price
+
+def _fill_sentiment(rows):
+    """缺少情感/评分/置信度的条目整批分类，调用方给出的值优先"""
+    pending = [r for r in rows if r['sentiment'] is None or r['rating'] is None or r['confidence'] is None]
+    results = classify_batch([r['content'] for r in pending])
+    for r, result in zip(pending, results):
+        if r['sentiment'] is None:
+            r['sentiment'] = result.label
+        if r['rating'] is None:
+            r['rating'] = result.rating
+        if r['confidence'] is None:
+            r['confidence'] = result.confidence
+
+def _resolve_products(rows):
+    """一次查询取回已有产品，缺失的产品批量创建"""
+    names = {r['product_name'] for r in rows}
+    products = {}
+    for chunk in chunked(names):
+        for p in Product.objects.filter(name__in=chunk).order_by('id'):
+            products.setdefault(p.name, p)
+    missing = {}
+    for r in rows:
+        if r['product_name'] not in products and r['product_name'] not in missing:
+            missing[r['product_name']] = Product(name=r['product_name'], **r['product_defaults'])
+    created = Product.objects.bulk_create(missing.values())
+    for p in created:
+        products[p.name] = p
+    if created:
+        # bulk_create 不触发信号，手动更新全站产品数
+        ReviewStats.apply_delta(products=len(created))
+    return products
+
+@condition(etag_func=_insight_etag, last_modified_func=_insight_last_modified)
 def insight_report_ui(request, product_id):
     try:
         product = Product.objects.get(id=product_id)
     except Product.DoesNotExist:
         return JsonResponse({'error': '产品不存在'}, status=404)
-    insight, _ = ProductInsight.objects.get_or_create(product=product)
-    insight.update_insights()
+    insight = ProductInsight.for_product(product)
     total = max(insight.total_reviews, 1)
     pos = int(insight.sentiment_distribution.get('positive', 0) or 0)
     neg = int(insight.sentiment_distribution.get('negative', 0) or 0)
@@ -490,8 +706,10 @@ def insight_report_ui(request, product_id):
     score100 = int(round((insight.avg_rating / 5.0) * 60 + pos_ratio * 40))
     score10 = round(score100 / 10.0, 1)
     stars = int(round(insight.avg_rating))
-    from .nlp import extract_product_clusters, pros_cons_from_clusters
-    clusters = extract_product_clusters(product.reviews.all())
+    from .cluster_store import read_product_clusters
+    from .nlp import pros_cons_from_clusters
+    # 聚类过期时先展示上次结果，后台任务重算
+    clusters, computed_at, stale = read_product_clusters(product, insight)
     pros, cons = pros_cons_from_clusters(clusters, top_n=3)
     keywords = []
     for c in clusters:
@@ -519,10 +737,8 @@ def insight_report_ui(request, product_id):
             reviews正面.append(item)
         if r.sentiment == 'negative' and len(reviews负面) < 5:
             reviews负面.append(item)
-    hours_ago = None
-    if insight.last_updated:
-        diff = timezone.now() - insight.last_updated
-        hours_ago = max(0, int(diff.total_seconds() // 3600))
+    diff = timezone.now() - computed_at
+    hours_ago = max(0, int(diff.total_seconds() // 3600))
     sentiment_pct = {
         'positive': int(round(pos / total * 100)),
         'neutral': int(round(neu / total * 100)),
@@ -543,8 +759,11 @@ def insight_report_ui(request, product_id):
         'reviews正面': reviews正面,
         'reviews负面': reviews负面,
         'hours_ago': hours_ago,
+        'stale': stale,
     }
-    return render(request, 'review_insights/insight_report.html', context)
+    response = render(request, 'review_insights/insight_report.html', context)
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
 
 def _client_ip(request):
     x = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -552,32 +771,27 @@ def _client_ip(request):
         return x.split(',')[0].strip()
     return request.META.get('REMOTE_ADDR') or ''
 
-_rate_bucket = {}
-_cache = {}
+def _cache_key(key):
+    # 键中含任意搜索词与 IP，哈希后再交给缓存后端（memcached 等对键名有限制）
+    return 'review_insights:' + hashlib.md5(key.encode('utf-8')).hexdigest()
 
 def _rate_limited(key, limit=5, window=10):
-    now = time.time()
-    bucket = _rate_bucket.get(key) or []
-    bucket = [t for t in bucket if now - t < window]
-    if len(bucket) >= limit:
-        _rate_bucket[key] = bucket
-        return True
-    bucket.append(now)
-    _rate_bucket[key] = bucket
-    return False
-
-def _cache_get(key, ttl=30):
-    now = time.time()
-    val = _cache.get(key)
-    if not val:
-        return None
-    ts, data = val
-    if now - ts > ttl:
-        return None
-    return data
+    """固定窗口计数：每个 (key, 窗口) 一个计数器，O(1) 且随窗口过期"""
+    bucket_key = _cache_key(f'rate:{key}:{int(time.time() // window)}')
+    cache.add(bucket_key, 0, timeout=window)
+    try:
+        count = cache.incr(bucket_key)
+    except ValueError:
+        # add 与 incr 之间恰好过期
+        cache.set(bucket_key, 1, timeout=window)
+        count = 1
+    return count > limit
 
-def _cache_set(key, data):
-    _cache[key] = (time.time(), data)
+def _cache_get(key):
+    return cache.get(_cache_key(key))
+
+def _cache_set(key, data, ttl=30):
+    cache.set(_cache_key(key), data, timeout=ttl)
 
 @require_http_methods(["GET"])
 def api_products_search(request):
@@ -588,11 +802,11 @@ def api_products_search(request):
     if _rate_limited(rk, limit=10, window=10):
         return JsonResponse({'error': 'too_many_requests'}, status=429)
     ck = f'products:{q}:{1 if strict else 0}'
-    cached = _cache_get(ck, ttl=30)
+    cached = _cache_get(ck)
     if cached is not None:
         return JsonResponse({'items': cached})
     if not q:
-        _cache_set(ck, [])
+        _cache_set(ck, [], ttl=30)
         return JsonResponse({'items': []})
     if strict:
         qs = Product.objects.filter(name__iexact=q)[:20]
@@ -600,7 +814,7 @@ def api_products_search(request):
         qs = Product.objects.filter(Q(name__icontains=q) | Q(description__icontains=q))[:20]
     items = []
     for p in qs:
-        insight, _ = ProductInsight.objects.get_or_create(product=p)
+        insight = ProductInsight.for_product(p)
         total = max(insight.total_reviews, 0)
         name = p.name or ''
         score = 0
@@ -613,25 +827,32 @@ def api_products_search(request):
         items.append({'id': p.id, 'name': name, 'reviews': total, 'rank': score})
     items.sort(key=lambda x: (-(x['rank']), -x['reviews'], x['name']))
     items = [{'id': it['id'], 'name': it['name'], 'reviews': it['reviews']} for it in items]
-    _cache_set(ck, items)
+    _cache_set(ck, items, ttl=30)
     return JsonResponse({'items': items})
 
+def _insight_json(payload):
+    response = JsonResponse(payload)
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return response
+
 @require_http_methods(["GET"])
+@condition(etag_func=_insight_etag, last_modified_func=_insight_last_modified)
 def api_product_insight(request, product_id):
+    """条件请求：洞察版本未变时直接 304，不进入限流与 NLP 计算"""
     ip = _client_ip(request)
     rk = f'insight:{ip}:{product_id}'
     if _rate_limited(rk, limit=20, window=10):
         return JsonResponse({'error': 'too_many_requests'}, status=429)
-    ck = f'insight:{product_id}'
-    cached = _cache_get(ck, ttl=30)
+    # 缓存键带上版本，保证缓存内容与 ETag 一致
+    ck = f'insight:{product_id}:{_insight_etag(request, product_id)}'
+    cached = _cache_get(ck)
     if cached is not None:
-        return JsonResponse(cached)
+        return _insight_json(cached)
     try:
         product = Product.objects.get(id=product_id)
     except Product.DoesNotExist:
         return JsonResponse({'error': 'not_found'}, status=404)
-    insight, _ = ProductInsight.objects.get_or_create(product=product)
-    insight.update_insights()
+    insight = ProductInsight.for_product(product)
     total = max(insight.total_reviews, 1)
     pos = int(insight.sentiment_distribution.get('positive', 0) or 0)
     neg = int(insight.sentiment_distribution.get('negative', 0) or 0)
@@ -640,8 +861,10 @@ def api_product_insight(request, product_id):
     score100 = int(round((insight.avg_rating / 5.0) * 60 + pos_ratio * 40))
     score10 = round(score100 / 10.0, 1)
     stars = int(round(insight.avg_rating))
-    from .nlp import extract_product_clusters, pros_cons_from_clusters
-    clusters = extract_product_clusters(product.reviews.all())
+    from .cluster_store import read_product_clusters
+    from .nlp import pros_cons_from_clusters
+    # 聚类过期时先展示上次结果，后台任务重算
+    clusters, computed_at, stale = read_product_clusters(product, insight)
     pros, cons = pros_cons_from_clusters(clusters, top_n=3)
     keywords = []
     for c in clusters:
@@ -682,6 +905,76 @@ def api_product_insight(request, product_id):
         'cons': cons,
         'keywords': keywords,
         'recent_reviews': recent_reviews,
+        'computed_at': computed_at.isoformat(),
+        'stale': stale,
+    }
+    _cache_set(ck, payload, ttl=30)
+    return _insight_json(payload)
+
+# 款式维度 -> Review 字段
+VARIANT_FIELDS = {'color': 'spec_color', 'memory': 'spec_memory'}
+
+@require_http_methods(["GET"])
+@condition(etag_func=_insight_etag, last_modified_func=_insight_last_modified)
+def api_product_variants(request, product_id):
+    """API: 按购买款式分组的评论统计（by=memory|color），clusters=1 时附带各款式的话题聚类
+
+    统计是一条走 (product, spec_*) 索引的 GROUP BY；聚类复用入库时的分词结果并排除刷评。
+    """
+    field = VARIANT_FIELDS.get(request.GET.get('by', 'memory'))
+    if field is None:
+        return JsonResponse({'error': 'by 只能是 memory 或 color'}, status=400)
+    with_clusters = request.GET.get('clusters') == '1'
+    ck = f'variants:{product_id}:{field}:{int(with_clusters)}:{_insight_etag(request, product_id)}'
+    cached = _cache_get(ck)
+    if cached is not None:
+        return _insight_json(cached)
+    try:
+        product = Product.objects.get(id=product_id)
+    except Product.DoesNotExist:
+        return JsonResponse({'error': 'not_found'}, status=404)
+
+    # 与产品计数器一致，垃圾评论不计入
+    rows = (
+        exclude_spam(Review.objects.filter(product=product)).order_by().values(field)
+        .annotate(
+            **counter_aggregates(),
+            follow_ups=Count('id', filter=~Q(follow_up='')),
+            replies=Count('id', filter=~Q(merchant_reply='')),
+        )
+        .order_by('-total', field)
+    )
+    variants = []
+    for row in rows:
+        total = row['total']
+        variants.append({
+            'variant': row[field],
+            'review_count': total,
+            'avg_rating': round((row['rating_sum'] or 0) / total, 2) if total else 0.0,
+            'sentiment_counts': {k: row[k] for k in SENTIMENT_KEYS},
+            'rating_distribution': {str(r): row[f'rating_{r}'] for r in RATING_VALUES},
+            'follow_up_count': row['follow_ups'],
+            'merchant_reply_count': row['replies'],
+        })
+
+    if with_clusters:
+        from .nlp import cluster_token_lists, tokenize_text
+        groups = {}
+        token_rows = exclude_spam(Review.objects.filter(product=product)).order_by().values_list(
+            field, 'content', 'sentiment', 'insight__key_topics',
+        )
+        for value, content, sentiment, key_topics in token_rows.iterator(chunk_size=2000):
+            sentiments, token_lists = groups.setdefault(value, ([], []))
+            sentiments.append(sentiment)
+            token_lists.append(list(key_topics) if key_topics else tokenize_text(content))
+        for v in variants:
+            sentiments, token_lists = groups.get(v['variant'], ([], []))
+            v['clusters'] = cluster_token_lists(sentiments, token_lists, n_clusters=3, top_tokens=3)
+
+    payload = {
+        'product': {'id': product.id, 'name': product.name},
+        'by': request.GET.get('by', 'memory'),
+        'variants': variants,
     }
-    _cache_set(ck, payload)
-    return JsonResponse(payload)
+    _cache_set(ck, payload, ttl=30)
+    return _insight_json(payload)